@@ -0,0 +1,5 @@
+"""Benchmark harnesses for the web tier and the scraper.
+
+Everything in here runs against local stand-ins (a seeded SQLite file or a
+local MySQL database), never against production or gesetze-bayern.de.
+"""
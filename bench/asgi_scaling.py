@@ -0,0 +1,298 @@
+"""Concurrent-connection scaling of the sync (gunicorn) and ASGI (uvicorn) servers.
+
+Seeds the synthetic corpus, starts ``gunicorn web.app:app`` (sync workers)
+and ``uvicorn web.asgi:app`` with the same number of worker processes, and
+drives both with an asyncio HTTP client at increasing concurrency over a mix
+of TOC, full view, norm and search requests. The page cache is disabled
+(CACHE_TTL=0, CACHE_GRACE=0) unless ``--warm`` is given, so every request
+reaches the database.
+
+    python -m bench.asgi_scaling --concurrency 1 --concurrency 16 --concurrency 64
+    python -m bench.asgi_scaling --slow-clients 8
+
+``--slow-clients N`` keeps N extra connections that trickle their request
+and download ``/gesamt`` pages through a 4 KiB receive window for the whole
+run; a sync worker is stuck on each of them. ``--db`` runs against an
+existing MySQL database and ``--db-latency-ms`` routes it through a local
+proxy that delays every reply, to see what a slow database does to each
+server.
+
+Needs gunicorn, uvicorn and, for the default SQLite database, aiosqlite.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+_SEARCH_TERMS = ["Art 3 BayHO", "BayHO 12", "Bay", "Gesetz", "Frist", "Behörde", "12", "Verordnung"]
+_SERVERS = {
+    "sync": lambda port, workers: [
+        sys.executable, "-m", "gunicorn", "web.app:app", "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers), "--worker-class", "sync",
+    ],
+    "asgi": lambda port, workers: [
+        sys.executable, "-m", "uvicorn", "web.asgi:app", "--port", str(port),
+        "--workers", str(workers), "--no-access-log", "--log-level", "warning",
+    ],
+}
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _quote(path):
+    from urllib.parse import quote
+    return quote(path, safe="/?=")
+
+
+def _targets(db_url, rng, n):
+    from sqlalchemy import create_engine, select
+    from models import Law, Norm
+
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        law_names = conn.execute(select(Law.name)).scalars().all()
+        norms = conn.execute(select(Law.name, Norm.number).join(Norm).where(Norm.is_stale == 0)).all()
+    engine.dispose()
+
+    urls = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.3:
+            urls.append(f"/gesetz/{rng.choice(law_names)}")
+        elif kind < 0.4:
+            urls.append(f"/gesetz/{rng.choice(law_names)}/gesamt")
+        elif kind < 0.85:
+            name, number = rng.choice(norms)
+            urls.append(f"/gesetz/{name}/{number}")
+        else:
+            urls.append(f"/suche?q={rng.choice(_SEARCH_TERMS)}")
+    return [_quote(url) for url in urls], [_quote(f"/gesetz/{name}/gesamt") for name in law_names]
+
+
+async def _get(port, path, rcvbuf=None, chunk_delay=0.0):
+    """One request with ``Connection: close``; returns the status code.
+
+    With ``chunk_delay`` the request is sent in 16-byte pieces and the
+    response read in ``rcvbuf`` pieces, pausing between them.
+    """
+    sock = socket.socket()
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    reader, writer = await asyncio.open_connection(sock=sock, limit=rcvbuf or 2 ** 16)
+    try:
+        request = f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode()
+        step = 16 if chunk_delay else len(request)
+        for i in range(0, len(request), step):
+            writer.write(request[i:i + step])
+            await writer.drain()
+            if chunk_delay:
+                await asyncio.sleep(chunk_delay)
+        status = int((await reader.readline()).split()[1])
+        while True:
+            chunk = await reader.read(rcvbuf or 2 ** 16)
+            if not chunk:
+                break
+            if chunk_delay:
+                await asyncio.sleep(chunk_delay)
+        return status
+    finally:
+        writer.close()
+
+
+async def _slow_client(port, urls, stop):
+    while not stop.is_set():
+        try:
+            await _get(port, random.choice(urls), rcvbuf=4096, chunk_delay=0.2)
+        except (OSError, ValueError, IndexError):
+            await asyncio.sleep(0.1)
+
+
+async def _load(port, urls, concurrency, seconds, timeout, slow_urls, slow_clients):
+    latencies = []
+    errors = 0
+    stop = asyncio.Event()
+    cursor = iter(range(10 ** 9))
+
+    async def worker():
+        nonlocal errors
+        while not stop.is_set():
+            path = urls[next(cursor) % len(urls)]
+            t0 = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(_get(port, path), timeout)
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    slow = [asyncio.create_task(_slow_client(port, slow_urls, stop)) for _ in range(slow_clients)]
+    if slow:
+        await asyncio.sleep(1)
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1) if latencies else None,
+    }
+
+
+async def _delay_proxy(target_host, target_port, delay):
+    """Local TCP proxy adding ``delay`` seconds to every chunk the database sends back."""
+    async def pipe(reader, writer, lag):
+        try:
+            while chunk := await reader.read(65536):
+                if lag:
+                    await asyncio.sleep(lag)
+                writer.write(chunk)
+                await writer.drain()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(target_host, target_port)
+        await asyncio.gather(pipe(client_reader, server_writer, 0), pipe(server_reader, client_writer, delay))
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def _wait_for(port, proc, deadline=30):
+    started = time.time()
+    while time.time() - started < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+async def _run_server(name, args, env, urls, slow_urls):
+    port = _free_port()
+    proc = subprocess.Popen(_SERVERS[name](port, args.workers), env=env, stderr=subprocess.DEVNULL)
+    rows = []
+    try:
+        await asyncio.to_thread(_wait_for, port, proc)
+        await _load(port, urls[:50], 4, 1, args.timeout, slow_urls, 0)  # warm up imports and pools
+        for concurrency in args.concurrency or [1, 8, 32, 128]:
+            row = await _load(port, urls, concurrency, args.seconds, args.timeout, slow_urls, args.slow_clients)
+            row.update({"server": name, "workers": args.workers, "concurrency": concurrency,
+                        "slow_clients": args.slow_clients})
+            rows.append(row)
+            print(f"# {name} c={concurrency}: {row['rps']} req/s", file=sys.stderr)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return rows
+
+
+async def _main(args):
+    from sqlalchemy import create_engine
+    from sqlalchemy.engine import make_url
+    from sqlalchemy.orm import Session
+
+    from .corpus import seed
+
+    tmpdir = None
+    proxy = None
+    db_url = args.db
+    if db_url is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="bench-asgi-")
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.sqlite')}"
+        engine = create_engine(db_url)
+        with Session(engine) as session:
+            seed(session, args.scale)
+        engine.dispose()
+    try:
+        server_url = db_url
+        if args.db_latency_ms:
+            url = make_url(db_url)
+            proxy, proxy_port = await _delay_proxy(url.host, url.port or 3306, args.db_latency_ms / 1000)
+            server_url = url.set(host="127.0.0.1", port=proxy_port).render_as_string(hide_password=False)
+
+        env = dict(os.environ, DATABASE_URL=server_url, SECRET_KEY="bench", HITS_FLUSH_INTERVAL="1000000",
+                   CACHE_TTL="3600" if args.warm else "0", CACHE_GRACE="0",
+                   PYTHONPATH=os.getcwd())
+        urls, slow_urls = _targets(db_url, random.Random(args.scale), 2000)
+        results = []
+        for name in args.server or list(_SERVERS):
+            results.extend(await _run_server(name, args, env, urls, slow_urls))
+        return results
+    finally:
+        if proxy is not None:
+            proxy.close()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+def _print_table(results):
+    header = f"{'server':<6} {'workers':>7} {'conc':>5} {'slow':>5} {'req':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['server']:<6} {r['workers']:>7} {r['concurrency']:>5} {r['slow_clients']:>5} {r['requests']:>7} "
+            f"{r['errors']:>5} {r['rps']:>8} {r['p50_ms']!s:>8} {r['p99_ms']!s:>8}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="corpus multiplier for the temporary SQLite database")
+    parser.add_argument("--db", help="SQLAlchemy URL of an existing (MySQL) database instead of a temporary SQLite file")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="delay added to every database reply (needs --db)")
+    parser.add_argument("--server", action="append", choices=list(_SERVERS), help="server to run (repeatable, default both)")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes per server")
+    parser.add_argument("--concurrency", type=int, action="append", help="concurrent connections (repeatable)")
+    parser.add_argument("--seconds", type=float, default=5, help="duration of each load step")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout in seconds")
+    parser.add_argument("--slow-clients", type=int, default=0, help="connections trickling /gesamt pages during each step")
+    parser.add_argument("--warm", action="store_true", help="keep the page cache enabled")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    if args.db_latency_ms and not args.db:
+        parser.error("--db-latency-ms needs --db")
+
+    results = asyncio.run(_main(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+
+
+if __name__ == "__main__":
+    main()
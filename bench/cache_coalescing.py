@@ -0,0 +1,143 @@
+"""Benchmark for request coalescing in web/cache.py.
+
+Seeds the synthetic corpus into a temporary SQLite file, then lets a burst of
+threads request the same ``/gesetz/<law>/gesamt`` page through the Flask test
+client right after its cache entry went away, in three setups:
+
+- herd: no coalescing (CACHE_BUILD_WAIT=0, CACHE_GRACE=0), every thread builds
+- miss: entry gone, one thread builds and the others wait for it
+- stale: entry expired but within CACHE_GRACE, one thread rebuilds and the
+  others get the old page right away
+
+and reports renders and queries per burst with the burst's p50/p99 latency.
+
+    python -m bench.cache_coalescing --threads 32 --bursts 10
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("HITS_FLUSH_INTERVAL", "1000000")
+
+from sqlalchemy import event
+
+from .corpus import seed
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _burst(app, url, threads):
+    barrier = threading.Barrier(threads)
+    latencies = []
+
+    def worker():
+        client = app.test_client()
+        barrier.wait()
+        t0 = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned HTTP {response.status_code}")
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies
+
+
+def run(threads, bursts):
+    with tempfile.TemporaryDirectory(prefix="bench-cache-") as tmpdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.sqlite')}"
+
+        from flask import template_rendered
+        from web import cache, hits
+        from web.app import create_app
+        from web.extensions import db
+        from models import Law
+
+        app = create_app()
+        with app.app_context():
+            seed(db.session, 1)
+            law = db.session.query(Law.name).order_by(Law.name).first()
+            engine = db.engine
+        url = f"/gesetz/{law.name}/gesamt"
+        key = f"full_view_{law.name}"
+
+        counts = {"queries": 0, "renders": 0}
+        lock = threading.Lock()
+
+        def on_query(*args):
+            with lock:
+                counts["queries"] += 1
+
+        def on_render(*args, **kwargs):
+            with lock:
+                counts["renders"] += 1
+
+        event.listen(engine, "before_cursor_execute", on_query)
+        template_rendered.connect(on_render, app)
+
+        defaults = (cache._BUILD_WAIT, cache._GRACE)
+        results = []
+        for mode in ("herd", "miss", "stale"):
+            cache._BUILD_WAIT, cache._GRACE = (0, 0) if mode == "herd" else defaults
+            latencies = []
+            renders = queries = 0
+            for _ in range(bursts):
+                app.test_client().get(url)
+                if mode == "stale":
+                    cache._cache[key]["time"] -= cache._TTL + 1
+                else:
+                    cache.cache_clear()
+                before = dict(counts)
+                latencies.extend(_burst(app, url, threads))
+                renders += counts["renders"] - before["renders"]
+                queries += counts["queries"] - before["queries"]
+            results.append({
+                "mode": mode,
+                "threads": threads,
+                "renders_per_burst": round(renders / bursts, 1),
+                "queries_per_burst": round(queries / bursts, 1),
+                "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+                "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+                "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+            })
+        cache._BUILD_WAIT, cache._GRACE = defaults
+        hits.flush()
+        with app.app_context():
+            db.engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32, help="concurrent requests per burst")
+    parser.add_argument("--bursts", type=int, default=10, help="bursts per setup")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.threads, args.bursts)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    header = f"{'mode':<6} {'threads':>7} {'renders':>8} {'queries':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['mode']:<6} {r['threads']:>7} {r['renders_per_burst']:>8} {r['queries_per_burst']:>8} "
+              f"{r['p50_ms']:>8} {r['p99_ms']:>8} {r['mean_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
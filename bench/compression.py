@@ -0,0 +1,137 @@
+"""Benchmark for compressed norm content (models.compression).
+
+Seeds the synthetic corpus into a temporary SQLite file and compares plain
+TEXT, zlib without a dictionary and zlib with a trained dictionary:
+
+- stored: total content bytes and the SQLite file size after VACUUM
+- transfer: bytes a cold ``/gesamt`` render pulls for one law, on average
+- decode: time to decompress one law's content, mean and p99
+
+    python -m bench.compression --scale 1 --scale 5
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from models import ContentDictionary, Norm, compression
+from .corpus import seed
+
+
+def _file_size(path):
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def _variant(pages, dictionary_id):
+    transfer = []
+    decode = []
+    stored = 0
+    packed_pages = []
+    for contents in pages:
+        packed = [compression.compress(text, dictionary_id) for text in contents]
+        packed_pages.append(packed)
+        size = sum(len(blob) for blob in packed)
+        stored += size
+        transfer.append(size)
+    for packed in packed_pages:
+        start = time.perf_counter()
+        for blob in packed:
+            compression.decompress(blob)
+        decode.append((time.perf_counter() - start) * 1000)
+    return stored, transfer, decode, packed_pages
+
+
+def run(scale):
+    with tempfile.TemporaryDirectory(prefix="bench-compression-") as tmpdir:
+        path = os.path.join(tmpdir, "bench.sqlite")
+        engine = create_engine(f"sqlite:///{path}")
+        with Session(engine) as session:
+            seed(session, scale)
+            table = Norm.__table__
+            rows = session.execute(
+                select(table.c.id, table.c.law_id, table.c.content).where(table.c.content.isnot(None))
+            ).all()
+
+            by_law = defaultdict(list)
+            for norm_id, law_id, text in rows:
+                by_law[law_id].append((norm_id, text))
+            norm_ids = [norm_id for entries in by_law.values() for norm_id, _ in entries]
+            pages = [[text for _, text in entries] for entries in by_law.values()]
+
+            started = time.perf_counter()
+            step = max(1, len(rows) // 2000)
+            data = compression.train_dictionary([row.content for row in rows[::step]])
+            train_s = time.perf_counter() - started
+            session.add(ContentDictionary(data=data, created_at=datetime.datetime.now()))
+            session.commit()
+            with engine.connect() as conn:
+                compression.load_dictionaries(conn)
+            dictionary_id = compression._current_id
+
+        plain_stored = sum(len(row.content.encode("utf-8")) for row in rows)
+        plain_transfer = [sum(len(text.encode("utf-8")) for text in contents) for contents in pages]
+        plain_file = _file_size(path)
+
+        results = {"scale": scale, "norms": len(rows), "laws": len(pages),
+                   "dictionary_bytes": len(data), "train_s": round(train_s, 2)}
+        results["plain"] = {
+            "stored_bytes": plain_stored,
+            "file_bytes": plain_file,
+            "transfer_bytes_per_page": round(statistics.mean(plain_transfer)),
+        }
+        for name, dict_id in (("zlib", 0), ("zlib_dict", dictionary_id)):
+            stored, transfer, decode, packed_pages = _variant(pages, dict_id)
+
+            # Store this variant only, to see the table's footprint without the plain column
+            conn = sqlite3.connect(path)
+            conn.execute("UPDATE norms SET content = NULL, content_z = NULL")
+            blobs = [blob for packed in packed_pages for blob in packed]
+            conn.executemany("UPDATE norms SET content_z = ? WHERE id = ?", zip(blobs, norm_ids))
+            conn.commit()
+            conn.close()
+
+            results[name] = {
+                "stored_bytes": stored,
+                "file_bytes": _file_size(path),
+                "transfer_bytes_per_page": round(statistics.mean(transfer)),
+                "ratio": round(plain_stored / stored, 2),
+                "decode_ms_per_page": round(statistics.mean(decode), 3),
+                "decode_ms_p99": round(sorted(decode)[min(len(decode) - 1, int(len(decode) * 0.99))], 3),
+            }
+        engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, action="append", help="corpus copies (repeatable, default 1)")
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args(argv)
+
+    all_results = [run(scale) for scale in (args.scale or [1])]
+    if args.json:
+        print(json.dumps(all_results, indent=2))
+        return
+    for results in all_results:
+        print(f"\nscale {results['scale']}: {results['norms']} norms in {results['laws']} laws, "
+              f"{results['dictionary_bytes']} byte dictionary trained in {results['train_s']}s")
+        print(f"{'variant':<10} {'stored':>12} {'file':>12} {'per page':>10} {'ratio':>6} {'decode ms':>10} {'p99':>8}")
+        for name in ("plain", "zlib", "zlib_dict"):
+            r = results[name]
+            print(f"{name:<10} {r['stored_bytes']:>12} {r['file_bytes']:>12} {r['transfer_bytes_per_page']:>10} "
+                  f"{r.get('ratio', 1.0):>6} {r.get('decode_ms_per_page', 0):>10} {r.get('decode_ms_p99', 0):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Synthetic law corpus sized like laws.yml.
+
+``seed(session, scale)`` inserts one copy of every law in laws.yml per scale
+step, with one norm per configured article number, a sprinkling of lettered
+sub-articles ("12a") and stale norms, and content shaped like the HTML that
+``parse_norm`` produces.
+"""
+import random
+from datetime import date, datetime
+
+from sqlalchemy import insert, text
+
+from law_scraper.scraper import load_config
+from models import Law, Norm, fingerprint
+from models.migrations import upgrade
+
+_WORDS = (
+    "die der das Gesetz Verordnung Behörde Antrag Frist Bescheid Genehmigung Gemeinde Landkreis "
+    "Staatsministerium Zuständigkeit Verfahren Anordnung Beteiligte Voraussetzung Satz Absatz "
+    "nach gemäß soweit sofern nicht durch auf mit von für bei wird werden ist sind kann können "
+    "muss müssen zuständige Regierung Bezirk öffentliche Interesse Erlaubnis Widerspruch Eintragung"
+).split()
+
+
+def _sentence(rng):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 24))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+
+def _paragraph(rng, index):
+    sentences = [f"<sup>{n}</sup>{_sentence(rng)}" for n in range(1, rng.randint(1, 4) + 1)]
+    return f"<p>({index}) {' '.join(sentences)}</p>"
+
+
+def _content(rng):
+    parts = []
+    for index in range(1, rng.randint(1, 5) + 1):
+        parts.append(_paragraph(rng, index))
+        if rng.random() < 0.3:
+            items = "\n".join(f"<li>{_sentence(rng)}</li>" for _ in range(rng.randint(2, 6)))
+            parts.append(f"<ol>{items}</ol>")
+    return "\n".join(parts)
+
+
+def corpus_laws(scale=1):
+    """Yield (name, description, prefix, start, end) for every synthetic law."""
+    config = load_config()
+    for copy in range(scale):
+        for law in config["laws"]:
+            name = law["id"] if copy == 0 else f"{law['id']}-{copy}"
+            numbering = law["numbering"]
+            yield name, law["name"], numbering["prefix"], numbering["start"], numbering["end"]
+
+
+def seed(session, scale=1, seed_value=1):
+    """Create the schema and insert the synthetic corpus. Returns (laws, norms) inserted."""
+    rng = random.Random(seed_value)
+    upgrade(session.get_bind())
+
+    today = date.today()
+    law_count = 0
+    norm_count = 0
+    for name, description, prefix, start, end in corpus_laws(scale):
+        law = Law(name=name, description=description, last_modified=today, views=rng.randint(0, 5000))
+        session.add(law)
+        session.flush()
+        law_count += 1
+
+        rows = []
+        for number in range(start, end + 1):
+            numbers = [str(number)]
+            if rng.random() < 0.08:
+                numbers += [f"{number}{suffix}" for suffix in "abc"[:rng.randint(1, 3)]]
+            for norm_number in numbers:
+                content = _content(rng)
+                title = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 5))).capitalize()
+                rows.append({
+                    "law_id": law.id,
+                    "number": norm_number,
+                    "number_raw": f"{prefix}-{norm_number}",
+                    "title": title,
+                    "content": content,
+                    "url": f"https://www.gesetze-bayern.de/Content/Document/{prefix}-{norm_number}",
+                    "last_seen": datetime.combine(today, datetime.min.time()),
+                    "content_hash": fingerprint(f"{prefix}-{norm_number}", title, content),
+                    "is_stale": 1 if rng.random() < 0.02 else 0,
+                    "views": rng.randint(0, 500),
+                })
+        session.execute(insert(Norm), rows)
+        norm_count += len(rows)
+
+    session.commit()
+    # Fresh tables have no statistics; without them SQLite walks the low-selectivity is_stale indexes
+    if session.get_bind().dialect.name == "sqlite":
+        session.execute(text("ANALYZE"))
+        session.commit()
+    return law_count, norm_count
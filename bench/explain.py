@@ -0,0 +1,120 @@
+"""EXPLAIN checks for the hot read queries.
+
+Runs the law routes and the warm_cache job's queries against a seeded
+database, captures every statement they issue and asserts that the query
+plans use the indexes from migrations v0001 and v0006. Exits non-zero when a
+plan does not, so it can gate CI.
+
+    python -m bench.explain                       # temporary SQLite corpus
+    python -m bench.explain --db mysql+pymysql://...   # existing local MySQL
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("HITS_FLUSH_INTERVAL", "1000000")
+# Check the prev/next queries norm pages fall back to without the catalog's norm index
+os.environ.setdefault("NORM_INDEX", "0")
+
+from sqlalchemy import event
+
+from web import queries
+
+from .corpus import seed
+
+# route name -> (url template, indexes that must appear in the plans of its statements).
+# Laws are resolved through the in-memory catalog, so only norm queries reach the database.
+EXPECTED = {
+    "law_toc": ("/gesetz/{law}", {"ix_norms_law_stale_sort"}),
+    "law_full_view": ("/gesetz/{law}/gesamt", {"ix_norms_law_stale_sort"}),
+    "norm_detail": ("/gesetz/{law}/{number}", {
+        "ix_norms_law_stale_sort", "ix_norm_references_source", "ix_norm_references_target",
+    }),
+    # The LIKE '%...%' matches cannot use an index; each law's current norms are read through it
+    "search": ("/suche?q=Frist", {"ix_norms_law_stale_sort"}),
+}
+# Not behind a route: what the warm_cache job (web/jobs.py) reads
+JOB_EXPECTED = {
+    "most_viewed": (lambda: queries.most_viewed_norms(50), {"ix_norms_stale_views"}),
+}
+
+
+def explain(conn, statement, parameters):
+    """Return the set of index names the plan of ``statement`` uses."""
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        return {word for row in rows for word in row[-1].replace("(", " ").split() if word.startswith(("ix_", "uq_"))}
+    rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+    return {row["key"] for row in rows if row["key"]}
+
+
+def run(db_url=None):
+    tmpdir = None
+    if db_url is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="bench-explain-")
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.sqlite')}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from web import hits
+    from web.app import create_app
+    from web.cache import cache_clear
+    from web.extensions import db
+    from models import Law, Norm
+
+    app = create_app()
+    failures = []
+    try:
+        with app.app_context():
+            if not db.inspect(db.engine).has_table("laws"):
+                seed(db.session, 1)
+            law_name, number = db.session.query(Law.name, Norm.number).join(Norm).filter(
+                Norm.is_stale == 0,
+            ).order_by(Law.id.desc(), Norm.sort_key.desc()).first()
+
+            captured = []
+            event.listen(db.engine, "before_cursor_execute",
+                         lambda conn, cursor, statement, parameters, context, executemany:
+                         captured.append((statement, parameters)))
+
+            def check(name, run, expected):
+                cache_clear()
+                captured.clear()
+                run()
+                statements = list(captured)
+                used = set()
+                with db.engine.connect() as conn:
+                    for statement, parameters in statements:
+                        used |= explain(conn, statement, parameters)
+                missing = expected - used
+                status = "ok" if not missing else f"MISSING {', '.join(sorted(missing))}"
+                print(f"{name:<14} {len(statements)} statements, indexes used: {', '.join(sorted(used)) or '-'} [{status}]")
+                if missing:
+                    failures.append(name)
+
+            client = app.test_client()
+            for route, (template, expected) in EXPECTED.items():
+                check(route, lambda: client.get(template.format(law=law_name, number=number)), expected)
+            for name, (statement, expected) in JOB_EXPECTED.items():
+                check(name, lambda: db.session.execute(statement()).all(), expected)
+    finally:
+        hits.flush()
+        cache_clear()
+        with app.app_context():
+            db.engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="SQLAlchemy URL of an existing database instead of a temporary SQLite corpus")
+    args = parser.parse_args(argv)
+    failures = run(args.db)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
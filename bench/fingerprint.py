@@ -0,0 +1,87 @@
+"""Spurious changes and hashing cost: MD5 of the raw norm against models.fingerprint.
+
+Parses the mock site's norm pages, then the same pages again with markup
+noise the site can produce without changing a text: doubled spaces, line
+breaks between tags, ``&#32;``-style entities and reordered or requoted
+attributes. Reports how many norms each hash would store as changed (every
+one is a history version, a row rewrite and a cache invalidation) and the
+time per norm of both hashes.
+
+    python -m bench.fingerprint --laws 5
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import time
+
+from law_scraper.parser import parse_norm
+from law_scraper.scraper import load_config
+from models import fingerprint
+
+from .mock_site import SyntheticLaw
+
+
+def _md5(number_raw, title, content):
+    return hashlib.md5(f"{number_raw}{title}{content}".encode("utf-8")).hexdigest()
+
+
+def _noisy(page, rng):
+    page = re.sub(r"(?<=\w) (?=\w)", lambda m: "  " if rng.random() < 0.05 else " ", page)
+    page = re.sub(r"</div><div", lambda m: "</div>\n<div" if rng.random() < 0.5 else m.group(), page)
+    page = page.replace('<div class="paratext">', "<div class='paratext' >")
+    return page.replace(" gilt ", " gilt&#32;")
+
+
+def run(laws, rounds):
+    rng = random.Random(1)
+    pages = []
+    for entry in load_config()["laws"][:laws]:
+        numbering = entry["numbering"]
+        law = SyntheticLaw(numbering["prefix"], numbering["start"], numbering["end"], None)
+        pages.extend((f"{law.prefix}-{n}", law.norm_html(n)) for n in law.sorted_numbers())
+
+    norms, noisy = [], []
+    for number_raw, page in pages:
+        for target, html in ((norms, page), (noisy, _noisy(page, rng))):
+            data = parse_norm(html)
+            target.append((number_raw, data["title"], data["content"]))
+
+    results = []
+    for name, fn in (("md5", _md5), ("fingerprint", fingerprint)):
+        changed = sum(fn(*a) != fn(*b) for a, b in zip(norms, noisy))
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for norm in norms:
+                fn(*norm)
+        elapsed = time.perf_counter() - t0
+        results.append({
+            "hash": name,
+            "norms": len(norms),
+            "changed_by_noise": changed,
+            "us_per_norm": round(elapsed / (rounds * len(norms)) * 1e6, 2),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laws", type=int, default=5, help="first N laws of laws.yml")
+    parser.add_argument("--rounds", type=int, default=20, help="times every norm is hashed per hash")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.laws, args.rounds)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    header = f"{'hash':<12} {'norms':>6} {'changed by noise':>17} {'us/norm':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['hash']:<12} {r['norms']:>6} {r['changed_by_noise']:>17} {r['us_per_norm']:>9}")
+
+
+if __name__ == "__main__":
+    main()
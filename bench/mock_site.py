@@ -0,0 +1,312 @@
+"""Local stand-in for gesetze-bayern.de.
+
+Serves ``/Content/Document/<prefix>`` overview pages,
+``/Content/Document/<prefix>-<n>`` norm pages and
+``/Content/Document/<prefix>/true`` whole-law pages for every law in laws.yml,
+shaped like the markup ``parse_overview`` and ``parse_norm`` expect. Pages
+are synthetic unless a directory of recorded pages is given, in which case
+``<doc>.html`` files (e.g. ``BayBO-12.html``) are served verbatim.
+
+Latency, 404s, 5xx errors, rate limiting (429 with Retry-After), outages
+and timeouts can be injected, and pages are gzipped for clients that accept it:
+
+    python -m bench.mock_site --port 8800 --latency 0.02 --error-rate 0.01 --rate-limit-rate 0.05
+
+and the scraper pointed at ``http://127.0.0.1:8800/Content/Document``.
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from law_scraper.scraper import load_config
+
+DOCUMENT_PATH = "/Content/Document"
+
+_WORDS = (
+    "Gesetz Verordnung Behörde Antrag Frist Bescheid Genehmigung Gemeinde Landkreis Zuständigkeit "
+    "Verfahren Anordnung Beteiligte Voraussetzung nach gemäß soweit sofern durch wird werden ist"
+).split()
+
+# Navigation and footer chrome of the real site make up most of a page's bytes
+_CHROME = "".join(
+    f'<li class="nav-item"><a href="/Content/Document/Nav-{i}">Navigationseintrag {i}</a></li>'
+    for i in range(300)
+)
+
+
+def _stable_fraction(*parts):
+    digest = hashlib.md5("|".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32
+
+
+class SyntheticLaw:
+    def __init__(self, prefix, start, end, text_valid_from):
+        self.prefix = prefix
+        self.text_valid_from = text_valid_from
+        # Ranges in laws.yml are upper bounds; the last ~10% do not exist
+        last = start + int((end - start + 1) * 0.9)
+        self.numbers = set()
+        for number in range(start, last + 1):
+            self.numbers.add(str(number))
+            if _stable_fraction(prefix, str(number)) < 0.05:
+                self.numbers.update(f"{number}{suffix}" for suffix in "ab")
+
+    def sorted_numbers(self):
+        return sorted(self.numbers, key=lambda n: (int(re.match(r"\d+", n).group()), n))
+
+    def overview_html(self):
+        items = "".join(
+            f'<li><a href="{DOCUMENT_PATH}/{self.prefix}-{n}">Art. {n}</a></li>' for n in self.sorted_numbers()
+        )
+        return (
+            f"<html><head><title>{self.prefix}</title></head><body><ul class=\"nav\">{_CHROME}</ul>"
+            f'<div id="doc-metadata"><div class="docmeta">'
+            f"<div>Text gilt ab: {self.text_valid_from:%d.%m.%Y}</div>"
+            f"<div>Fassung: {self.text_valid_from:%d.%m.%Y}</div></div></div>"
+            f'<div class="toc"><ul>{items}</ul></div></body></html>'
+        )
+
+    def norm_html(self, number):
+        return (
+            f"<html><head><title>{self.prefix} Art. {number}</title></head><body><ul class=\"nav\">{_CHROME}</ul>"
+            f"{self._norm_divs(number)}</body></html>"
+        )
+
+    def law_html(self):
+        """The whole law on one page, as served under ``<prefix>/true``."""
+        norms = "".join(f'<div class="norm">{self._norm_divs(n)}</div>' for n in self.sorted_numbers())
+        return (
+            f"<html><head><title>{self.prefix}</title></head><body><ul class=\"nav\">{_CHROME}</ul>"
+            f"{norms}</body></html>"
+        )
+
+    def _norm_divs(self, number):
+        rng = random.Random(f"{self.prefix}-{number}")
+
+        def sentence():
+            return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 20))) + "."
+
+        blocks = []
+        for index in range(1, rng.randint(1, 5) + 1):
+            blocks.append(f'<div class="paratext">({index}) <sup>1</sup>{sentence()} <sup>2</sup>{sentence()}</div>')
+            if rng.random() < 0.3:
+                items = "".join(
+                    f'<dt>{i}.</dt><dd><div class="paratext">{sentence()}</div></dd>'
+                    for i in range(1, rng.randint(2, 5) + 1)
+                )
+                blocks.append(f"<dl>{items}</dl>")
+        if rng.random() < 0.3:
+            # Cross-reference to an earlier article, linked like on the real site
+            target = rng.randint(1, int(re.match(r"\d+", number).group()))
+            blocks.append(
+                f'<div class="paratext">Art. <a href="{DOCUMENT_PATH}/{self.prefix}-{target}">{target}</a> '
+                f"gilt entsprechend.</div>"
+            )
+        title = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 4)))
+        return (
+            f'<div class="paraheading"><div class="paranr">Art. {number}</div>'
+            f'<div class="paratitel">{title}</div></div>'
+            f'<div class="cont">{"".join(blocks)}</div>'
+        )
+
+
+class MockSite:
+    """Threaded HTTP server serving the laws of ``config`` (default: laws.yml).
+
+    Rates are probabilities per request; ``timeout_delay`` is how long a
+    "timed out" request stalls before answering, so it should exceed the
+    scraper's request timeout. Rate-limited requests get a 429 telling the
+    client to come back after ``retry_after`` seconds. ``outage`` is a
+    (start, duration) window in seconds after start() during which every
+    request gets a 503. ``whole_law=False`` answers the whole-law pages
+    (``<prefix>/true``) with 404.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0, latency=0.0, not_found_rate=0.0,
+                 error_rate=0.0, timeout_rate=0.0, timeout_delay=5.0, pages_dir=None, seed=1,
+                 rate_limit_rate=0.0, retry_after=1, outage=None, gzip_pages=True, whole_law=True):
+        config = config or load_config()
+        self.latency = latency
+        self.not_found_rate = not_found_rate
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.outage = outage
+        self.gzip_pages = gzip_pages
+        self.whole_law = whole_law
+        self.pages_dir = pages_dir
+        self.laws = {}
+        for law in config["laws"]:
+            numbering = law["numbering"]
+            valid_from = date(2024, 1, 1 + int(_stable_fraction(numbering["prefix"]) * 28))
+            self.laws[numbering["prefix"]] = SyntheticLaw(
+                numbering["prefix"], numbering["start"], numbering["end"], valid_from
+            )
+        self.stats = {"requests": 0, "200": 0, "404": 0, "429": 0, "5xx": 0, "timeouts": 0, "bytes": 0}
+        self._started = time.monotonic()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{DOCUMENT_PATH}"
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _count_bytes(self, size):
+        with self._lock:
+            self.stats["bytes"] += size
+
+    def _roll(self):
+        with self._lock:
+            self.stats["requests"] += 1
+            return self._rng.random()
+
+    def _page(self, doc):
+        if self.pages_dir:
+            path = os.path.join(self.pages_dir, f"{doc}.html")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return f.read()
+
+        if doc in self.laws:
+            return self.laws[doc].overview_html()
+        prefix, sep, rest = doc.partition("/")
+        if sep:
+            law = self.laws.get(prefix)
+            return law.law_html() if law and rest == "true" and self.whole_law else None
+        prefix, sep, number = doc.rpartition("-")
+        law = self.laws.get(prefix)
+        if sep and law and number in law.numbers:
+            return law.norm_html(number)
+        return None
+
+    def respond(self, path):
+        """Return (status, body, headers) for a request path, applying injected faults."""
+        if self.latency:
+            time.sleep(self.latency)
+
+        roll = self._roll()
+        if self.outage:
+            since = time.monotonic() - self._started - self.outage[0]
+            if 0 <= since < self.outage[1]:
+                self._count("5xx")
+                return 503, "Service Unavailable", {}
+        if roll < self.rate_limit_rate:
+            self._count("429")
+            return 429, "Too Many Requests", {"Retry-After": str(self.retry_after)}
+        roll -= self.rate_limit_rate
+        if roll < self.timeout_rate:
+            time.sleep(self.timeout_delay)
+            self._count("timeouts")
+            return 504, "timeout", {}
+        roll -= self.timeout_rate
+        if roll < self.error_rate:
+            self._count("5xx")
+            return 503, "Service Unavailable", {}
+        roll -= self.error_rate
+
+        page = None
+        if path.startswith(DOCUMENT_PATH + "/") and roll >= self.not_found_rate:
+            page = self._page(path[len(DOCUMENT_PATH) + 1:])
+        if page is None:
+            self._count("404")
+            return 404, "Not Found", {}
+        self._count("200")
+        return 200, page, {}
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, body, headers = site.respond(self.path)
+                payload = body.encode("utf-8")
+                if site.gzip_pages and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    payload = gzip.compress(payload, 6)
+                    headers["Content-Encoding"] = "gzip"
+                site._count_bytes(len(payload))
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--not-found-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of requests that stall")
+    parser.add_argument("--timeout-delay", type=float, default=30.0, help="seconds a stalled request hangs")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with HTTP 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--no-gzip", action="store_true", help="never compress responses")
+    parser.add_argument("--no-whole-law", action="store_true", help="answer whole-law pages with 404")
+    parser.add_argument("--pages", help="directory of recorded <doc>.html pages served instead of synthetic ones")
+    args = parser.parse_args(argv)
+
+    site = MockSite(
+        host=args.host, port=args.port, latency=args.latency, not_found_rate=args.not_found_rate,
+        error_rate=args.error_rate, timeout_rate=args.timeout_rate, timeout_delay=args.timeout_delay,
+        pages_dir=args.pages, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        gzip_pages=not args.no_gzip, whole_law=not args.no_whole_law,
+    )
+    print(f"Serving {len(site.laws)} laws at {site.base_url}")
+    try:
+        site._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
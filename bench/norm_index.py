@@ -0,0 +1,202 @@
+"""Memory and speed of web.norm_index against per-norm Python objects and the database.
+
+Seeds the synthetic corpus at each ``--scale`` into SQLite and holds every
+norm's number and title two ways:
+
+- dicts: ``{"number": ..., "title": ..., "is_stale": ...}`` per norm, a list
+  per law
+- index: web.norm_index.NormIndex
+
+For each it reports the traced memory, and how much of it a forked child
+copies (Private_Dirty growth in /proc/self/smaps_rollup, Linux only) after
+looking up the neighbours of every norm and running the garbage collector,
+as a gunicorn worker forked from a preloading master (after gc.freeze())
+would. It also times the neighbours of a norm from the index against the
+prev_norms/next_norms queries, after checking both return the same for
+every norm.
+
+    python -m bench.norm_index --scale 1 --scale 4
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from models import Norm
+from web import queries
+from web.norm_index import NormIndex
+
+from .corpus import seed
+
+
+def _rows(session):
+    return session.query(Norm.law_id, Norm.number, Norm.title, Norm.is_stale).order_by(
+        Norm.law_id, Norm.sort_key, Norm.number,
+    ).all()
+
+
+def _dicts(rows):
+    laws = {}
+    for law_id, number, title, is_stale in rows:
+        laws.setdefault(law_id, []).append({"number": number, "title": title, "is_stale": is_stale})
+    return laws
+
+
+def _traced(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = build()
+        return value, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def _private_dirty_kib():
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Private_Dirty:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _copied_after_fork(touch):
+    """KiB a forked child copies while running ``touch`` and a full collection."""
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        return None
+    read_fd, write_fd = os.pipe()
+    # As gunicorn.conf.py does before forking the workers
+    gc.freeze()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        before = _private_dirty_kib()
+        touch()
+        gc.collect()
+        os.write(write_fd, str(_private_dirty_kib() - before).encode())
+        os._exit(0)
+    gc.unfreeze()
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        copied = int(f.read() or 0)
+    os.waitpid(pid, 0)
+    return copied
+
+
+def _dict_neighbours(laws, law_id, number, count):
+    norms = laws[law_id]
+    i = next(i for i, norm in enumerate(norms) if norm["number"] == number)
+    before = [norm for norm in reversed(norms[:i]) if not norm["is_stale"]][:count]
+    after = [norm for norm in norms[i + 1:] if not norm["is_stale"]][:count]
+    return before[::-1], after
+
+
+def run(scale, samples):
+    with tempfile.TemporaryDirectory(prefix="bench-norm-index-") as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.sqlite')}")
+        with Session(engine) as session:
+            laws, norm_count = seed(session, scale)
+            rows = _rows(session)
+            dicts, dicts_bytes = _traced(lambda: _dicts(rows))
+            index, index_bytes = _traced(lambda: NormIndex(rows))
+
+            # The index must give the same links as the queries
+            full = {(row.law_id, row.number): row for row in session.query(
+                Norm.law_id, Norm.number, Norm.sort_key)}
+            keys = list(full)
+            for key in keys:
+                norm = full[key]
+                expected = (
+                    [tuple(r) for r in reversed(session.execute(queries.prev_norms(norm.law_id, norm, 5)).all())],
+                    [tuple(r) for r in session.execute(queries.next_norms(norm.law_id, norm, 5)).all()],
+                )
+                before, after = index.neighbours(*key, 5)
+                if ([tuple(r) for r in before], [tuple(r) for r in after]) != expected:
+                    raise RuntimeError(f"Index and queries disagree on norm {key}")
+
+            step = max(1, len(keys) // samples)
+            sample = keys[::step]
+            t0 = time.perf_counter()
+            for key in sample:
+                index.neighbours(*key, 5)
+            index_us = (time.perf_counter() - t0) / len(sample) * 1e6
+            query_us = []
+            for key in sample:
+                norm = full[key]
+                t0 = time.perf_counter()
+                session.execute(queries.prev_norms(norm.law_id, norm, 5)).all()
+                session.execute(queries.next_norms(norm.law_id, norm, 5)).all()
+                query_us.append((time.perf_counter() - t0) * 1e6)
+
+            def touch(neighbours):
+                def run_all():
+                    for key in keys:
+                        neighbours(*key, 5)
+                return run_all
+
+            # What iterating the keys and collecting copies by itself, to subtract
+            baseline = _copied_after_fork(touch(lambda law_id, number, count: None))
+            structures = {
+                "dicts": (dicts_bytes, touch(lambda *args: _dict_neighbours(dicts, *args))),
+                "index": (index_bytes, touch(index.neighbours)),
+            }
+            results = []
+            for name, (size, run_all) in structures.items():
+                copied = _copied_after_fork(run_all)
+                results.append({
+                    "scale": scale,
+                    "structure": name,
+                    "laws": laws,
+                    "norms": norm_count,
+                    "kib": round(size / 1024),
+                    "bytes_per_norm": round(size / norm_count, 1),
+                    "copied_after_fork_kib": max(0, copied - baseline) if copied is not None else None,
+                })
+            results.append({
+                "scale": scale,
+                "structure": "lookup",
+                "index_us": round(index_us, 1),
+                "queries_us": round(statistics.mean(query_us), 1),
+            })
+        engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, action="append", help="corpus copies (repeatable, default 1)")
+    parser.add_argument("--samples", type=int, default=500, help="norms timed per lookup mode")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in args.scale or [1]:
+        results.extend(run(scale, args.samples))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    header = f"{'scale':>5} {'structure':<10} {'norms':>7} {'KiB':>8} {'B/norm':>7} {'copied KiB':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if r["structure"] == "lookup":
+            continue
+        copied = r["copied_after_fork_kib"] if r["copied_after_fork_kib"] is not None else "-"
+        print(f"{r['scale']:>5} {r['structure']:<10} {r['norms']:>7} {r['kib']:>8} {r['bytes_per_norm']:>7} "
+              f"{copied:>11}")
+    print()
+    for r in results:
+        if r["structure"] == "lookup":
+            print(f"scale {r['scale']}: neighbours from the index {r['index_us']} us, "
+                  f"from prev_norms/next_norms {r['queries_us']} us")
+
+
+if __name__ == "__main__":
+    main()
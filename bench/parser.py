@@ -0,0 +1,120 @@
+"""Parse time and memory of the streaming page parsers against the tree-based ones.
+
+Builds the mock site's overview and norm pages for the laws in laws.yml and
+runs ``parse_overview`` / ``parse_norm`` (event parser, stops early) and
+``parse_overview_dom`` / ``parse_norm_dom`` (BeautifulSoup over the whole
+page) over them, checking that both return the same. Reports mean and p99
+time per page and the peak memory traced while parsing one page.
+
+``--chrome`` multiplies the navigation chrome around the content, to see how
+both scale with page size; the real site's pages are mostly chrome.
+
+    python -m bench.parser --laws 3 --chrome 1 --chrome 10
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import date
+
+from law_scraper import parser as page_parser
+from law_scraper.scraper import load_config
+
+from . import mock_site
+from .mock_site import SyntheticLaw
+
+_PAIRS = {
+    "overview": (page_parser.parse_overview, page_parser.parse_overview_dom),
+    "norm": (page_parser.parse_norm, page_parser.parse_norm_dom),
+}
+
+
+def _pages(laws, chrome):
+    original = mock_site._CHROME
+    mock_site._CHROME = original * chrome
+    try:
+        pages = {"overview": [], "norm": []}
+        for entry in load_config()["laws"][:laws]:
+            numbering = entry["numbering"]
+            law = SyntheticLaw(numbering["prefix"], numbering["start"], numbering["end"], date(2024, 1, 1))
+            pages["overview"].append(law.overview_html())
+            pages["norm"].extend(law.norm_html(number) for number in law.sorted_numbers())
+    finally:
+        mock_site._CHROME = original
+    return pages
+
+
+def _timed(fn, pages, rounds):
+    samples = []
+    for _ in range(rounds):
+        for html in pages:
+            t0 = time.perf_counter()
+            fn(html)
+            samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _peak(fn, pages):
+    """Highest traced allocation while parsing any single page, in KiB."""
+    peak = 0
+    tracemalloc.start()
+    try:
+        for html in pages:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(html)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def run(laws, chrome, rounds):
+    pages = _pages(laws, chrome)
+    results = []
+    for kind, (streaming, dom) in _PAIRS.items():
+        for html in pages[kind]:
+            if streaming(html) != dom(html):
+                raise RuntimeError(f"{kind} parsers disagree on a page")
+        size = statistics.mean(len(html) for html in pages[kind]) / 1024
+        for mode, fn in (("streaming", streaming), ("dom", dom)):
+            samples = sorted(_timed(fn, pages[kind], rounds))
+            results.append({
+                "page": kind,
+                "mode": mode,
+                "chrome": chrome,
+                "pages": len(pages[kind]),
+                "page_kib": round(size, 1),
+                "mean_ms": round(statistics.mean(samples) * 1000, 3),
+                "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+                "peak_kib": round(_peak(fn, pages[kind]), 1),
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laws", type=int, default=3, help="first N laws of laws.yml")
+    parser.add_argument("--chrome", type=int, action="append", help="chrome multiplier (repeatable, default 1)")
+    parser.add_argument("--rounds", type=int, default=3, help="times every page is parsed per mode")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for chrome in args.chrome or [1]:
+        results.extend(run(args.laws, chrome, args.rounds))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    header = (f"{'page':<9} {'mode':<10} {'chrome':>6} {'pages':>6} {'page KiB':>9} "
+              f"{'mean ms':>9} {'p99 ms':>9} {'peak KiB':>9}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['page']:<9} {r['mode']:<10} {r['chrome']:>6} {r['pages']:>6} {r['page_kib']:>9} "
+              f"{r['mean_ms']:>9} {r['p99_ms']:>9} {r['peak_kib']:>9}")
+
+
+if __name__ == "__main__":
+    main()
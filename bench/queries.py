@@ -0,0 +1,107 @@
+"""Statements per route: query budgets for CI and where the time goes.
+
+Runs the law routes against a seeded database with the page cache cleared
+before every request, so each request renders its page. Every request runs
+under web.query_stats.query_budget with the budget from BUDGETS; the script
+exits non-zero when one runs more statements, so an N+1 regression fails CI
+next to bench/explain.py. Then it prints, per route, the statements by total
+time, counted by web.query_stats (QUERY_STATS=1).
+
+    python -m bench.queries                          # temporary SQLite corpus
+    python -m bench.queries --db mysql+pymysql://...   # existing local MySQL
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("HITS_FLUSH_INTERVAL", "1000000")
+# A catalog version check in the middle of a request would count against its budget
+os.environ.setdefault("CATALOG_CHECK_INTERVAL", "1000000")
+os.environ["QUERY_STATS"] = "1"
+os.environ["QUERY_STATS_INTERVAL"] = "1000000"
+
+from .corpus import seed
+
+# route -> (url templates, most statements one request may run). Laws come from the
+# in-memory catalog and prev/next links from its norm index (NORM_INDEX, on by default).
+BUDGETS = {
+    "laws.law_index": (["/"], 0),
+    "laws.law_toc": (["/gesetz/{law}"], 2),
+    # Without a stored fragment the norms are read again with their content
+    "laws.law_full_view": (["/gesetz/{law}/gesamt"], 3),
+    "laws.norm_detail": (["/gesetz/{law}/{number}"], 4),
+    "laws.search": (["/suche?q={word}", "/suche?q=Art {number} {law}"], 3),
+}
+_WORDS = ("Frist", "Genehmigung", "Bescheid", "Widerspruch", "Gemeinde")
+
+
+def run(db_url=None, requests=20, seed_value=1):
+    tmpdir = None
+    if db_url is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="bench-queries-")
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.sqlite')}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from web import catalog, hits, query_stats
+    from web.app import create_app
+    from web.cache import cache_clear
+    from web.extensions import db
+    from models import Law, Norm
+
+    app = create_app()
+    rng = random.Random(seed_value)
+    failures = []
+    try:
+        with app.app_context():
+            if not db.inspect(db.engine).has_table("laws"):
+                seed(db.session, 1)
+            norms = db.session.query(Law.name, Norm.number).join(Norm).filter(Norm.is_stale == 0).all()
+            catalog.load()
+        query_stats.reset()
+
+        client = app.test_client()
+        for route, (templates, budget) in BUDGETS.items():
+            most = 0
+            for i in range(requests):
+                law, number = rng.choice(norms)
+                url = templates[i % len(templates)].format(law=law, number=number, word=rng.choice(_WORDS))
+                cache_clear()
+                try:
+                    with query_stats.query_budget(budget, f"GET {url}") as statements:
+                        client.get(url)
+                except query_stats.QueryBudgetExceeded as e:
+                    print(e)
+                    failures.append(route)
+                    break
+                most = max(most, len(statements))
+            else:
+                print(f"{route:<20} at most {most} statements per request, budget {budget} [ok]")
+
+        print()
+        for row in query_stats.stats():
+            print(f"{row['route']:<20} {row['count']:>5}x {row['total_ms']:>9.1f} ms total "
+                  f"{row['mean_ms']:>7.2f} ms mean {row['max_ms']:>7.2f} ms max  {row['statement'][:100]}")
+    finally:
+        hits.flush()
+        cache_clear()
+        with app.app_context():
+            db.engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="SQLAlchemy URL of an existing database instead of a temporary SQLite corpus")
+    parser.add_argument("--requests", type=int, default=20, help="requests per route")
+    args = parser.parse_args(argv)
+    failures = run(args.db, args.requests)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Render cost of the TOC and full-view pages, and worker startup time.
+
+Seeds the synthetic corpus into a temporary SQLite file and builds every
+``/gesetz/<law>`` and ``/gesetz/<law>/gesamt`` page with an empty page cache,
+first looping over the norms in the templates, then again after
+law_scraper.fragments has stored the pre-rendered fragments. Reports the CPU
+time per page for both.
+
+Worker startup is timed by creating the app in fresh interpreters, once with
+an empty JINJA_CACHE_DIR (every template compiled from source) and then with
+the bytecode the first run left behind.
+
+    python -m bench.rendering --rounds 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("HITS_FLUSH_INTERVAL", "1000000")
+
+from .corpus import seed
+
+_STARTUP = (
+    "import time; t0 = time.perf_counter(); from web.app import create_app; create_app(); "
+    "print(time.perf_counter() - t0)"
+)
+
+
+def _render_pages(app, urls, rounds):
+    from web import cache
+
+    client = app.test_client()
+    samples = {kind: [] for kind in urls}
+    for _ in range(rounds):
+        for kind, paths in urls.items():
+            for path in paths:
+                cache.cache_clear()
+                t0 = time.process_time()
+                response = client.get(path)
+                samples[kind].append(time.process_time() - t0)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} returned HTTP {response.status_code}")
+    return samples
+
+
+def _startup(env, runs):
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _STARTUP], env=env, capture_output=True, text=True, check=True)
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def run(rounds, startup_runs):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-render-") as tmpdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.sqlite')}"
+
+        from web import hits
+        from web.app import create_app
+        from web.extensions import db
+        from law_scraper.fragments import render_law_fragments
+        from models import Law
+
+        app = create_app()
+        with app.app_context():
+            seed(db.session, 1)
+            laws = db.session.query(Law.id, Law.name).order_by(Law.name).all()
+        urls = {
+            "toc": [quote(f"/gesetz/{law.name}") for law in laws],
+            "full_view": [quote(f"/gesetz/{law.name}/gesamt") for law in laws],
+        }
+
+        templates = _render_pages(app, urls, rounds)
+        with app.app_context():
+            fragments = sum(render_law_fragments(db.session, law.id) for law in laws)
+        stored = _render_pages(app, urls, rounds)
+
+        for kind in urls:
+            for mode, samples in (("templates", templates[kind]), ("fragments", stored[kind])):
+                results.append({
+                    "measure": f"{kind} ({mode})",
+                    "samples": len(samples),
+                    "mean_ms": round(statistics.mean(samples) * 1000, 2),
+                    "max_ms": round(max(samples) * 1000, 2),
+                })
+        print(f"# {len(laws)} laws, {fragments} fragments", file=sys.stderr)
+
+        env = dict(os.environ, JINJA_CACHE_DIR=os.path.join(tmpdir, "jinja"), PYTHONPATH=os.getcwd())
+        os.makedirs(env["JINJA_CACHE_DIR"])
+        cold = _startup(env, 1)
+        warm = _startup(env, startup_runs)
+        for mode, samples in (("cold bytecode", cold), ("warm bytecode", warm)):
+            results.append({
+                "measure": f"startup ({mode})",
+                "samples": len(samples),
+                "mean_ms": round(statistics.mean(samples) * 1000, 2),
+                "max_ms": round(max(samples) * 1000, 2),
+            })
+
+        hits.flush()
+        with app.app_context():
+            db.engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="times every page is built per mode")
+    parser.add_argument("--startup-runs", type=int, default=3, help="app start-ups timed with warm bytecode")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.rounds, args.startup_runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    header = f"{'measure':<26} {'samples':>8} {'mean ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['measure']:<26} {r['samples']:>8} {r['mean_ms']:>9} {r['max_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""End-to-end scraper benchmark against the local mock site.
+
+Starts ``bench.mock_site.MockSite``, runs ``law_scraper.scraper.main`` against
+it with a temporary SQLite database and reports request throughput plus the
+time spent parsing pages and writing norms.
+
+    python -m bench.scraper --laws 5 --latency 0.01 --error-rate 0.01
+    python -m bench.scraper --laws 10 --latency 0.02 --parallel-laws 4
+    python -m bench.scraper --laws 3 --rate-limit-rate 0.05 --outage 2 5
+    python -m bench.scraper --laws 5 --latency 0.02 --fetch whole_law
+
+``--views`` gives the laws random view counts before the run and, with
+``--time-budget``, reports how many of all views went to laws the run got to.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+from law_scraper import scraper
+from law_scraper.scraper import load_config
+from models import Law, Norm
+
+from .mock_site import MockSite
+
+
+class _Timer:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+    def wrap(self, fn):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - t0
+                self.calls += 1
+        return timed
+
+    def report(self):
+        mean = self.seconds / self.calls * 1000 if self.calls else 0.0
+        return {"calls": self.calls, "total_s": round(self.seconds, 3), "mean_ms": round(mean, 3)}
+
+
+@contextmanager
+def _instrumented(**timers):
+    """Temporarily route the scraper's module-level functions through timers."""
+    originals = {name: getattr(scraper, name) for name in timers}
+    for name, timer in timers.items():
+        setattr(scraper, name, timer.wrap(originals[name]))
+    try:
+        yield
+    finally:
+        for name, fn in originals.items():
+            setattr(scraper, name, fn)
+
+
+def _seed_views(db_url, config, seed):
+    """Create the laws up front with skewed view counts, as if they had been checked a day ago."""
+    import random
+
+    from law_scraper.db import init_db, close_db
+
+    rng = random.Random(seed)
+    checked = datetime.datetime.now() - datetime.timedelta(days=1)
+    session = init_db(db_url)
+    for law in config["laws"]:
+        session.add(Law(name=law["id"], description=law["name"], views=int(rng.paretovariate(1.2) * 10),
+                        last_checked=checked))
+    session.commit()
+    close_db(session)
+
+
+def run(laws=5, latency=0.0, not_found_rate=0.0, error_rate=0.0, timeout_rate=0.0,
+        retries=3, request_timeout=2.0, pages_dir=None, db_url=None, parallel_laws=1, time_budget=None,
+        views=False, rate_limit_rate=0.0, retry_after=1, outage=None, gzip_pages=True, http2=False,
+        fetch="per_norm", whole_law=True):
+    config = load_config()
+    config["laws"] = config["laws"][:laws]
+    config["global"] = {"retries": retries, "delay_between_requests": 0, "request_timeout": request_timeout,
+                        "parallel_laws": parallel_laws, "time_budget_minutes": time_budget, "http2": http2,
+                        "fetch": fetch, "breaker_cooldown": 2}  # short runs; the default is a minute
+
+    tmpdir = None
+    if db_url is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="bench-scraper-")
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.sqlite')}"
+
+    parse_timer, overview_timer, split_timer, write_timer = _Timer(), _Timer(), _Timer(), _Timer()
+    site = MockSite(
+        config, latency=latency, not_found_rate=not_found_rate, error_rate=error_rate,
+        timeout_rate=timeout_rate, timeout_delay=request_timeout * 2, pages_dir=pages_dir,
+        rate_limit_rate=rate_limit_rate, retry_after=retry_after, outage=outage, gzip_pages=gzip_pages,
+        whole_law=whole_law,
+    )
+    try:
+        if views:
+            _seed_views(db_url, config, 1)
+        with site, _instrumented(parse_norm=parse_timer, parse_overview=overview_timer, split_law=split_timer,
+                                 save_norm=write_timer):
+            config["base_url"] = site.base_url
+            started = time.time()
+            t0 = time.perf_counter()
+            scraper.main(config, db_url)
+            elapsed = time.perf_counter() - t0
+
+        engine = create_engine(db_url)
+        with Session(engine) as session:
+            norms = session.query(func.count(Norm.id)).scalar()
+            checked = session.query(func.count(Law.id), func.sum(Law.views)).filter(
+                Law.last_checked >= datetime.datetime.fromtimestamp(started)
+            ).one()
+            all_views = session.query(func.sum(Law.views)).scalar() or 0
+        engine.dispose()
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    return {
+        "laws": laws,
+        "fetch": fetch,
+        "parallel_laws": parallel_laws,
+        "laws_checked": checked[0],
+        "views_covered": round((checked[1] or 0) / all_views, 3) if all_views else None,
+        "norms_saved": norms,
+        "wall_s": round(elapsed, 2),
+        "requests": site.stats["requests"],
+        "requests_per_s": round(site.stats["requests"] / elapsed, 1),
+        "responses": {k: site.stats[k] for k in ("200", "404", "429", "5xx", "timeouts")},
+        "mb_transferred": round(site.stats["bytes"] / 1024 / 1024, 2),
+        "parse_norm": parse_timer.report(),
+        "parse_overview": overview_timer.report(),
+        "split_law": split_timer.report(),
+        "save_norm": write_timer.report(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laws", type=int, default=5, help="number of laws from laws.yml to scrape")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--not-found-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with HTTP 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--outage", type=float, nargs=2, metavar=("START", "DURATION"),
+                        help="seconds into the run during which the site answers every request with 503")
+    parser.add_argument("--no-gzip", action="store_true", help="mock site never compresses responses")
+    parser.add_argument("--http2", action="store_true", help="fetch with httpx (needs httpx[http2])")
+    parser.add_argument("--fetch", choices=("per_norm", "whole_law"), default="per_norm",
+                        help="how the laws' norms are fetched (laws.yml fetch)")
+    parser.add_argument("--no-whole-law", action="store_true", help="mock site answers whole-law pages with 404")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--request-timeout", type=float, default=2.0)
+    parser.add_argument("--pages", help="directory of recorded pages for the mock site")
+    parser.add_argument("--db", help="SQLAlchemy URL to scrape into instead of a temporary SQLite file")
+    parser.add_argument("--parallel-laws", type=int, default=1, help="laws scraped at the same time")
+    parser.add_argument("--time-budget", type=float, help="minutes after which no new law is started")
+    parser.add_argument("--views", action="store_true", help="give the laws random view counts first")
+    parser.add_argument("--verbose", action="store_true", help="keep the scraper's INFO logging")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        for name in ("scraper", "law_scraper.db", "law_scraper.parser"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    result = run(
+        laws=args.laws, latency=args.latency, not_found_rate=args.not_found_rate, error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, retries=args.retries, request_timeout=args.request_timeout,
+        pages_dir=args.pages, db_url=args.db, parallel_laws=args.parallel_laws, time_budget=args.time_budget,
+        views=args.views, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, outage=args.outage,
+        gzip_pages=not args.no_gzip, http2=args.http2, fetch=args.fetch, whole_law=not args.no_whole_law,
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
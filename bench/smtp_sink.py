@@ -0,0 +1,143 @@
+"""Local SMTP stand-in that accepts and records every message.
+
+Speaks just enough SMTP for ``web.mail`` (EHLO, AUTH PLAIN/LOGIN with any
+credentials, MAIL, RCPT, DATA, NOOP, RSET, QUIT) without TLS, so run the
+app with ``SMTP_STARTTLS=0``:
+
+    python -m bench.smtp_sink --port 2525 --fail-rate 0.2
+    SMTP_HOST=127.0.0.1 SMTP_PORT=2525 SMTP_USER=x SMTP_PASSWORD=x SMTP_STARTTLS=0 flask --app web.app run
+
+``--fail-rate`` answers that share of DATA commands with a 451 so retries
+can be exercised; ``--latency`` delays every reply.
+"""
+import argparse
+import os
+import random
+import socketserver
+import threading
+import time
+
+
+class SMTPSink:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0, maildir=None, seed=1):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.maildir = maildir
+        self.messages = []
+        self.connections = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _store(self, sender, recipients, data):
+        with self._lock:
+            if self._rng.random() < self.fail_rate:
+                return False
+            self.messages.append({"from": sender, "to": recipients, "data": data})
+            if self.maildir:
+                path = os.path.join(self.maildir, f"{len(self.messages):06d}.eml")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(data)
+            return True
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                if sink.latency:
+                    time.sleep(sink.latency)
+                self.wfile.write(f"{line}\r\n".encode("utf-8"))
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                self.reply("220 smtp-sink ready")
+                sender, recipients = None, []
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw:
+                        return
+                    line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                    verb = line.split(" ", 1)[0].upper()
+                    if verb in ("EHLO", "HELO"):
+                        self.reply("250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME" if verb == "EHLO" else "250 smtp-sink")
+                    elif verb == "AUTH":
+                        args = line.split()[1:]
+                        if args and args[0].upper() == "LOGIN":
+                            # Username may come as initial response; the password is always prompted for
+                            prompts = ["334 UGFzc3dvcmQ6"] if len(args) > 1 else ["334 VXNlcm5hbWU6", "334 UGFzc3dvcmQ6"]
+                            for prompt in prompts:
+                                self.reply(prompt)
+                                self.rfile.readline()
+                        self.reply("235 accepted")
+                    elif verb == "MAIL":
+                        sender, recipients = line[10:].strip(), []
+                        self.reply("250 OK")
+                    elif verb == "RCPT":
+                        recipients.append(line[8:].strip())
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 end with <CRLF>.<CRLF>")
+                        lines = []
+                        while True:
+                            chunk = self.rfile.readline()
+                            if not chunk or chunk in (b".\r\n", b".\n"):
+                                break
+                            lines.append(chunk.decode("utf-8", "replace"))
+                        if sink._store(sender, recipients, "".join(lines)):
+                            self.reply("250 queued")
+                        else:
+                            self.reply("451 temporary failure")
+                    elif verb in ("NOOP", "RSET"):
+                        self.reply("250 OK")
+                    elif verb == "QUIT":
+                        self.reply("221 bye")
+                        return
+                    else:
+                        self.reply("502 not implemented")
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--maildir", help="directory to write received messages to as .eml files")
+    args = parser.parse_args(argv)
+
+    sink = SMTPSink(args.host, args.port, args.latency, args.fail_rate, args.maildir)
+    print(f"SMTP sink listening on {args.host}:{args.port}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink._server.server_close()
+        print(f"{len(sink.messages)} message(s) over {sink.connections} connection(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Worker startup: what importing the app costs, and how fast a restarted worker is warm.
+
+Prints an import-time report of ``import web.app`` (``python -X importtime``,
+self time summed per top-level package), then seeds the synthetic corpus and
+runs ``gunicorn web.app:app`` (with gunicorn.conf.py) with one worker in three
+setups:
+
+- plain: GUNICORN_PRELOAD=0, the worker imports the app itself
+- preload: the master imports and warms up the app, the worker is forked
+- preload+seed: as preload, with CACHE_SEED_PATH so the page cache survives
+
+For each it reports the time until the server first answers, then warms the
+cache with every TOC page, stops the worker with SIGTERM and reports the time
+from the replacement's fork until it answers, and the mean latency of the
+same TOC pages right after the restart.
+
+    python -m bench.startup
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+_SETUPS = {
+    "plain": {"GUNICORN_PRELOAD": "0"},
+    "preload": {"GUNICORN_PRELOAD": "1"},
+    "preload+seed": {"GUNICORN_PRELOAD": "1", "CACHE_SEED_PATH": None},
+}
+
+
+def import_report(env, top):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import web.app"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    self_us = defaultdict(int)
+    total_us = 0
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        package = name.split(".")[0]
+        if name.startswith("web.") or name == "web":
+            package = name
+        self_us[package] += int(self_time)
+        if name == "web.app":
+            total_us = int(cumulative)
+    rows = sorted(self_us.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total_us / 1000, [(package, us / 1000) for package, us in rows]
+
+
+def _get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def _wait_until_up(port, proc, deadline=60):
+    started = time.perf_counter()
+    while time.perf_counter() - started < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {proc.returncode}")
+        try:
+            if _get(port, "/") == 200:
+                return time.perf_counter() - started
+        except OSError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError("gunicorn did not come up")
+
+
+def _worker_pid(master):
+    import psutil
+
+    children = psutil.Process(master).children()
+    return children[0].pid if children else None
+
+
+def _timed_pages(port, paths):
+    timings = []
+    for path in paths:
+        t0 = time.perf_counter()
+        if _get(port, path) != 200:
+            raise RuntimeError(f"{path} failed")
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def run_setup(name, env, port, paths, tmpdir):
+    env = dict(env, **_SETUPS[name])
+    if "CACHE_SEED_PATH" in env:
+        env["CACHE_SEED_PATH"] = os.path.join(tmpdir, f"seed-{port}.pickle")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "web.app:app", "--bind", f"127.0.0.1:{port}", "--workers", "1"],
+        env=env, stderr=subprocess.DEVNULL,
+    )
+    try:
+        started = _wait_until_up(port, proc)
+        cold = _timed_pages(port, paths)
+
+        old_pid = _worker_pid(proc.pid)
+        os.kill(old_pid, signal.SIGTERM)
+        while _worker_pid(proc.pid) in (None, old_pid):
+            time.sleep(0.002)
+        restarted = _wait_until_up(port, proc)
+        after_restart = _timed_pages(port, paths)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "setup": name,
+        "first_response_ms": round(started * 1000, 1),
+        "cold_page_ms": round(statistics.mean(cold) * 1000, 2),
+        "restart_ms": round(restarted * 1000, 1),
+        "page_after_restart_ms": round(statistics.mean(after_restart) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=12, help="packages shown in the import report")
+    parser.add_argument("--setup", action="append", choices=list(_SETUPS), help="setup to run (repeatable, default all)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+
+    from models import Law
+    from .asgi_scaling import _free_port
+    from .corpus import seed
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as tmpdir:
+        db_url = f"sqlite:///{os.path.join(tmpdir, 'bench.sqlite')}"
+        engine = create_engine(db_url)
+        with Session(engine) as session:
+            seed(session, 1)
+            paths = [quote(f"/gesetz/{name}") for name in session.scalars(select(Law.name).order_by(Law.name))]
+        engine.dispose()
+
+        env = dict(os.environ, DATABASE_URL=db_url, SECRET_KEY="bench", HITS_FLUSH_INTERVAL="1000000",
+                   JINJA_CACHE_DIR=tmpdir, PYTHONPATH=os.getcwd())
+        total_ms, packages = import_report(env, args.top)
+        results = [run_setup(name, env, _free_port(), paths, tmpdir) for name in args.setup or list(_SETUPS)]
+
+    if args.json:
+        print(json.dumps({"import_ms": total_ms, "packages": packages, "setups": results}, indent=2))
+        return
+    print(f"import web.app: {total_ms:.0f} ms, self time by package:")
+    for package, ms in packages:
+        print(f"  {package:<28} {ms:>7.1f} ms")
+    print()
+    header = f"{'setup':<13} {'first resp ms':>13} {'cold page ms':>12} {'restart ms':>10} {'page after ms':>13}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['setup']:<13} {r['first_response_ms']:>13} {r['cold_page_ms']:>12} "
+              f"{r['restart_ms']:>10} {r['page_after_restart_ms']:>13}")
+
+
+if __name__ == "__main__":
+    main()
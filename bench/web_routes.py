@@ -0,0 +1,175 @@
+"""Benchmark for the read-only web routes.
+
+Seeds a database with the synthetic corpus from ``bench.corpus`` and drives
+``law_index``, ``law_toc``, ``law_full_view``, ``norm_detail``, ``search``
+and ``sitemap`` through the Flask test client, once with the page cache
+cleared before every request (cold) and once with it primed (warm).
+
+    python -m bench.web_routes --scale 1 --scale 10 --requests 200
+
+By default every scale gets a fresh SQLite file in a temporary directory.
+``--db`` points the run at an existing (e.g. local MySQL) database instead;
+it is seeded only when it has no laws yet.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("HITS_FLUSH_INTERVAL", "1000000")
+
+from sqlalchemy import event, func
+
+from .corpus import seed
+
+_SEARCH_TERMS = ["Art 3 BayHO", "BayHO 12", "Bay", "Gesetz", "Frist", "Behörde", "12", "Verordnung"]
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def _targets(app, rng, n):
+    from web.extensions import db
+    from models import Law, Norm
+
+    with app.app_context():
+        law_names = [name for (name,) in db.session.query(Law.name).all()]
+        norms = db.session.query(Law.name, Norm.number).join(Norm).filter(Norm.is_stale == 0).all()
+
+    sample_laws = [rng.choice(law_names) for _ in range(n)]
+    sample_norms = [rng.choice(norms) for _ in range(n)]
+    return {
+        "law_index": ["/"] * n,
+        "law_toc": [f"/gesetz/{name}" for name in sample_laws],
+        "law_full_view": [f"/gesetz/{name}/gesamt" for name in sample_laws],
+        "norm_detail": [f"/gesetz/{name}/{number}" for name, number in sample_norms],
+        "search": [f"/suche?q={rng.choice(_SEARCH_TERMS)}" for _ in range(n)],
+        "sitemap": ["/sitemap.xml"] * n,
+    }
+
+
+def _drive(client, counter, urls, cold):
+    from web.cache import cache_clear
+
+    latencies = []
+    queries = 0
+    started = time.perf_counter()
+    for url in urls:
+        if cold:
+            cache_clear()
+        before = counter.count
+        t0 = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned HTTP {response.status_code}")
+        queries += counter.count - before
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(urls),
+        "rps": round(len(urls) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "queries_per_request": round(queries / len(urls), 2),
+    }
+
+
+def run(scale, requests, db_url=None):
+    """Seed (if needed) and benchmark one corpus scale. Returns a list of result rows."""
+    tmpdir = None
+    if db_url is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="bench-web-")
+        db_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.sqlite')}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from web import hits
+    from web.app import create_app
+    from web.cache import cache_clear
+    from web.extensions import db
+    from models import Law
+
+    app = create_app()
+    try:
+        with app.app_context():
+            if db.inspect(db.engine).has_table("laws") and db.session.query(func.count(Law.id)).scalar():
+                law_count = db.session.query(func.count(Law.id)).scalar()
+                print(f"# using existing corpus: {law_count} laws", file=sys.stderr)
+            else:
+                t0 = time.perf_counter()
+                law_count, norm_count = seed(db.session, scale)
+                print(
+                    f"# seeded scale={scale}: {law_count} laws, {norm_count} norms "
+                    f"in {time.perf_counter() - t0:.1f}s",
+                    file=sys.stderr,
+                )
+            counter = _QueryCounter(db.engine)
+
+        targets = _targets(app, random.Random(scale), requests)
+        client = app.test_client()
+        results = []
+        for route, urls in targets.items():
+            cache_clear()
+            for cold in (True, False):
+                if not cold:
+                    for url in set(urls):
+                        client.get(url)
+                row = _drive(client, counter, urls, cold)
+                row.update({"scale": scale, "route": route, "cache": "cold" if cold else "warm"})
+                results.append(row)
+        return results
+    finally:
+        hits.flush()
+        cache_clear()
+        with app.app_context():
+            db.engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+def _print_table(results):
+    header = f"{'scale':>5}  {'route':<14} {'cache':<5} {'req':>5} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'q/req':>6}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['scale']:>5}  {r['route']:<14} {r['cache']:<5} {r['requests']:>5} {r['rps']:>9} "
+            f"{r['p50_ms']:>8} {r['p99_ms']:>8} {r['queries_per_request']:>6}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, action="append", help="corpus multiplier (repeatable, default 1)")
+    parser.add_argument("--requests", type=int, default=100, help="requests per route and cache state")
+    parser.add_argument("--db", help="SQLAlchemy URL of an existing database to use instead of a temporary SQLite file")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in args.scale or [1]:
+        results.extend(run(scale, args.requests, args.db))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-norm against whole-law fetching (laws.yml ``fetch``) on the mock site.
+
+Scrapes the same laws three times with bench.scraper.run, each into its own
+SQLite file:
+
+- per_norm: one request per article number of every law's range
+- whole_law: one request for the whole-law page of every law
+- fallback: whole_law while the site answers whole-law pages with 404, so
+  every law falls back to per-norm fetching
+
+and reports requests, bytes and wall time for each, and whether the whole-law
+runs stored the same norms (number, title, content, content hash, URL path) as the
+per-norm run.
+
+    python -m bench.whole_law --laws 5 --latency 0.02
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+from urllib.parse import urlsplit
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from models import Norm
+
+from .scraper import run
+
+_RUNS = {
+    "per_norm": {"fetch": "per_norm"},
+    "whole_law": {"fetch": "whole_law"},
+    "fallback": {"fetch": "whole_law", "whole_law": False},
+}
+
+
+def _stored_norms(db_url):
+    engine = create_engine(db_url)
+    with Session(engine) as session:
+        rows = session.query(Norm.number_raw, Norm.title, Norm.content, Norm.content_hash, Norm.url)
+        # Every run has its own mock site port
+        stored = sorted(row[:4] + (urlsplit(row.url).path,) for row in rows)
+    engine.dispose()
+    return stored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laws", type=int, default=5, help="number of laws from laws.yml to scrape")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every response")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    for name in ("scraper", "law_scraper.db", "law_scraper.parser"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-whole-law-") as tmpdir:
+        stored = {}
+        for name, options in _RUNS.items():
+            db_url = f"sqlite:///{os.path.join(tmpdir, name + '.sqlite')}"
+            result = run(laws=args.laws, latency=args.latency, db_url=db_url, **options)
+            stored[name] = _stored_norms(db_url)
+            results.append({
+                "run": name,
+                "requests": result["requests"],
+                "mb_transferred": result["mb_transferred"],
+                "wall_s": result["wall_s"],
+                "norms_saved": result["norms_saved"],
+                "same_as_per_norm": stored[name] == stored["per_norm"],
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    header = f"{'run':<10} {'requests':>9} {'MB':>7} {'wall s':>8} {'norms':>6} {'same norms':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['run']:<10} {r['requests']:>9} {r['mb_transferred']:>7} {r['wall_s']:>8} "
+              f"{r['norms_saved']:>6} {str(r['same_as_per_norm']):>11}")
+
+
+if __name__ == "__main__":
+    main()
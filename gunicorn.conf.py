@@ -0,0 +1,52 @@
+"""gunicorn settings, picked up from the working directory by ``gunicorn web.app:app``.
+
+With preload_app (GUNICORN_PRELOAD, default on) the master imports and warms
+up the app once, and workers are forked from it: a new or restarted worker
+starts in milliseconds and shares the master's catalog, norm index, compiled
+templates and page cache instead of loading its own. Set GUNICORN_PRELOAD=0 to have
+every worker import the app itself, e.g. to pick up code changes on a
+worker reload (HUP).
+
+With CACHE_SEED_PATH set, each worker saves its page cache there when it
+exits and every new worker loads it back (see web/cache.py).
+"""
+import gc
+import os
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+# The master must not run the mail sender; each worker starts its own after the fork
+_mail_worker = os.environ.get("MAIL_WORKER", "1") != "0"
+if preload_app:
+    os.environ["MAIL_WORKER"] = "0"
+
+# Jobs run in their own process, ``flask --app web.app jobs-worker`` (see web/jobs.py)
+os.environ["JOBS_WORKER"] = "0"
+
+
+def when_ready(server):
+    if preload_app:
+        from web.app import app, warm_up
+
+        warm_up(app)
+        # Collections in the workers would otherwise write to every object the
+        # master loaded and copy the pages they share with it
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    from web import mail
+    from web.app import app, init_worker, warm_up
+
+    if preload_app:
+        init_worker(app)
+        if _mail_worker:
+            mail.start_worker()
+    # Also picks up pages saved by workers that exited since the master started
+    warm_up(app)
+
+
+def worker_exit(server, worker):
+    from web.app import app, save_cache
+
+    save_cache(app)
@@ -1,12 +1,17 @@
+import dotenv
 import yaml
 import os
-import hashlib
 import logging
 import datetime
+import time
 from datetime import date
 from sqlalchemy import create_engine, text
-from sqlalchemy.orm import Session
-from models import Base, Law, Norm
+from sqlalchemy.orm import Session, defer
+from models import CATALOG_VERSION_KEY, Law, Norm, NormReference, NormVersion, Setting, fingerprint
+from models import compression
+from models.config import database_url
+from models.history import SNAPSHOT_INTERVAL, pack_delta, pack_snapshot, version_content
+from models.migrations import upgrade
 
 logger = logging.getLogger("law_scraper.db")
 logger.setLevel(logging.DEBUG)
@@ -34,13 +39,19 @@ def load_db_config(path="config.yml"):
 
     return config['database']
 
-def init_db():
-    db_conf = load_db_config()
+def init_db(db_url=None):
+    """Session on ``db_url``, else the web app's database (.env / DATABASE_URL / DB_*), else config.yml."""
+    if db_url is None:
+        dotenv.load_dotenv()
+        db_url = database_url()
+    if db_url is None:
+        db_conf = load_db_config()
+        db_url = f"mysql+pymysql://{db_conf['user']}:{db_conf['password']}@{db_conf.get('host', 'localhost')}/{db_conf['db']}?charset=utf8mb4"
 
-    db_url = f"mysql+pymysql://{db_conf['user']}:{db_conf['password']}@{db_conf.get('host', 'localhost')}/{db_conf['db']}?charset=utf8mb4"
     engine = create_engine(db_url, echo=False)
 
-    Base.metadata.create_all(engine)
+    upgrade(engine)
+    compression.bind(engine)
 
     session = Session(engine)
     logger.info("connected to database")
@@ -59,16 +70,23 @@ def get_or_create_law(session, law_identifier, law_description):
         logger.info(f"Neues Gesetz eingefügt: {law_identifier} (ID: {new_law.id})")
         return new_law.id
 
-def hash_content(content):
-    """Hash content using MD5 (consistent with scraper.py)."""
-    return hashlib.md5(content.encode('utf-8')).hexdigest()
-
 def save_norm(session, data):
+    """Insert or update a norm. Returns its id.
+
+    ``data['content_hash']`` defaults to models.fingerprint() of number_raw,
+    title and content. New and changed content is appended to the norm's
+    history under ``data['valid_from']``, the law's "Text gilt ab" date.
+    Without it no version is recorded; the next run that has the date
+    records the current text, if the history still lags behind it.
+    When ``data['references']`` holds resolved (law, number) pairs, the
+    norm's outgoing references are replaced along with a changed norm;
+    unchanged norms keep theirs.
+    """
     if 'last_seen' not in data or not data['last_seen']:
-        data['last_seen'] = date.today().isoformat()
+        data['last_seen'] = date.today()
 
     if 'content_hash' not in data or not data['content_hash']:
-        data['content_hash'] = hash_content(data['content'])
+        data['content_hash'] = fingerprint(data.get('number_raw'), data.get('title'), data['content'])
 
     existing_norm = session.query(Norm).filter(
         Norm.law_id == data['law_id'],
@@ -76,34 +94,174 @@ def save_norm(session, data):
     ).first()
 
     if existing_norm:
+        if existing_norm.content_hash != data['content_hash'] and fingerprint(
+            existing_norm.number_raw, existing_norm.title, existing_norm.content
+        ) == data['content_hash']:
+            # Hashed before models.fingerprint (or its FORMAT) changed: same text, only the hash is new.
+            # Versions under the old hash hold the same text; rehash them too, else the latest one looks changed.
+            if existing_norm.content_hash is not None:
+                session.query(NormVersion).filter(
+                    NormVersion.norm_id == existing_norm.id,
+                    NormVersion.content_hash == existing_norm.content_hash,
+                ).update({NormVersion.content_hash: data['content_hash']}, synchronize_session=False)
+            existing_norm.content_hash = data['content_hash']
         if existing_norm.content_hash == data['content_hash']:
+            valid_from = _valid_from(data)
+            if valid_from is not None:
+                latest = _latest_version(session, existing_norm.id)
+                if latest is not None and latest.content_hash != existing_norm.content_hash:
+                    # Changed in a run that could not read the date
+                    record_version(session, existing_norm.id, valid_from, existing_norm.title,
+                                   existing_norm.content, existing_norm.content_hash)
             existing_norm.last_seen = data['last_seen']
             session.commit()
             logger.debug(f"Unverändert: law_id={data['law_id']}, number={data['number']}")
-            return
-
+            return existing_norm.id
+
+        valid_from = _valid_from(data)
+        if valid_from is not None:
+            record_version(
+                session, existing_norm.id, valid_from, data['title'], data['content'], data['content_hash'],
+                previous=(
+                    get_law_last_modified(session, data['law_id']),
+                    existing_norm.title, existing_norm.content, existing_norm.content_hash,
+                ),
+            )
+        else:
+            logger.warning(f"Keine Fassung gespeichert (Datum unbekannt): law_id={data['law_id']}, number={data['number']}")
         existing_norm.number_raw = data['number_raw']
         existing_norm.title = data['title']
-        existing_norm.content = data['content']
+        _set_content(session, existing_norm, data['content'])
         existing_norm.url = data['url']
         existing_norm.content_hash = data['content_hash']
         existing_norm.last_seen = data['last_seen']
+        if 'references' in data:
+            replace_references(session, existing_norm.id, data['references'])
         session.commit()
         logger.info(f"Aktualisiert: law_id={data['law_id']}, number={data['number']}")
+        return existing_norm.id
     else:
         new_norm = Norm(
             law_id=data['law_id'],
             number=data['number'],
             number_raw=data['number_raw'],
             title=data['title'],
-            content=data['content'],
             url=data['url'],
             content_hash=data['content_hash'],
             last_seen=data['last_seen']
         )
+        _set_content(session, new_norm, data['content'])
         session.add(new_norm)
+        session.flush()
+        valid_from = _valid_from(data)
+        if valid_from is not None:
+            record_version(session, new_norm.id, valid_from, data['title'], data['content'], data['content_hash'])
+        if 'references' in data:
+            replace_references(session, new_norm.id, data['references'])
         session.commit()
         logger.info(f"Eingefügt: law_id={data['law_id']}, number={data['number']}")
+        return new_norm.id
+
+def _set_content(session, norm, content):
+    # Both columns, so NORM_CONTENT_COMPRESSION can be switched (or differ between processes) without stale text
+    norm.content = content
+    if not compression.COMPRESS_CONTENT:
+        norm.content_z = content
+    elif not _plain_dropped(session):
+        norm.content_plain = content
+
+def _plain_dropped(session):
+    if 'plain_dropped' not in session.info:
+        session.info['plain_dropped'] = session.get(Setting, compression.PLAIN_DROPPED_KEY) is not None
+    return session.info['plain_dropped']
+
+def _valid_from(data):
+    # Not last_seen: a made-up date would be later than the real one and block it in record_version
+    valid_from = data.get('valid_from')
+    if isinstance(valid_from, datetime.datetime):
+        return valid_from.date()
+    return valid_from
+
+def record_version(session, norm_id, valid_from, title, content, content_hash, previous=None):
+    """Append a version to a norm's history. Does not commit.
+
+    ``previous`` is the (valid_from, title, content, content_hash) being
+    replaced; it seeds the history of norms scraped before history was kept
+    and saves rebuilding the delta base. A second version under the same
+    date replaces the first. Returns whether a version was written.
+    """
+    latest = _latest_version(session, norm_id)
+    if latest is None and previous is not None and previous[0] is not None and previous[0] < valid_from:
+        prev_valid_from, prev_title, prev_content, prev_hash = previous
+        session.add(NormVersion(
+            norm_id=norm_id, valid_from=prev_valid_from, title=prev_title, content_hash=prev_hash,
+            depth=0, data=pack_snapshot(prev_content), created_at=datetime.datetime.now(),
+        ))
+        session.flush()
+        latest = _latest_version(session, norm_id)
+
+    if latest is not None and latest.content_hash == content_hash:
+        return False
+    if latest is not None and latest.valid_from > valid_from:
+        logger.warning(f"Not recording version of norm_id={norm_id} from {valid_from}: history already reaches {latest.valid_from}")
+        return False
+    if latest is not None and latest.valid_from == valid_from:
+        # Corrected text under the same date
+        session.delete(latest)
+        session.flush()
+        latest = _latest_version(session, norm_id)
+
+    if latest is None or latest.depth + 1 >= SNAPSHOT_INTERVAL:
+        depth, packed = 0, pack_snapshot(content)
+    else:
+        if previous is not None and previous[3] == latest.content_hash:
+            base = previous[2]
+        else:
+            base = version_content(session, latest)
+        depth, packed = latest.depth + 1, pack_delta(base, content)
+
+    session.add(NormVersion(
+        norm_id=norm_id, valid_from=valid_from, title=title, content_hash=content_hash,
+        depth=depth, data=packed, created_at=datetime.datetime.now(),
+    ))
+    return True
+
+def _latest_version(session, norm_id):
+    # Without its data: deltas are built from version_content(), which reads the chain itself
+    return session.query(NormVersion).options(defer(NormVersion.data)).filter(
+        NormVersion.norm_id == norm_id
+    ).order_by(NormVersion.valid_from.desc()).first()
+
+def replace_references(session, norm_id, references):
+    """Replace the outgoing references of a norm with (law, number) pairs. Does not commit."""
+    session.query(NormReference).filter(NormReference.source_norm_id == norm_id).delete(synchronize_session=False)
+    session.add_all(
+        NormReference(source_norm_id=norm_id, target_law=law, target_number=number)
+        for law, number in references
+    )
+
+def rebuild_references(session, extractor, batch_size=500):
+    """Re-extract the references of every norm from its stored content.
+
+    Only text citations can be recovered this way; links were flattened when
+    the content was stored. Returns the number of references written.
+    """
+    law_names = dict(session.query(Law.id, Law.name).all())
+    last_id = 0
+    total = 0
+    while True:
+        rows = session.query(Norm.id, Norm.law_id, Norm.number, Norm.content).filter(
+            Norm.id > last_id
+        ).order_by(Norm.id).limit(batch_size).all()
+        if not rows:
+            break
+        for row in rows:
+            references = extractor.resolve({'number': row.number, 'content': row.content}, law_names.get(row.law_id))
+            replace_references(session, row.id, references)
+            total += len(references)
+        session.commit()
+        last_id = rows[-1].id
+    return total
 
 def flag_stale_norms(session, law_id, current_date):
     """Flag norms that were not seen in the current scrape run.
@@ -155,6 +313,14 @@ def update_law_last_modified(session, law_id, new_date):
         logger.debug(f"Updated last_modified for law_id={law_id}: {new_date}")
 
 
+def update_law_last_checked(session, law_id, checked_at):
+    """Record when a scrape run last checked a law (see law_scraper.schedule)."""
+    session.query(Law).filter(Law.id == law_id).update(
+        {Law.last_checked: checked_at}, synchronize_session=False
+    )
+    session.commit()
+
+
 def bump_norms_last_seen(session, law_id, current_date):
     """Bump last_seen for all norms of a law without changing content.
 
@@ -168,6 +334,18 @@ def bump_norms_last_seen(session, law_id, current_date):
     logger.debug(f"Bumped last_seen for {updated} norm(s) of law_id={law_id}")
     return updated
 
+def bump_catalog_version(session):
+    """Publish a new catalog version so web workers reload laws and drop cached pages."""
+    version = str(time.time_ns())
+    setting = session.get(Setting, CATALOG_VERSION_KEY)
+    if setting:
+        setting.value = version
+    else:
+        session.add(Setting(key=CATALOG_VERSION_KEY, value=version))
+    session.commit()
+    logger.debug(f"Catalog version bumped to {version}")
+    return version
+
 def close_db(session):
     try:
         if session:
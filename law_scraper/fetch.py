@@ -0,0 +1,242 @@
+"""HTTP client for the scraper.
+
+FetchClient.get() returns a FetchResult instead of raising: OK with the page
+text, NOT_FOUND for 404/410, FAILED once the retries are used up, and
+CIRCUIT_OPEN without any request while the host's circuit breaker is open.
+
+- Connections are kept alive and pooled; ``pool_size`` should be at least the
+  number of threads sharing the client (``parallel_laws``).
+- Timeouts, connection errors, 429 and 5xx are retried. A ``Retry-After``
+  header (seconds or HTTP date) is honoured up to ``retry_after_max``,
+  otherwise the wait doubles from ``backoff_base`` up to ``backoff_max``,
+  ±20% jitter so parallel threads do not retry in lockstep.
+- ``breaker_threshold`` failed attempts in a row against one host open its
+  circuit for ``breaker_cooldown`` seconds; then a single request probes
+  whether the host is back.
+- ``http2=True`` sends requests over httpx with HTTP/2 multiplexing, which
+  needs ``pip install httpx[http2]``; the default transport is requests.
+"""
+import email.utils
+import enum
+import logging
+import random
+import threading
+import time
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+logger = logging.getLogger("scraper.fetch")
+
+REQUEST_TIMEOUT = 15  # seconds
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchStatus(enum.Enum):
+    OK = "ok"
+    NOT_FOUND = "not_found"
+    FAILED = "failed"
+    CIRCUIT_OPEN = "circuit_open"
+
+
+class FetchResult(NamedTuple):
+    status: FetchStatus
+    url: str
+    text: Optional[str] = None
+    http_status: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status is FetchStatus.OK
+
+
+class _Retry(Exception):
+    """A failed attempt that may be retried; ``wait`` is the server's Retry-After, if any."""
+
+    def __init__(self, message, http_status=None, wait=None):
+        super().__init__(message)
+        self.http_status = http_status
+        self.wait = wait
+
+
+class _Breaker:
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+
+def parse_retry_after(value, now=None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header value, or None if it is missing or malformed."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+
+class FetchClient:
+    def __init__(self, retries=3, timeout=REQUEST_TIMEOUT, pool_size=10, http2=False,
+                 backoff_base=2.0, backoff_max=30.0, retry_after_max=120.0,
+                 breaker_threshold=10, breaker_cooldown=60.0, sleep=time.sleep):
+        self.retries = max(1, retries)
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._sleep = sleep
+        self._breakers: dict = {}
+        self._lock = threading.Lock()
+        # Every encoding urllib3 can decode here (gzip, deflate, and br/zstd if their packages are installed)
+        headers = make_headers(accept_encoding=True)
+
+        if http2:
+            try:
+                import httpx
+            except ImportError as e:
+                raise RuntimeError("http2 needs the httpx package: pip install 'httpx[http2]'") from e
+            self._httpx = httpx
+            self._client = httpx.Client(
+                http2=True,
+                headers=headers,
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            )
+        else:
+            self._httpx = None
+            self._client = requests.Session()
+            self._client.headers.update(headers)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            self._client.mount("http://", adapter)
+            self._client.mount("https://", adapter)
+
+    @classmethod
+    def from_config(cls, settings, pool_size=None):
+        """Client for the ``global`` section of laws.yml."""
+        return cls(
+            retries=settings.get('retries', 3),
+            timeout=settings.get('request_timeout', REQUEST_TIMEOUT),
+            pool_size=pool_size or settings.get('pool_size', 10),
+            http2=settings.get('http2', False),
+            breaker_threshold=settings.get('breaker_threshold', 10),
+            breaker_cooldown=settings.get('breaker_cooldown', 60),
+        )
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, url) -> FetchResult:
+        host = urlsplit(url).netloc
+        attempts = 0
+        error = None
+        http_status = None
+        while attempts < self.retries:
+            if not self._allow(host):
+                return FetchResult(FetchStatus.CIRCUIT_OPEN, url, attempts=attempts, error=f"circuit open for {host}")
+            attempts += 1
+            try:
+                http_status, text = self._send(url)
+            except _Retry as e:
+                error, http_status = str(e), e.http_status
+                self._record(host, success=False)
+                if attempts >= self.retries:
+                    break
+                if e.wait is not None and e.wait > self.retry_after_max:
+                    logger.warning(f"{error} for {url}, Retry-After {e.wait:.0f}s is too long, giving up")
+                    break
+                wait = e.wait if e.wait is not None else self._backoff(attempts)
+                logger.warning(f"{error} for {url}, retry {attempts}/{self.retries} in {wait:.1f}s")
+                self._sleep(wait)
+                continue
+            except Exception as e:
+                self._record(host, success=False)
+                logger.error(f"Request failed for {url}: {e}")
+                return FetchResult(FetchStatus.FAILED, url, attempts=attempts, error=str(e))
+
+            self._record(host, success=True)
+            if http_status == 200:
+                return FetchResult(FetchStatus.OK, url, text=text, http_status=http_status, attempts=attempts)
+            if http_status in (404, 410):
+                return FetchResult(FetchStatus.NOT_FOUND, url, http_status=http_status, attempts=attempts)
+            logger.error(f"HTTP {http_status} for {url}")
+            return FetchResult(FetchStatus.FAILED, url, http_status=http_status, attempts=attempts,
+                               error=f"HTTP {http_status}")
+
+        logger.error(f"Max retries reached for {url}")
+        return FetchResult(FetchStatus.FAILED, url, http_status=http_status, attempts=attempts, error=error)
+
+    def _send(self, url):
+        """(status, text) of one GET; raises _Retry for failures worth another attempt."""
+        if self._httpx is not None:
+            try:
+                response = self._client.get(url)
+            except self._httpx.TimeoutException as e:
+                raise _Retry(f"Timeout ({e})") from e
+            except self._httpx.TransportError as e:
+                raise _Retry(f"Connection error ({e})") from e
+            status = response.status_code
+        else:
+            try:
+                response = self._client.get(url, timeout=self.timeout)
+            except requests.exceptions.Timeout as e:
+                raise _Retry(f"Timeout ({e})") from e
+            except requests.exceptions.ConnectionError as e:
+                raise _Retry(f"Connection error ({e})") from e
+            status = response.status_code
+        if status in _RETRY_STATUSES:
+            raise _Retry(f"HTTP {status}", http_status=status, wait=parse_retry_after(response.headers.get("Retry-After")))
+        return status, response.text if status == 200 else None
+
+    def _backoff(self, attempts) -> float:
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _allow(self, host) -> bool:
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None or breaker.failures < self.breaker_threshold:
+                return True
+            if time.monotonic() < breaker.open_until or breaker.probing:
+                return False
+            # Cooldown over: let one request through to see whether the host is back
+            breaker.probing = True
+            return True
+
+    def _record(self, host, success) -> None:
+        with self._lock:
+            breaker = self._breakers.setdefault(host, _Breaker())
+            was_open = breaker.failures >= self.breaker_threshold
+            breaker.probing = False
+            if success:
+                if was_open:
+                    logger.info(f"{host} is answering again, circuit closed")
+                breaker.failures = 0
+                return
+            breaker.failures += 1
+            if breaker.failures >= self.breaker_threshold:
+                breaker.open_until = time.monotonic() + self.breaker_cooldown
+                if not was_open:
+                    logger.error(
+                        f"{breaker.failures} failed requests in a row to {host}, "
+                        f"pausing it for {self.breaker_cooldown:.0f}s"
+                    )
@@ -0,0 +1,98 @@
+"""Pre-rendered law page fragments (models.LawFragment).
+
+After scraping a law, the scraper renders its TOC list and its full-view
+articles with the web app's fragment templates (web/templates/fragments/).
+The web app splices the stored HTML into toc.html and full_view.html instead
+of looping over every norm. Render all laws at once, e.g. after changing a
+fragment template (bump models.fragment.FRAGMENT_FORMAT as well):
+
+    python -m law_scraper.fragments
+"""
+import datetime
+import logging
+import os
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from models import Law, LawFragment, Norm, fragment_source_hash
+
+logger = logging.getLogger("law_scraper.fragments")
+
+_TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web", "templates")
+
+FRAGMENT_TEMPLATES = {
+    "toc": "fragments/toc_list.html",
+    "articles": "fragments/articles.html",
+}
+
+_env = None
+
+
+def _environment():
+    global _env
+    if _env is None:
+        # Same autoescaping as Flask, so fragments match what the app renders itself
+        _env = Environment(
+            loader=FileSystemLoader(_TEMPLATES),
+            autoescape=select_autoescape(["html", "htm", "xml", "xhtml", "svg"]),
+        )
+    return _env
+
+
+def render_law_fragments(session, law_id):
+    """Render the fragments of one law whose norms changed since they were stored.
+
+    Returns the number of fragments written.
+    """
+    law = session.query(Law.id, Law.name).filter(Law.id == law_id).first()
+    if not law:
+        return 0
+    norms = session.query(
+        Norm.number, Norm.number_raw, Norm.title, Norm.content, Norm.content_hash,
+    ).filter(
+        Norm.law_id == law_id,
+        Norm.is_stale == 0,
+    ).order_by(Norm.sort_key, Norm.number).all()
+    if not norms:
+        # The pages show their empty state without a fragment
+        return 0
+
+    existing = {
+        fragment.kind: fragment
+        for fragment in session.query(LawFragment).filter(LawFragment.law_id == law_id)
+    }
+    now = datetime.datetime.now()
+    written = 0
+    for kind, template in FRAGMENT_TEMPLATES.items():
+        source_hash = fragment_source_hash(kind, law.name, norms)
+        fragment = existing.get(kind)
+        if fragment and fragment.source_hash == source_hash:
+            continue
+        html = _environment().get_template(template).render(law=law, norms=norms)
+        if fragment:
+            fragment.source_hash = source_hash
+            fragment.html = html
+            fragment.rendered_at = now
+        else:
+            session.add(LawFragment(law_id=law_id, kind=kind, source_hash=source_hash, html=html, rendered_at=now))
+        written += 1
+    session.commit()
+    return written
+
+
+def main(db_url=None):
+    from .db import init_db, close_db
+
+    session = init_db(db_url)
+    try:
+        written = 0
+        for (law_id,) in session.query(Law.id).order_by(Law.name).all():
+            written += render_law_fragments(session, law_id)
+        logger.info(f"Rendered {written} fragment(s)")
+    finally:
+        close_db(session)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(asctime)s | %(name)s | %(message)s")
+    main()
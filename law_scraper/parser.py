@@ -1,10 +1,16 @@
 from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 import re
 import logging
 from datetime import date
 
+from .references import document_id
+
 logger = logging.getLogger("law_scraper.parser")
 
+# Pages are fed to the event parsers in pieces, so they stop tokenizing soon after they are done
+_CHUNK = 16384
+
 SUPERSCRIPT_MAP = {
     '0': '⁰', '1': '¹', '2': '²', '3': '³', '4': '⁴',
     '5': '⁵', '6': '⁶', '7': '⁷', '8': '⁸', '9': '⁹'
@@ -56,9 +62,31 @@ def process_dl(dl_elem):
     return "<ol>" + "\n".join(items) + "</ol>"
 
 def parse_norm(html):
+    """Extract number, title, content and link targets from a norm page.
+
+    Only the ``paraheading`` and ``cont`` divs are parsed into a tree; the
+    rest of the page (navigation, footer) is just tokenized, and not even
+    that once both divs have been seen. Same result as parse_norm_dom().
+    """
+    sources = locate_divs(html, ('paraheading', 'cont'))
+    para_heading = _fragment_div(sources.get('paraheading'), 'paraheading')
+    container = _fragment_div(sources.get('cont'), 'cont')
+    return _extract_norm(para_heading, container)
+
+
+def parse_norm_dom(html):
+    """parse_norm() on a tree of the whole page, the way it was done before locate_divs()."""
     soup = BeautifulSoup(html, 'html.parser')
+    return _extract_norm(soup.find('div', class_='paraheading'), soup.find('div', class_='cont'))
+
 
-    para_heading = soup.find('div', class_='paraheading')
+def _fragment_div(source, css_class):
+    if source is None:
+        return None
+    return BeautifulSoup(source, 'html.parser').find('div', class_=css_class)
+
+
+def _extract_norm(para_heading, container):
     if not para_heading:
         raise ParseError("No 'paraheading' div found — page may not contain a norm")
 
@@ -74,7 +102,6 @@ def parse_norm(html):
     title = title_div.get_text(strip=True) if title_div else ''
 
     content_parts = []
-    container = soup.find('div', class_='cont')
     if not container:
         logger.warning(f"No 'cont' div found for norm '{number_text}' — content will be empty")
         return {
@@ -125,15 +152,40 @@ def parse_norm(html):
 
     content_html = "\n".join(content_parts)
 
+    # Link targets are flattened to text in the content; keep the documents they point to
+    links = []
+    for a in container.find_all('a', href=True):
+        doc = document_id(a['href'])
+        if doc and doc not in links:
+            links.append(doc)
+
     return {
         'number': number_text,
         'number_raw': number_raw,
         'title': title,
         'content': content_html,
-        'references': []
+        'references': links
     }
 
 def parse_overview(html):
+    """The "Text gilt ab" date of a law overview page, or None.
+
+    Streams the page through _OverviewParser, which keeps only the text of
+    the div being checked and stops at the end of ``#doc-metadata``. Same
+    result as parse_overview_dom().
+    """
+    parser = _OverviewParser()
+    try:
+        for i in range(0, len(html), _CHUNK):
+            parser.feed(html[i:i + _CHUNK])
+        parser.close()
+    except _Done:
+        pass
+    return parser.result()
+
+
+def parse_overview_dom(html):
+    """parse_overview() on a tree of the whole page, the way it was done before _OverviewParser."""
     soup = BeautifulSoup(html, 'html.parser')
 
     metadata = soup.find('div', id='doc-metadata')
@@ -151,4 +203,207 @@ def parse_overview(html):
             except ValueError:
                 return None
 
-    return None
\ No newline at end of file
+    return None
+
+
+def _date_in(text):
+    """(matched, date) for the text of one div, as parse_overview_dom() checks it."""
+    if 'Text gilt ab:' not in text:
+        return False, None
+    m = re.search(r'(\d{2})\.(\d{2})\.(\d{4})', text)
+    if not m:
+        return False, None
+    day, month, year = map(int, m.groups())
+    try:
+        return True, date(year, month, day)
+    except ValueError:
+        return True, None
+
+
+class _Done(Exception):
+    """Raised by the streaming parsers once they have what they need."""
+
+
+class _OverviewParser(HTMLParser):
+    """Event parser for parse_overview().
+
+    parse_overview_dom() returns the date in the first div, in document order,
+    whose text has "Text gilt ab:" and a date, searching only below
+    ``#doc-metadata`` if the page has one. A div's text contains that of its
+    descendants, so only the outermost divs of the searched scope need to be
+    checked, each when it ends; their text is dropped afterwards.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._strings = []  # stripped text of the div being collected, like get_text(" ", strip=True)
+        self._data = []  # adjacent data events, joined into one string as BeautifulSoup does
+        self._divs = []  # per open div: (index into _strings, is #doc-metadata)
+        self._hidden = 0  # inside <script>, <style> or <template>, which get_text() skips
+        self._metadata_depth = None
+        self._metadata_seen = False
+        self._metadata_match = None
+        self._page_match = None
+
+    def result(self):
+        match = self._metadata_match if self._metadata_seen else self._page_match
+        return match[1] if match else None
+
+    def _flush(self):
+        if self._data:
+            text = ''.join(self._data).strip()
+            self._data = []
+            if text and self._divs:
+                self._strings.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in ('script', 'style', 'template'):
+            self._hidden += 1
+        elif tag == 'div':
+            is_metadata = not self._metadata_seen and dict(attrs).get('id') == 'doc-metadata'
+            if is_metadata:
+                self._metadata_seen = True
+                self._metadata_depth = len(self._divs) + 1
+            self._divs.append((len(self._strings), is_metadata))
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in ('script', 'style', 'template'):
+            self._hidden = max(0, self._hidden - 1)
+            return
+        if tag != 'div' or not self._divs:
+            return
+        start, is_metadata = self._divs.pop()
+        if is_metadata:
+            # Nothing outside #doc-metadata counts once the page has one
+            raise _Done()
+        depth = len(self._divs) + 1
+        if self._metadata_depth is not None and depth == self._metadata_depth + 1:
+            match = _date_in(' '.join(self._strings[start:]))
+            del self._strings[start:]
+            if match[0]:
+                self._metadata_match = match
+                raise _Done()
+        elif depth == 1:
+            if self._page_match is None and not self._metadata_seen:
+                match = _date_in(' '.join(self._strings))
+                if match[0]:
+                    self._page_match = match
+            self._strings.clear()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_data(self, data):
+        if not self._hidden:
+            self._data.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def close(self):
+        super().close()
+        # A truncated page: BeautifulSoup ends the divs still open at the end
+        while self._divs:
+            self.handle_endtag('div')
+
+
+class _DivLocator(HTMLParser):
+    """Event parser for locate_divs() and split_law(): tracks div nesting and nothing else."""
+
+    def __init__(self, html, classes, every=False):
+        super().__init__(convert_charrefs=False)
+        self.html = html
+        self.found = []  # [class, start offset, source once the div has ended], in document order
+        self._wanted = set(classes)
+        self._every = every
+        self._open = []  # per open div: its entry in found, or None
+        self._pending = 0
+        self._line_offsets = None
+
+    def _offset(self):
+        if self._line_offsets is None:
+            self._line_offsets = [0] + [m.end() for m in re.finditer('\n', self.html)]
+        line, column = self.getpos()
+        return self._line_offsets[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'div':
+            return
+        entry = None
+        if self._wanted:
+            classes = (dict(attrs).get('class') or '').split()
+            found = next((c for c in classes if c in self._wanted), None)
+            if found:
+                if not self._every:
+                    self._wanted.discard(found)
+                entry = [found, self._offset(), None]
+                self.found.append(entry)
+                self._pending += 1
+        self._open.append(entry)
+
+    def handle_endtag(self, tag):
+        if tag != 'div' or not self._open:
+            return
+        entry = self._open.pop()
+        if entry:
+            end = self.html.index('>', self._offset()) + 1
+            entry[2] = self.html[entry[1]:end]
+            self._pending -= 1
+            if not self._every and not self._wanted and not self._pending:
+                raise _Done()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+
+def _locate(html, classes, every):
+    """(class, source) of the divs carrying one of ``classes``, in document order."""
+    locator = _DivLocator(html, classes, every)
+    try:
+        for i in range(0, len(html), _CHUNK):
+            locator.feed(html[i:i + _CHUNK])
+        locator.close()
+    except _Done:
+        pass
+    # A div that never ends runs to the end of the page, as it would in BeautifulSoup
+    return [(css_class, source if source is not None else html[start:])
+            for css_class, start, source in locator.found]
+
+
+def locate_divs(html, classes):
+    """Source of the first div carrying each of ``classes``, e.g. {'cont': '<div class="cont">...</div>'}.
+
+    Stops reading the page once every one of them has ended.
+    """
+    return dict(_locate(html, classes, every=False))
+
+
+def split_law(html):
+    """parse_norm() results for every norm on a whole-law page, in page order.
+
+    Each ``paraheading`` div is taken with the first ``cont`` div after it
+    and before the next heading. Raises ParseError if the page has no norm or
+    one of them cannot be parsed, so the caller can fetch the norms one by one.
+    """
+    pairs = []
+    for css_class, source in _locate(html, ('paraheading', 'cont'), every=True):
+        if css_class == 'paraheading':
+            pairs.append([source, None])
+        elif pairs and pairs[-1][1] is None:
+            pairs[-1][1] = source
+    if not pairs:
+        raise ParseError("No 'paraheading' div found — page may not contain a law")
+    return [
+        _extract_norm(_fragment_div(heading, 'paraheading'), _fragment_div(container, 'cont'))
+        for heading, container in pairs
+    ]
@@ -0,0 +1,174 @@
+"""Citation extraction for norms.
+
+Turns citations such as "Art. 12 Abs. 2 BayBO", "Art. 3 und 4 dieses
+Gesetzes", "Art. 5 bis 8" or a bare "Art. 7" (same law) into ``(law, number)`` pairs, where
+``law`` is the id from laws.yml (``Law.name``). Links to other documents on
+gesetze-bayern.de, collected by ``parse_norm``, are resolved as well.
+Citations of laws that are not in laws.yml are dropped.
+
+Rebuild the edge table from stored content (e.g. after extending laws.yml):
+
+    python -m law_scraper.references
+"""
+import html
+import logging
+import re
+
+logger = logging.getLogger("law_scraper.references")
+
+_KEYWORD = re.compile(r"(?<![\w.])(?:Art(?:ikel|\.)|Artikeln?|§§?)\s*(?=\d)")
+_NUMBER = re.compile(r"(\d+[a-z]?)(?![\w])")
+_QUALIFIER = re.compile(r"\s*(?:Abs\.|Absatz|Satz|S\.|Nr\.|Nummer|Buchst\.|Halbsatz|Alt\.|Var\.)\s*(?=\d)")
+_CONJUNCTION = re.compile(r"\s*(?:,|und|oder|bis|sowie)\s*")
+_OWN_LAW = re.compile(r"\s*(?:dieses Gesetzes|dieser Verordnung|dieser Satzung|der Verfassung)\b")
+# "des Bürgerlichen Gesetzbuchs", "GG", "BGB": another law we cannot resolve
+_OTHER_LAW = re.compile(r"\s*(?:(?:des|der|eines|einer)\b|[A-ZÄÖÜ][\w-]*[A-Z])")
+_TAGS = re.compile(r"<[^>]+>")
+# "Art. 1 bis 5" cites the articles in between as well; longer spans are more likely a misread
+_MAX_RANGE = 50
+_DOCUMENT_LINK = re.compile(r"/Content/Document/([^/?#]+)")
+
+
+def build_aliases(config):
+    """Map every name a law is cited by to its laws.yml id.
+
+    Uses the id, the document prefix and, for ids like "Bayerische
+    Haushaltsordnung – BayHO", the abbreviation after the dash.
+    """
+    aliases = {}
+    for law in config["laws"]:
+        law_id = law["id"]
+        prefix = law["numbering"]["prefix"]
+        names = {law_id, prefix, prefix.replace("_", " ")}
+        if " – " in law_id:
+            names.add(law_id.rsplit(" – ", 1)[1])
+        for name in names:
+            if len(name) >= 2:
+                aliases[name] = law_id
+    return aliases
+
+
+class ReferenceExtractor:
+    """Extracts citations with a fixed alias map; build once per scrape run."""
+
+    def __init__(self, aliases):
+        self.aliases = aliases
+        names = sorted(aliases, key=len, reverse=True)
+        self._alias = re.compile(r"\s*(" + "|".join(map(re.escape, names)) + r")(?![\w-])") if names else None
+
+    def _law_at(self, text, pos, own_law):
+        if self._alias:
+            m = self._alias.match(text, pos)
+            if m:
+                return self.aliases[m.group(1)]
+        if _OWN_LAW.match(text, pos):
+            return own_law
+        if _OTHER_LAW.match(text, pos):
+            return None
+        return own_law
+
+    def from_text(self, content, own_law=None):
+        """Citations in ``content`` (norm HTML) as (law, number) pairs, in order of appearance."""
+        text = html.unescape(_TAGS.sub(" ", content or ""))
+        found = []
+        pos = 0
+        while True:
+            m = _KEYWORD.search(text, pos)
+            if not m:
+                break
+            pos = m.end()
+            numbers = []
+            in_qualifier = False
+            range_start = None
+            while True:
+                number = _NUMBER.match(text, pos)
+                if not number:
+                    break
+                if not in_qualifier:
+                    if range_start is not None:
+                        numbers.extend(_between(range_start, number.group(1)))
+                    numbers.append(number.group(1))
+                range_start = None
+                pos = number.end()
+
+                qualifier = _QUALIFIER.match(text, pos)
+                if qualifier:
+                    in_qualifier = True
+                    pos = qualifier.end()
+                    continue
+                conjunction = _CONJUNCTION.match(text, pos)
+                if not conjunction:
+                    break
+                keyword = _KEYWORD.match(text, conjunction.end())
+                is_range = conjunction.group().strip() == "bis"
+                if keyword:
+                    # "Art. 3 Abs. 1 und Art. 4": a new article after qualifiers
+                    if is_range and not in_qualifier:
+                        range_start = number.group(1)
+                    in_qualifier = False
+                    pos = keyword.end()
+                elif _NUMBER.match(text, conjunction.end()):
+                    # "Abs. 1 bis 3" spans paragraphs, not articles
+                    if is_range and not in_qualifier:
+                        range_start = number.group(1)
+                    pos = conjunction.end()
+                else:
+                    break
+
+            law = self._law_at(text, pos, own_law)
+            if law is not None:
+                found.extend((law, number) for number in numbers)
+        return found
+
+    def from_links(self, documents):
+        """Resolve linked document ids such as "BayBO-12" to (law, number) pairs."""
+        found = []
+        for document in documents:
+            prefix, sep, number = document.rpartition("-")
+            law = self.aliases.get(prefix)
+            if sep and law and _NUMBER.fullmatch(number):
+                found.append((law, number))
+        return found
+
+    def resolve(self, data, own_law):
+        """All distinct references of a parsed norm, excluding the norm itself."""
+        seen = set()
+        references = []
+        candidates = self.from_links(data.get("references", [])) + self.from_text(data.get("content"), own_law)
+        for reference in candidates:
+            if reference in seen or reference == (own_law, data.get("number")):
+                continue
+            seen.add(reference)
+            references.append(reference)
+        return references
+
+
+def _between(first, last):
+    """Article numbers strictly between ``first`` and ``last`` of a range citation; only plain numbers expand."""
+    if not (first.isdigit() and last.isdigit()) or not 0 < int(last) - int(first) <= _MAX_RANGE:
+        return []
+    return [str(number) for number in range(int(first) + 1, int(last))]
+
+
+def document_id(href):
+    """Document id of a gesetze-bayern.de link ("/Content/Document/BayBO-12?hl=true" -> "BayBO-12")."""
+    m = _DOCUMENT_LINK.search(href or "")
+    return m.group(1) if m else None
+
+
+def main(db_url=None):
+    from .db import init_db, close_db, rebuild_references
+    from .scraper import load_config
+
+    session = init_db(db_url)
+    try:
+        extractor = ReferenceExtractor(build_aliases(load_config()))
+        count = rebuild_references(session, extractor)
+        logger.info(f"Rebuilt {count} reference(s)")
+    finally:
+        close_db(session)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(asctime)s | %(name)s | %(message)s")
+    main()
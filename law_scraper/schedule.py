@@ -0,0 +1,73 @@
+"""Which laws a scrape run checks, and in which order.
+
+Every law in laws.yml has a refresh interval (``refresh_interval_hours``,
+per law or under ``global``; 0, the default, means every run). A law is due
+once that much time has passed since its ``last_checked``; laws never
+checked are due right away. Due laws are ordered by
+
+    priority = overdue * (1 + log(1 + views)) * (1 + recently_changed)
+
+where ``overdue`` is the time since the last check in intervals (one day for
+laws without an interval), ``views`` is ``Law.views`` and ``recently_changed``
+falls from 1 to 0 over the year after the law's "Text gilt ab" date. Read
+laws that changed lately come first, so a run cut short by its time budget
+(``time_budget_minutes``) leaves the least read ones for the next run.
+"""
+import datetime
+import math
+from typing import NamedTuple, Optional
+
+from models import Law
+
+_DEFAULT_SCALE_HOURS = 24  # how "overdue" is measured for laws refreshed on every run
+_RECENT_CHANGE_DAYS = 365
+
+
+class ScheduledLaw(NamedTuple):
+    law: dict  # entry of config['laws']
+    priority: float
+    due: bool
+    last_checked: Optional[datetime.datetime]
+
+
+def refresh_interval(law, config) -> float:
+    """Refresh interval of a laws.yml entry in hours."""
+    default = config.get('global', {}).get('refresh_interval_hours', 0)
+    return float(law.get('refresh_interval_hours', default) or 0)
+
+
+def priority(views, last_checked, last_modified, interval_hours, now) -> float:
+    if last_checked is None:
+        return math.inf
+    scale = interval_hours or _DEFAULT_SCALE_HOURS
+    overdue = max((now - last_checked).total_seconds(), 0) / 3600 / scale
+    recently_changed = 0.0
+    if last_modified is not None:
+        if isinstance(last_modified, datetime.datetime):
+            last_modified = last_modified.date()
+        days = (now.date() - last_modified).days
+        recently_changed = max(0.0, 1 - max(days, 0) / _RECENT_CHANGE_DAYS)
+    return overdue * (1 + math.log1p(views or 0)) * (1 + recently_changed)
+
+
+def plan(session, config, now=None) -> list:
+    """All laws of ``config`` as ScheduledLaw, due ones first, by descending priority."""
+    now = now or datetime.datetime.now()
+    stored = {
+        row.name: row
+        for row in session.query(Law.name, Law.views, Law.last_modified, Law.last_checked)
+    }
+    scheduled = []
+    for law in config['laws']:
+        row = stored.get(law['id'])
+        last_checked = row.last_checked if row else None
+        interval = refresh_interval(law, config)
+        due = last_checked is None or now - last_checked >= datetime.timedelta(hours=interval)
+        scheduled.append(ScheduledLaw(
+            law=law,
+            priority=priority(row.views if row else 0, last_checked, row.last_modified if row else None, interval, now),
+            due=due,
+            last_checked=last_checked,
+        ))
+    # sorted() is stable: laws of equal priority keep their laws.yml order
+    return sorted(scheduled, key=lambda entry: (not entry.due, -entry.priority))
@@ -1,16 +1,24 @@
+import re
+import sys
 import time
 import yaml
 import os
-import requests
-import hashlib
 import logging
+import datetime
+import threading
 from datetime import date
-from models import Law, Norm
-
-from .parser import parse_norm, parse_overview, ParseError
+from sqlalchemy.orm import Session
+from models import Law, Norm, fingerprint
+
+from .fetch import FetchClient, FetchStatus
+from .parser import parse_norm, parse_overview, split_law, ParseError
+from .fragments import render_law_fragments
+from .references import ReferenceExtractor, build_aliases
+from .schedule import plan
 from .db import (
     save_norm, init_db, get_or_create_law, close_db, flag_stale_norms,
-    get_law_last_modified, update_law_last_modified, bump_norms_last_seen,
+    get_law_last_modified, update_law_last_modified, update_law_last_checked, bump_norms_last_seen,
+    bump_catalog_version,
 )
 
 logger = logging.getLogger("scraper")
@@ -22,9 +30,13 @@ formatter = logging.Formatter("[%(levelname)s] %(asctime)s | %(name)s | %(messag
 console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
-REQUEST_TIMEOUT = 15  # seconds
 _dir = os.path.dirname(os.path.abspath(__file__))
 
+_SUFFIXES = "abcdefghijklmnopqrstuvwxyz"
+
+# Where the site serves a whole law on one page, relative to base_url
+WHOLE_LAW_PATH = "{prefix}/true"
+
 
 def load_config():
     """Load laws.yml from the package directory."""
@@ -32,43 +44,19 @@ def load_config():
     with open(path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
-def fetch_with_retries(http_session, url, retries):
-    tries = 0
-    while tries < retries:
-        try:
-            response = http_session.get(url, timeout=REQUEST_TIMEOUT)
-        except requests.exceptions.Timeout:
-            tries += 1
-            logger.warning(f"Timeout for {url}, retry {tries}/{retries}")
-            time.sleep(min(2 ** tries, 30))
-            continue
-        except requests.exceptions.ConnectionError as e:
-            tries += 1
-            logger.warning(f"Connection error for {url}: {e}, retry {tries}/{retries}")
-            time.sleep(min(2 ** tries, 30))
-            continue
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed for {url}: {e}")
-            return "failed"
-
-        if response.status_code == 200:
-            return response
-        elif response.status_code == 404:
-            return None
-        else:
-            tries += 1
-            logger.warning(f"HTTP {response.status_code} for {url}, retry {tries}/{retries}")
-            time.sleep(min(2 ** tries, 30))
+def scrape_norm(client, url, prefix, number, db_law_id, session, extractor=None, valid_from=None):
+    """Fetch, parse and save one norm page.
 
-    logger.error(f"Max retries reached for {url}")
-    return "failed"
+    Returns "found", "not_found", "failed", or "unavailable" while the site's
+    circuit breaker is open.
+    """
+    response = client.get(url)
 
-def scrape_norm(http_session, url, prefix, number, db_law_id, session, retries):
-    response = fetch_with_retries(http_session, url, retries)
-
-    if response == "failed":
+    if response.status is FetchStatus.CIRCUIT_OPEN:
+        return "unavailable"
+    if response.status is FetchStatus.FAILED:
         return "failed"
-    if response is None:
+    if response.status is FetchStatus.NOT_FOUND:
         logger.debug(f"Not found: {prefix}-{number}")
         return "not_found"
 
@@ -81,17 +69,24 @@ def scrape_norm(http_session, url, prefix, number, db_law_id, session, retries):
         logger.error(f"Parsing failed for {url}: {e}")
         return "failed"
 
+    return store_norm(session, data, url, prefix, number, db_law_id, extractor, valid_from)
+
+def store_norm(session, data, url, prefix, number, db_law_id, extractor=None, valid_from=None):
+    """Save a parse_norm() result as norm ``number`` of the law; returns "found" or "failed"."""
     data['law_id'] = db_law_id
     data['number'] = number
     data['number_raw'] = f"{prefix}-{number}"
     data['url'] = url
-    data['last_seen'] = date.today().isoformat()
+    data['last_seen'] = date.today()
+    data['valid_from'] = valid_from
 
-    combined_content = f"{data.get('number_raw', '')}{data.get('title', '')}{data.get('content', '')}"
-    data['content_hash'] = hashlib.md5(combined_content.encode('utf-8')).hexdigest()
+    data['content_hash'] = fingerprint(data['number_raw'], data.get('title'), data.get('content'))
 
-    if 'references' not in data:
-        data['references'] = []
+    if extractor is not None:
+        data['references'] = extractor.resolve(data, extractor.aliases.get(prefix))
+    else:
+        # Link targets stay unresolved without an extractor; keep the stored references
+        data.pop('references', None)
 
     try:
         save_norm(session, data)
@@ -103,125 +98,351 @@ def scrape_norm(http_session, url, prefix, number, db_law_id, session, retries):
     logger.info(f"Found: {prefix}-{number}")
     return "found"
 
-def main():
-    session = None
-    total_found = 0
-    total_failed = 0
-    total_stale = 0
-    try:
-        config = load_config()
-        base_url = config['base_url']
-        retries = config.get('global', {}).get('retries', 3)
-        delay = config.get('global', {}).get('delay_between_requests', 0.3)
+def scrape_law(session, client, law, base_url, extractor, delay, settings=None):
+    """Check one laws.yml entry and scrape its norms if the site has a newer text.
 
-        session = init_db()
-        http_session = requests.Session()
+    Laws with ``fetch: whole_law`` are read from their whole-law page
+    (``whole_law_path`` under ``global``); if that fails, their norms are
+    fetched one by one like the others.
 
-        for law in config['laws']:
-            law_identifier = law['id']
-            law_name = law['name']
+    If the site stops answering (circuit breaker open), the law is left as it
+    is, without flagging stale norms, and stays due for the next run.
+    Returns (found, failed, stale) norm counts.
+    """
+    settings = settings or {}
+    law_identifier = law['id']
+    law_name = law['name']
+    checked_at = datetime.datetime.now()
 
-            try:
-                db_law_id = get_or_create_law(session, law_identifier, law_name)
-            except Exception as e:
-                logger.error(f"Failed to get/create law '{law_identifier}': {e}")
-                continue
-
-            prefix = law['numbering']['prefix']
-            start = law['numbering']['start']
-            end = law['numbering']['end']
-            today = date.today()
-            today_iso = today.isoformat()
-
-            # Check the law overview page for the "Text gilt ab" date
-            overview_url = f"{base_url}/{prefix}"
-            logger.debug(f"Requesting overview: {overview_url}")
-            overview_response = fetch_with_retries(http_session, overview_url, retries)
-
-            site_date = None
-            if overview_response not in (None, "failed"):
-                site_date = parse_overview(overview_response.text)
-                if site_date is None:
-                    logger.warning(f"Could not parse 'Text gilt ab' date from {overview_url}")
-            else:
-                logger.warning(f"Could not fetch overview for {law_identifier}; scraping anyway")
-
-            if site_date is not None:
-                stored_date = get_law_last_modified(session, db_law_id)
-                logger.debug(f"{law_identifier}: site_date={site_date!r} stored_date={stored_date!r}")
-                if stored_date == site_date:
-                    bumped = bump_norms_last_seen(session, db_law_id, today_iso)
-                    logger.info(
-                        f"{law_identifier} unchanged (Text gilt ab: {site_date}), "
-                        f"skipping — bumped last_seen on {bumped} norm(s)"
-                    )
-                    time.sleep(delay)
-                    continue
-
-            logger.info(f"Scraping {law_identifier} ({start}-{end}) ...")
-
-            law_found = 0
-            law_failed = 0
-
-            for number in range(start, end + 1):
-                url = f"{base_url}/{prefix}-{number}"
-                logger.debug(f"Requesting: {url}")
-                result = scrape_norm(http_session, url, prefix, str(number), db_law_id, session, retries)
-                if result == "found":
-                    law_found += 1
-                elif result == "failed":
-                    law_failed += 1
-                time.sleep(delay)
-
-                if result != "found":
-                    continue
-
-                for suffix in "abcdefghijklmnopqrstuvwxyz":
-                    sub_number = f"{number}{suffix}"
-                    sub_url = f"{base_url}/{prefix}-{sub_number}"
-                    logger.debug(f"Requesting: {sub_url}")
-                    sub_result = scrape_norm(http_session, sub_url, prefix, sub_number, db_law_id, session, retries)
-                    if sub_result == "found":
-                        law_found += 1
-                    elif sub_result == "failed":
-                        law_failed += 1
-                    time.sleep(delay)
-                    if sub_result != "found":
-                        break
-
-            total_found += law_found
-            total_failed += law_failed
+    try:
+        db_law_id = get_or_create_law(session, law_identifier, law_name)
+    except Exception as e:
+        logger.error(f"Failed to get/create law '{law_identifier}': {e}")
+        return 0, 0, 0
+
+    prefix = law['numbering']['prefix']
+    start = law['numbering']['start']
+    end = law['numbering']['end']
+    today = date.today()
+
+    # Check the law overview page for the "Text gilt ab" date
+    overview_url = f"{base_url}/{prefix}"
+    logger.debug(f"Requesting overview: {overview_url}")
+    overview_response = client.get(overview_url)
+    if overview_response.status is FetchStatus.CIRCUIT_OPEN:
+        logger.warning(f"Site unavailable, leaving {law_identifier} for the next run")
+        return 0, 0, 0
+
+    site_date = None
+    if overview_response.ok:
+        site_date = parse_overview(overview_response.text)
+        if site_date is None:
+            logger.warning(f"Could not parse 'Text gilt ab' date from {overview_url}")
+    else:
+        logger.warning(f"Could not fetch overview for {law_identifier}; scraping anyway")
+
+    if site_date is not None:
+        stored_date = get_law_last_modified(session, db_law_id)
+        logger.debug(f"{law_identifier}: site_date={site_date!r} stored_date={stored_date!r}")
+        if stored_date == site_date:
+            bumped = bump_norms_last_seen(session, db_law_id, today)
             logger.info(
-                f"{law_identifier}: {law_found} found, {law_failed} failed"
-                f" ({end - start + 1 - law_found - law_failed} not found)"
+                f"{law_identifier} unchanged (Text gilt ab: {site_date}), "
+                f"skipping — bumped last_seen on {bumped} norm(s)"
             )
+            _mark_checked(session, db_law_id, law_identifier, checked_at)
+            time.sleep(delay)
+            return 0, 0, 0
+
+    logger.info(f"Scraping {law_identifier} ({start}-{end}) ...")
+
+    law_stale = 0
+    counts = None
+    if fetch_mode(law, settings) == 'whole_law':
+        counts = scrape_whole_law(session, client, law, base_url, db_law_id, extractor, site_date,
+                                  settings.get('whole_law_path', WHOLE_LAW_PATH), delay)
+    if counts is None:
+        counts = scrape_norms(session, client, law, base_url, db_law_id, extractor, site_date, delay)
+    law_found, law_failed, unavailable = counts
+
+    if unavailable:
+        logger.error(
+            f"{law_identifier}: site unavailable after {law_found} found, {law_failed} failed; "
+            f"leaving the law for the next run"
+        )
+    else:
+        logger.info(
+            f"{law_identifier}: {law_found} found, {law_failed} failed"
+            f" ({end - start + 1 - law_found - law_failed} not found)"
+        )
+
+        if site_date is not None:
+            try:
+                update_law_last_modified(session, db_law_id, site_date)
+            except Exception as e:
+                logger.error(f"Failed to update last_modified for '{law_identifier}': {e}")
+
+        try:
+            law_stale = flag_stale_norms(session, db_law_id, today)
+            if law_stale > 0:
+                logger.warning(f"{law_stale} stale norm(s) flagged for {law_identifier}")
+        except Exception as e:
+            logger.error(f"Failed to flag stale norms for '{law_identifier}': {e}")
+
+    try:
+        render_law_fragments(session, db_law_id)
+    except Exception as e:
+        logger.error(f"Failed to render fragments for '{law_identifier}': {e}")
+        session.rollback()
+
+    if not unavailable:
+        _mark_checked(session, db_law_id, law_identifier, checked_at)
+
+    try:
+        bump_catalog_version(session)
+    except Exception as e:
+        logger.error(f"Failed to bump catalog version after '{law_identifier}': {e}")
+
+    return law_found, law_failed, law_stale
+
+
+def fetch_mode(law, settings) -> str:
+    """``fetch`` of a laws.yml entry, or of the ``global`` section: "per_norm" (default) or "whole_law"."""
+    return law.get('fetch', settings.get('fetch', 'per_norm'))
+
+
+def scrape_norms(session, client, law, base_url, db_law_id, extractor, valid_from, delay):
+    """Fetch the norms of a law one page at a time, trying every number of its range.
+
+    Returns (found, failed, unavailable).
+    """
+    start = law['numbering']['start']
+    end = law['numbering']['end']
+    prefix = law['numbering']['prefix']
+    law_found = 0
+    law_failed = 0
+    unavailable = False
+
+    for number in range(start, end + 1):
+        url = f"{base_url}/{prefix}-{number}"
+        logger.debug(f"Requesting: {url}")
+        result = scrape_norm(client, url, prefix, str(number), db_law_id, session,
+                             extractor=extractor, valid_from=valid_from)
+        if result == "found":
+            law_found += 1
+        elif result == "failed":
+            law_failed += 1
+        elif result == "unavailable":
+            unavailable = True
+            break
+        time.sleep(delay)
+
+        if result != "found":
+            continue
+
+        for suffix in _SUFFIXES:
+            sub_number = f"{number}{suffix}"
+            sub_url = f"{base_url}/{prefix}-{sub_number}"
+            logger.debug(f"Requesting: {sub_url}")
+            sub_result = scrape_norm(client, sub_url, prefix, sub_number, db_law_id, session,
+                                     extractor=extractor, valid_from=valid_from)
+            if sub_result == "found":
+                law_found += 1
+            elif sub_result == "failed":
+                law_failed += 1
+            elif sub_result == "unavailable":
+                unavailable = True
+            time.sleep(delay)
+            if sub_result != "found":
+                break
+        if unavailable:
+            break
+
+    return law_found, law_failed, unavailable
+
+
+def scrape_whole_law(session, client, law, base_url, db_law_id, extractor, valid_from, path=WHOLE_LAW_PATH,
+                     delay=0.0):
+    """Fetch a law's whole-law page once and save every norm of its range from it.
+
+    The norms are stored exactly as scrape_norm() would store their own
+    pages. Current norms the page lacks are fetched one by one, so a
+    truncated page does not flag them stale. Returns (found, failed,
+    unavailable), or None if the page could not be fetched or split, in
+    which case the norms should be fetched one by one.
+    """
+    prefix = law['numbering']['prefix']
+    start = law['numbering']['start']
+    end = law['numbering']['end']
+    url = f"{base_url}/{path.format(prefix=prefix)}"
+    logger.debug(f"Requesting whole law: {url}")
+    response = client.get(url)
+    if response.status is FetchStatus.CIRCUIT_OPEN:
+        return 0, 0, True
+    if not response.ok:
+        logger.warning(f"Could not fetch whole law {url}, fetching its norms one by one")
+        return None
+
+    try:
+        norms = split_law(response.text)
+    except Exception as e:
+        logger.warning(f"Could not split whole law {url} ({e}), fetching its norms one by one")
+        return None
+
+    numbered = {}
+    for data in norms:
+        number = data['number_raw'].lower()
+        if not re.fullmatch(r'\d+[a-z]?', number) or number in numbered:
+            logger.warning(f"Unexpected norm number '{data['number']}' on {url}, fetching its norms one by one")
+            return None
+        numbered[number] = data
+    in_range = {n: data for n, data in numbered.items() if start <= int(n.rstrip(_SUFFIXES)) <= end}
+    if not in_range:
+        logger.warning(f"No norm of {prefix}-{start}..{end} on {url}, fetching its norms one by one")
+        return None
+
+    found = failed = 0
+    for number, data in in_range.items():
+        result = store_norm(session, data, f"{base_url}/{prefix}-{number}", prefix, number, db_law_id,
+                            extractor=extractor, valid_from=valid_from)
+        if result == "found":
+            found += 1
+        else:
+            failed += 1
+    logger.info(f"{law['id']}: {len(in_range)} norm(s) from one page ({url})")
+
+    missing = [
+        number for (number,) in session.query(Norm.number).filter(
+            Norm.law_id == db_law_id, Norm.is_stale == 0,
+        ).order_by(Norm.sort_key, Norm.number)
+        if number not in in_range and re.fullmatch(r'\d+[a-z]?', number)
+        and start <= int(number.rstrip(_SUFFIXES)) <= end
+    ]
+    if missing:
+        logger.warning(f"{len(missing)} current norm(s) missing from {url}, fetching them one by one")
+    for number in missing:
+        result = scrape_norm(client, f"{base_url}/{prefix}-{number}", prefix, number, db_law_id, session,
+                             extractor=extractor, valid_from=valid_from)
+        if result == "found":
+            found += 1
+        elif result == "failed":
+            failed += 1
+        elif result == "unavailable":
+            return found, failed, True
+        time.sleep(delay)
+    return found, failed, False
+
+
+def _mark_checked(session, db_law_id, law_identifier, checked_at):
+    try:
+        update_law_last_checked(session, db_law_id, checked_at)
+    except Exception as e:
+        logger.error(f"Failed to update last_checked for '{law_identifier}': {e}")
+        session.rollback()
+
+
+def main(config=None, db_url=None):
+    """Scrape the due laws of ``config`` (default: laws.yml) into the database.
+
+    Laws are checked in the order of law_scraper.schedule, by up to
+    ``global.parallel_laws`` threads (default 1), each with its own database
+    session, sharing one law_scraper.fetch.FetchClient. No new law is started once ``global.time_budget_minutes``
+    have passed; the rest are first in line on the next run.
+
+    ``db_url`` overrides the connection of law_scraper.db.init_db, e.g. a
+    local SQLite file when running against the benchmark mock site. Returns
+    the counts of the summary line ("laws", "found", "failed", "stale"), and
+    under "fatal" the error that ended the run early, or None.
+    """
+    session = None
+    client = None
+    totals = {"found": 0, "failed": 0, "stale": 0, "laws": 0, "fatal": None}
+    started = time.monotonic()
+    try:
+        if config is None:
+            config = load_config()
+        base_url = config['base_url']
+        settings = config.get('global', {})
+        delay = settings.get('delay_between_requests', 0.3)
+        parallel = max(1, int(settings.get('parallel_laws', 1)))
+        budget = settings.get('time_budget_minutes')
 
-            if site_date is not None:
+        session = init_db(db_url)
+        client = FetchClient.from_config(settings, pool_size=max(parallel, settings.get('pool_size', 10)))
+        extractor = ReferenceExtractor(build_aliases(config))
+
+        scheduled = plan(session, config)
+        queue = [entry.law for entry in scheduled if entry.due]
+        logger.info(
+            f"{len(queue)} of {len(scheduled)} law(s) due"
+            + (f", time budget {budget} min" if budget else "")
+            + (f", {parallel} in parallel" if parallel > 1 else "")
+        )
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def next_law():
+            with lock:
+                if stop.is_set() or not queue:
+                    return None
+                if budget and time.monotonic() - started >= budget * 60:
+                    logger.warning(f"Time budget used up, {len(queue)} due law(s) left for the next run")
+                    stop.set()
+                    return None
+                return queue.pop(0)
+
+        def run_laws(law_session):
+            while (law := next_law()) is not None:
+                found, failed, stale = scrape_law(law_session, client, law, base_url, extractor, delay, settings)
+                with lock:
+                    totals["found"] += found
+                    totals["failed"] += failed
+                    totals["stale"] += stale
+                    totals["laws"] += 1
+
+        def run_thread():
+            with Session(session.get_bind()) as law_session:
                 try:
-                    update_law_last_modified(session, db_law_id, site_date)
+                    run_laws(law_session)
                 except Exception as e:
-                    logger.error(f"Failed to update last_modified for '{law_identifier}': {e}")
+                    logger.critical(f"Scrape thread failed: {e}", exc_info=True)
+                    with lock:
+                        totals["fatal"] = str(e)
 
+        if parallel == 1:
+            run_laws(session)
+        else:
+            threads = [threading.Thread(target=run_thread, name=f"scrape-{i}") for i in range(parallel)]
+            for thread in threads:
+                thread.start()
             try:
-                stale_count = flag_stale_norms(session, db_law_id, today_iso)
-                total_stale += stale_count
-                if stale_count > 0:
-                    logger.warning(f"{stale_count} stale norm(s) flagged for {law_identifier}")
-            except Exception as e:
-                logger.error(f"Failed to flag stale norms for '{law_identifier}': {e}")
+                for thread in threads:
+                    thread.join()
+            except KeyboardInterrupt:
+                stop.set()
+                logger.warning("Interrupted — finishing the laws in progress")
+                for thread in threads:
+                    thread.join()
+                raise
 
     except KeyboardInterrupt:
         logger.warning("Interrupted by user")
+        totals["fatal"] = "interrupted"
     except Exception as e:
         logger.critical(f"Fatal error: {e}", exc_info=True)
+        totals["fatal"] = str(e)
     finally:
+        if client:
+            client.close()
         if session:
             close_db(session)
         logger.info(
-            f"Done — {total_found} norms saved/updated, "
-            f"{total_failed} failed, {total_stale} marked stale"
+            f"Done — {totals['laws']} law(s) checked in {time.monotonic() - started:.0f}s, "
+            f"{totals['found']} norms saved/updated, "
+            f"{totals['failed']} failed, {totals['stale']} marked stale"
         )
+    return totals
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(1 if main()["fatal"] else 0)
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""Single-file snapshot of the laws/norms corpus, readable through mmap.
+
+    python -m law_scraper.snapshot write corpus.snap [--db URL]
+    python -m law_scraper.snapshot info corpus.snap
+
+The web app serves law pages from a snapshot when SNAPSHOT_PATH is set
+(see web/snapshot.py), so it keeps working while the database is down.
+
+Layout (little-endian), all offsets relative to the start of the file:
+
+    header   magic, counts and section offsets (struct _HEADER)
+    laws     fixed-size records in the database's name order (struct _LAW)
+    norms    fixed-size records grouped by law, in TOC order (struct _NORM)
+    lookups  u32 law indexes sorted by name, then u32 norm indexes sorted
+             by (law, number), both for binary search
+    strings  UTF-8 blob; records point into it with (offset, length) pairs
+    meta     small JSON document (created_at, catalog_version)
+
+Reading a record is a single struct.unpack_from; only the strings a caller
+asks for are decoded.
+"""
+import argparse
+import datetime
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import NamedTuple, Optional
+
+MAGIC = b"BAYSNAP1"
+_HEADER = struct.Struct("<8sIIQQQQQQI")
+_LAW = struct.Struct("<IIIIIiIII")     # id, name, description, last_modified (ordinal or -1), first norm, current norms, all norms
+_NORM = struct.Struct("<IIiI12I")      # id, law index, sort_key, is_stale, (offset, length) x 6
+_U32 = struct.Struct("<I")
+_NONE = 0xFFFFFFFF
+
+logger = logging.getLogger("law_scraper.snapshot")
+
+
+class SnapshotLaw(NamedTuple):
+    id: int
+    name: str
+    description: Optional[str]
+    last_modified: Optional[datetime.date]
+    norm_count: int
+
+
+class SnapshotNorm(NamedTuple):
+    id: int
+    number: str
+    number_raw: Optional[str]
+    title: Optional[str]
+    content: Optional[str]
+    url: Optional[str]
+    content_hash: Optional[str]
+    sort_key: int
+    is_stale: int
+
+
+class _Strings:
+    def __init__(self):
+        self.blob = bytearray()
+        self._seen = {}
+
+    def add(self, value):
+        if value is None:
+            return 0, _NONE
+        ref = self._seen.get(value)
+        if ref is None:
+            encoded = value.encode("utf-8")
+            ref = (len(self.blob), len(encoded))
+            self.blob += encoded
+            self._seen[value] = ref
+        return ref
+
+
+def write(session, path):
+    """Write every law and norm readable through ``session`` to ``path`` atomically.
+
+    Returns (laws, norms) written.
+    """
+    from models import CATALOG_VERSION_KEY, Law, Norm, Setting
+
+    strings = _Strings()
+    law_records = []
+    norm_records = []
+    lookup = []
+
+    laws = session.query(Law.id, Law.name, Law.description, Law.last_modified).order_by(Law.name).all()
+    for law_index, law in enumerate(laws):
+        norms = session.query(
+            Norm.id, Norm.number, Norm.number_raw, Norm.title, Norm.content, Norm.url,
+            Norm.content_hash, Norm.sort_key, Norm.is_stale,
+        ).filter(Norm.law_id == law.id).order_by(Norm.sort_key, Norm.number).all()
+
+        first = len(norm_records)
+        for norm in norms:
+            refs = []
+            for value in (norm.number, norm.number_raw, norm.title, norm.content, norm.url, norm.content_hash):
+                refs.extend(strings.add(value))
+            norm_records.append(_NORM.pack(norm.id, law_index, norm.sort_key, norm.is_stale or 0, *refs))
+        lookup.extend(sorted(range(first, len(norm_records)), key=lambda i: norms[i - first].number))
+
+        last_modified = law.last_modified
+        if isinstance(last_modified, datetime.datetime):
+            last_modified = last_modified.date()
+        law_records.append(_LAW.pack(
+            law.id, *strings.add(law.name), *strings.add(law.description),
+            last_modified.toordinal() if last_modified else -1,
+            first, sum(1 for n in norms if not n.is_stale), len(norms),
+        ))
+
+    law_lookup = sorted(range(len(laws)), key=lambda i: laws[i].name)
+    version = session.get(Setting, CATALOG_VERSION_KEY)
+    meta = json.dumps({
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "catalog_version": version.value if version else None,
+    }).encode("utf-8")
+
+    laws_off = _HEADER.size
+    norms_off = laws_off + _LAW.size * len(law_records)
+    law_lookup_off = norms_off + _NORM.size * len(norm_records)
+    lookup_off = law_lookup_off + _U32.size * len(law_lookup)
+    strings_off = lookup_off + _U32.size * len(lookup)
+    meta_off = strings_off + len(strings.blob)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(law_records), len(norm_records), laws_off, norms_off, law_lookup_off,
+                             lookup_off, strings_off, meta_off, len(meta)))
+        f.writelines(law_records)
+        f.writelines(norm_records)
+        f.write(struct.pack(f"<{len(law_lookup)}I", *law_lookup))
+        f.write(struct.pack(f"<{len(lookup)}I", *lookup))
+        f.write(strings.blob)
+        f.write(meta)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(law_records), len(norm_records)
+
+
+class Snapshot:
+    """Read-only view of a snapshot file. Thread-safe; nothing is parsed up front."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.law_count, self.norm_count, self._laws_off, self._norms_off, self._law_lookup_off,
+         self._lookup_off, self._strings_off, meta_off, meta_len) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a corpus snapshot")
+        self.meta = json.loads(self._map[meta_off:meta_off + meta_len])
+
+    def close(self):
+        self._map.close()
+
+    def _str(self, offset, length):
+        if length == _NONE:
+            return None
+        start = self._strings_off + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def _law_record(self, index):
+        return _LAW.unpack_from(self._map, self._laws_off + index * _LAW.size)
+
+    def _law(self, index):
+        law_id, name_off, name_len, desc_off, desc_len, last_modified, _, current, _ = self._law_record(index)
+        return SnapshotLaw(
+            law_id, self._str(name_off, name_len), self._str(desc_off, desc_len),
+            datetime.date.fromordinal(last_modified) if last_modified >= 0 else None, current,
+        )
+
+    def _norm_fields(self, index):
+        return _NORM.unpack_from(self._map, self._norms_off + index * _NORM.size)
+
+    def _norm(self, index, content=True):
+        fields = self._norm_fields(index)
+        refs = fields[4:]
+        values = [
+            self._str(refs[i], refs[i + 1]) if content or i != 6 else None
+            for i in range(0, 12, 2)
+        ]
+        return SnapshotNorm(fields[0], values[0], values[1], values[2], values[3], values[4], values[5],
+                            fields[2], fields[3])
+
+    def _norm_number(self, index):
+        fields = self._norm_fields(index)
+        return self._str(fields[4], fields[5])
+
+    def _law_index(self, name):
+        lo, hi = 0, self.law_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            law_index = _U32.unpack_from(self._map, self._law_lookup_off + mid * _U32.size)[0]
+            record = self._law_record(law_index)
+            current = self._str(record[1], record[2])
+            if current == name:
+                return law_index
+            if current < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _norm_range(self, law_index):
+        record = self._law_record(law_index)
+        return record[6], record[6] + record[8]
+
+    def laws(self):
+        """All laws in the database's name order."""
+        return [self._law(i) for i in range(self.law_count)]
+
+    def law(self, name):
+        index = self._law_index(name)
+        return self._law(index) if index is not None else None
+
+    def norms(self, law_name, content=False, include_stale=False):
+        """Norms of a law in TOC order; content is only decoded when asked for."""
+        index = self._law_index(law_name)
+        if index is None:
+            return []
+        first, end = self._norm_range(index)
+        norms = (self._norm(i, content) for i in range(first, end))
+        return [n for n in norms if include_stale or not n.is_stale]
+
+    def _find(self, law_index, number):
+        """Binary search over the (law, number) lookup table; returns a norm index or None."""
+        lo, hi = self._norm_range(law_index)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            norm_index = _U32.unpack_from(self._map, self._lookup_off + mid * _U32.size)[0]
+            current = self._norm_number(norm_index)
+            if current == number:
+                return norm_index
+            if current < number:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def norm(self, law_name, number):
+        index = self._law_index(law_name)
+        norm_index = self._find(index, number) if index is not None else None
+        return self._norm(norm_index) if norm_index is not None else None
+
+    def neighbours(self, law_name, number, count):
+        """Up to ``count`` current norms before and after a norm, in TOC order."""
+        index = self._law_index(law_name)
+        norm_index = self._find(index, number) if index is not None else None
+        if norm_index is None:
+            return [], []
+        first, end = self._norm_range(index)
+        before, after = [], []
+        i = norm_index - 1
+        while i >= first and len(before) < count:
+            norm = self._norm(i, content=False)
+            if not norm.is_stale:
+                before.append(norm)
+            i -= 1
+        i = norm_index + 1
+        while i < end and len(after) < count:
+            norm = self._norm(i, content=False)
+            if not norm.is_stale:
+                after.append(norm)
+            i += 1
+        before.reverse()
+        return before, after
+
+    def iter_norms(self, content=False):
+        """(law name, norm) for every current norm, ordered by law name and TOC order."""
+        for law_index in range(self.law_count):
+            law = self._law(law_index)
+            first, end = self._norm_range(law_index)
+            for i in range(first, end):
+                norm = self._norm(i, content)
+                if not norm.is_stale:
+                    yield law.name, norm
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    write_parser = sub.add_parser("write", help="export the database to a snapshot file")
+    write_parser.add_argument("path")
+    write_parser.add_argument("--db", help="SQLAlchemy URL instead of config.yml")
+    info_parser = sub.add_parser("info", help="print the header of a snapshot file")
+    info_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "write":
+        from .db import init_db, close_db
+
+        session = init_db(args.db)
+        try:
+            laws, norms = write(session, args.path)
+        finally:
+            close_db(session)
+        logger.info(f"Wrote {laws} laws and {norms} norms to {args.path} ({os.path.getsize(args.path)} bytes)")
+    else:
+        snapshot = Snapshot(args.path)
+        print(json.dumps({"laws": snapshot.law_count, "norms": snapshot.norm_count,
+                          "bytes": os.path.getsize(args.path), **snapshot.meta}, indent=2))
+        snapshot.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(asctime)s | %(name)s | %(message)s")
+    main()
@@ -1,5 +1,13 @@
 from .base import Base
-from .law import Law, Norm
+from .law import Law, Norm, NormReference, norm_sort_key
+from .history import NormVersion
+from .compression import ContentDictionary
+from .fingerprint import fingerprint
+from .fragment import LawFragment, fragment_source_hash
+from .job import Job, PendingHit
+from .mail import OutgoingMail
+from .meta import CATALOG_VERSION_KEY, Setting
+from .ratelimit import RateLimitCounter
 from .user import UserRole, User
 
-__all__ = ["Base", "Law", "Norm", "UserRole", "User"]
+__all__ = ["Base", "Law", "Norm", "NormReference", "norm_sort_key", "NormVersion", "ContentDictionary", "fingerprint", "LawFragment", "fragment_source_hash", "Job", "PendingHit", "OutgoingMail", "CATALOG_VERSION_KEY", "Setting", "RateLimitCounter", "UserRole", "User"]
@@ -0,0 +1,135 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, DateTime, LargeBinary, select
+from sqlalchemy.types import TypeDecorator
+from collections import Counter
+import datetime
+import os
+import re
+import threading
+import zlib
+from .base import Base
+
+# Off by default: Norm.content maps to the plain TEXT column. With NORM_CONTENT_COMPRESSION=1
+# it maps to norms.content_z instead; run `flask compress-content` before switching it on.
+COMPRESS_CONTENT = os.environ.get("NORM_CONTENT_COMPRESSION", "0") == "1"
+# Setting written by `flask compress-content --drop-plain`: the plain column is no longer kept up to date
+PLAIN_DROPPED_KEY = "content_plain_dropped"
+
+_FORMAT = 1
+_HEADER = 5  # format byte + 4-byte dictionary id
+_MAX_DICTIONARY_SIZE = 32768  # zlib only looks back 32 KiB, a larger preset dictionary is wasted
+_TOKEN = re.compile(r"<[^>]*>|\w+|\s+|[^\w\s<]")
+
+
+class ContentDictionary(Base):
+    """Preset zlib dictionary trained on norm contents. Rows are never changed once written."""
+    __tablename__ = "content_dictionaries"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+
+
+_engine = None
+_dictionaries: dict = {0: b""}
+_current_id: int = 0
+_loaded: bool = False
+_lock = threading.Lock()
+
+
+def bind(engine) -> None:
+    """Use ``engine`` to load dictionaries referenced by compressed values."""
+    global _engine
+    _engine = engine
+
+
+def load_dictionaries(conn=None) -> None:
+    """(Re)load all dictionaries; the newest one is used for new values."""
+    global _dictionaries, _current_id, _loaded
+    if conn is None:
+        if _engine is None:
+            raise RuntimeError("models.compression is not bound to an engine")
+        with _engine.connect() as conn:
+            return load_dictionaries(conn)
+    rows = conn.execute(select(ContentDictionary.id, ContentDictionary.data).order_by(ContentDictionary.id)).all()
+    with _lock:
+        _dictionaries = {0: b"", **{row.id: row.data for row in rows}}
+        _current_id = rows[-1].id if rows else 0
+        _loaded = True
+
+
+def current_dictionary_id() -> int:
+    """Id of the dictionary new values are compressed with; 0 when none has been trained."""
+    return _current_id
+
+
+def _dictionary(dictionary_id: int) -> bytes:
+    if dictionary_id not in _dictionaries:
+        # Trained after this process started
+        load_dictionaries()
+    return _dictionaries[dictionary_id]
+
+
+def compress(text: str, dictionary_id: int | None = None) -> bytes:
+    """Raw deflate of ``text`` with a preset dictionary (the newest by default)."""
+    if dictionary_id is None:
+        if not _loaded and _engine is not None:
+            load_dictionaries()
+        dictionary_id = _current_id
+    zdict = _dictionary(dictionary_id)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=zdict) if zdict else zlib.compressobj(9, zlib.DEFLATED, -15)
+    body = compressor.compress(text.encode("utf-8")) + compressor.flush()
+    return bytes([_FORMAT]) + dictionary_id.to_bytes(4, "big") + body
+
+
+def decompress(value: bytes) -> str:
+    if value[0] != _FORMAT:
+        raise ValueError(f"Unknown compressed content format {value[0]}")
+    zdict = _dictionary(int.from_bytes(value[1:_HEADER], "big"))
+    decompressor = zlib.decompressobj(-15, zdict=zdict) if zdict else zlib.decompressobj(-15)
+    return (decompressor.decompress(value[_HEADER:]) + decompressor.flush()).decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """Text stored as dictionary-compressed bytes; reads and writes plain str."""
+    impl = LargeBinary(16777215)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else compress(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decompress(value)
+
+
+def train_dictionary(samples, size: int = _MAX_DICTIONARY_SIZE) -> bytes:
+    """Build a preset dictionary from the most valuable recurring fragments of ``samples``.
+
+    Fragments are runs of up to six tokens (tags, words, whitespace,
+    punctuation) scored by occurrences times length. The best ones go last,
+    where deflate reaches them with the shortest distances.
+    """
+    counts = Counter()
+    for text in samples:
+        tokens = _TOKEN.findall(text)
+        for n in range(1, 7):
+            for i in range(len(tokens) - n + 1):
+                counts["".join(tokens[i:i + n])] += 1
+
+    candidates = sorted(
+        ((count * len(fragment), fragment) for fragment, count in counts.items() if count > 1 and len(fragment) >= 4),
+        reverse=True,
+    )
+    chosen = []
+    total = 0
+    for _, fragment in candidates:
+        encoded = fragment.encode("utf-8")
+        if total + len(encoded) > size:
+            continue
+        if any(fragment in other for other in chosen[-200:]):
+            continue
+        chosen.append(fragment)
+        total += len(encoded)
+        if total >= size - 4:
+            break
+    return "".join(reversed(chosen)).encode("utf-8")
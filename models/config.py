@@ -0,0 +1,19 @@
+import os
+from typing import Optional
+
+
+def database_url(environ=None) -> Optional[str]:
+    """SQLAlchemy URL from DATABASE_URL, else from DB_HOST/DB_PORT/DB_USER/DB_PASSWORD/DB_NAME.
+
+    Shared by the web app, the job worker and the scraper, so all of them use
+    the same database. None if neither is set.
+    """
+    environ = os.environ if environ is None else environ
+    if environ.get("DATABASE_URL"):
+        return environ["DATABASE_URL"]
+    if not all(environ.get(name) for name in ("DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME")):
+        return None
+    return (
+        f"mysql+pymysql://{environ['DB_USER']}:{environ['DB_PASSWORD']}@{environ['DB_HOST']}:"
+        f"{int(environ.get('DB_PORT', 3306))}/{environ['DB_NAME']}?charset=utf8mb4"
+    )
@@ -0,0 +1,87 @@
+"""Content fingerprints of norms: Norm.content_hash and NormVersion.content_hash.
+
+A norm's fingerprint is a 128-bit BLAKE2b hash of its number_raw, title and
+content after canonical_html(), so differences the site can make without
+changing the text do not count as changes: whitespace runs, whitespace
+around block tags, entity spelling (``&amp;`` or ``&``), tag name case and
+attribute order or quoting. The scraper's change detection, the norm
+history and the API's ETags all compare these fingerprints.
+
+Run ``flask rehash-content`` after changing canonical_html() or FORMAT.
+"""
+import functools
+import hashlib
+import html
+import re
+
+from sqlalchemy import CHAR
+from sqlalchemy.dialects import mysql
+
+# Part of every fingerprint; bump when canonical_html() changes
+FORMAT = b"1"
+
+# 32 hex digits; ASCII on MySQL, where utf8mb4 would reserve 4 bytes per character
+FINGERPRINT_TYPE = CHAR(32).with_variant(mysql.CHAR(32, charset="ascii", collation="ascii_bin"), "mysql")
+
+_TAG = re.compile(r"<(/?)([a-zA-Z][\w:-]*)((?:\s[^>]*)?)/?>")
+_ATTR = re.compile(r"""([^\s=/"']+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'=<>`]+))?""")
+# Whitespace next to these tags is not rendered
+_BLOCK_TAGS = frozenset("br dd div dl dt li ol p table tbody td th thead tr ul".split())
+
+
+@functools.lru_cache(maxsize=4096)
+def _canonical_tag(tag) -> tuple:
+    """(canonical tag, whether it is a block tag); content repeats the same few tags."""
+    closing, name, attrs = _TAG.fullmatch(tag).groups()
+    name = name.lower()
+    pairs = []
+    for attr in _ATTR.finditer(attrs or ""):
+        value = attr.group(2) or ""
+        if value[:1] in ("'", '"'):
+            value = value[1:-1]
+        pairs.append((attr.group(1).lower(), html.unescape(value)))
+    rendered = "".join(f' {key}="{html.escape(value)}"' for key, value in sorted(pairs))
+    return f"<{closing}{name}{rendered}>", name in _BLOCK_TAGS
+
+
+def _canonical_text(text) -> str:
+    if "&" in text:
+        text = html.unescape(text)
+    if "&" in text or "<" in text or ">" in text:
+        text = html.escape(text, quote=False)
+    collapsed = " ".join(text.split())
+    if not collapsed:
+        return " " if text else ""
+    return (" " if text[0].isspace() else "") + collapsed + (" " if text[-1].isspace() else "")
+
+
+def canonical_html(text) -> str:
+    """``text`` with tags, entities and whitespace written one way."""
+    if not text:
+        return ""
+    parts = []
+    after_block = True  # the start and end of the text count as block boundaries
+    pos = 0
+    for m in _TAG.finditer(text):
+        segment = _canonical_text(text[pos:m.start()])
+        tag, block = _canonical_tag(m.group())
+        if after_block:
+            segment = segment.lstrip()
+        if block:
+            segment = segment.rstrip()
+        parts.append(segment)
+        parts.append(tag)
+        after_block = block
+        pos = m.end()
+    segment = _canonical_text(text[pos:]).rstrip()
+    parts.append(segment.lstrip() if after_block else segment)
+    return "".join(parts)
+
+
+def fingerprint(number_raw, title, content) -> str:
+    """Hex fingerprint of a norm (or one of its versions)."""
+    digest = hashlib.blake2b(FORMAT, digest_size=16)
+    for part in (number_raw, title, content):
+        digest.update(b"\0")
+        digest.update(canonical_html(part).encode("utf-8"))
+    return digest.hexdigest()
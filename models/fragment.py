@@ -0,0 +1,35 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, Text, DateTime, ForeignKey, Index, CHAR
+import datetime
+import hashlib
+from .base import Base
+
+# Part of every source hash; bump when the fragment templates change so stored fragments are ignored
+FRAGMENT_FORMAT = "1"
+
+
+class LawFragment(Base):
+    """Pre-rendered HTML of a law page section, spliced into the page template.
+
+    ``kind`` is "toc" (the norm list of the TOC) or "articles" (all norm
+    articles of the full view). ``source_hash`` covers the norms the
+    fragment was rendered from; pages only use a fragment whose hash matches
+    the current norms.
+    """
+    __tablename__ = "law_fragments"
+    __table_args__ = (Index("uq_law_fragments_law_kind", "law_id", "kind", unique=True),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    law_id: Mapped[int] = mapped_column(Integer, ForeignKey("laws.id", ondelete="CASCADE"), nullable=False)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    source_hash: Mapped[str] = mapped_column(CHAR(32), nullable=False)
+    html: Mapped[str] = mapped_column(Text(16777215), nullable=False)
+    rendered_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+
+
+def fragment_source_hash(kind: str, law_name: str, norms) -> str:
+    """Hash of everything a fragment depends on; ``norms`` need number, number_raw, title, content_hash."""
+    digest = hashlib.md5(f"{FRAGMENT_FORMAT}\0{kind}\0{law_name}".encode("utf-8"))
+    for norm in norms:
+        digest.update(f"\0{norm.number}\0{norm.number_raw}\0{norm.title}\0{norm.content_hash}".encode("utf-8"))
+    return digest.hexdigest()
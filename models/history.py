@@ -0,0 +1,93 @@
+from sqlalchemy.orm import Mapped, defer, mapped_column
+from sqlalchemy import String, Integer, Date, DateTime, SmallInteger, ForeignKey, LargeBinary, Index
+from difflib import SequenceMatcher
+from typing import Optional
+import datetime
+import json
+import zlib
+from .base import Base
+from .fingerprint import FINGERPRINT_TYPE
+
+# A full snapshot is stored after this many deltas, bounding the rows read to rebuild a version
+SNAPSHOT_INTERVAL = 10
+
+
+class NormVersion(Base):
+    """One version of a norm, keyed by the "Text gilt ab" date it became effective.
+
+    ``depth`` 0 rows hold the zlib-compressed content; the others a compressed
+    line delta against the version before them.
+    """
+    __tablename__ = "norm_versions"
+    __table_args__ = (Index("uq_norm_versions_norm_valid", "norm_id", "valid_from", unique=True),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    norm_id: Mapped[int] = mapped_column(Integer, ForeignKey("norms.id", ondelete="CASCADE"), nullable=False)
+    valid_from: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+    title: Mapped[Optional[str]] = mapped_column(String(255))
+    content_hash: Mapped[Optional[str]] = mapped_column(FINGERPRINT_TYPE)
+    depth: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary(16777215), nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+
+
+def _lines(content: Optional[str]) -> list:
+    return (content or "").split("\n")
+
+
+def pack_snapshot(content: Optional[str]) -> bytes:
+    return zlib.compress((content or "").encode("utf-8"), 9)
+
+
+def pack_delta(old: Optional[str], new: Optional[str]) -> bytes:
+    """Encode ``new`` as line ranges copied from ``old`` plus inserted lines."""
+    a, b = _lines(old), _lines(new)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(b[j1:j2])
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def apply_delta(old: Optional[str], delta: bytes) -> str:
+    a = _lines(old)
+    lines = []
+    for op in json.loads(zlib.decompress(delta)):
+        if op and isinstance(op[0], int):
+            lines.extend(a[op[0]:op[1]])
+        else:
+            lines.extend(op)
+    return "\n".join(lines)
+
+
+def version_chain(session, norm_id: int, version: NormVersion) -> list:
+    """(valid_from, content) of ``version`` and every version back to its snapshot, oldest first.
+
+    One indexed range read of at most SNAPSHOT_INTERVAL + 1 rows.
+    """
+    rows = session.query(NormVersion.valid_from, NormVersion.depth, NormVersion.data).filter(
+        NormVersion.norm_id == norm_id,
+        NormVersion.valid_from <= version.valid_from,
+    ).order_by(NormVersion.valid_from.desc()).limit(version.depth + 1).all()
+    rows.reverse()
+
+    chain = []
+    content = None
+    for row in rows:
+        content = zlib.decompress(row.data).decode("utf-8") if row.depth == 0 else apply_delta(content, row.data)
+        chain.append((row.valid_from, content))
+    return chain
+
+
+def version_as_of(session, norm_id: int, as_of: datetime.date) -> Optional[NormVersion]:
+    """The version in force on ``as_of`` (content not loaded), or None."""
+    return session.query(NormVersion).options(defer(NormVersion.data)).filter(
+        NormVersion.norm_id == norm_id,
+        NormVersion.valid_from <= as_of,
+    ).order_by(NormVersion.valid_from.desc()).first()
+
+
+def version_content(session, version: NormVersion) -> str:
+    return version_chain(session, version.norm_id, version)[-1][1]
@@ -0,0 +1,36 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, Text, DateTime, Index
+from typing import Optional
+import datetime
+from .base import Base
+
+
+class Job(Base):
+    """Maintenance task waiting for the job worker (web/jobs.py): a scrape, cache warm-up, ..."""
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)
+    args: Mapped[Optional[str]] = mapped_column(Text)  # JSON object of keyword arguments
+    # pending -> running -> done, or back to pending with a later run_at; failed after the last attempt
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    run_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    locked_until: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    last_error: Mapped[Optional[str]] = mapped_column(String(500))
+    result: Mapped[Optional[str]] = mapped_column(String(500))
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    started_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+
+
+class PendingHit(Base):
+    """Page hits spooled by the web workers (HITS_ROLLUP=1) until the hits_rollup job adds them to the views."""
+    __tablename__ = "pending_hits"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    hit_type: Mapped[str] = mapped_column(String(8), nullable=False)
+    identifier: Mapped[str] = mapped_column(String(255), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
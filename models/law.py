@@ -1,36 +1,81 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Text, DateTime, SmallInteger, ForeignKey, UniqueConstraint, CHAR, Date
+from sqlalchemy import String, Integer, Text, DateTime, SmallInteger, ForeignKey, UniqueConstraint, Index, Date
 from typing import Optional, List
 import datetime
+import re
 from .base import Base
+from .compression import COMPRESS_CONTENT, CompressedText
+from .fingerprint import FINGERPRINT_TYPE
+
+_LEADING_DIGITS = re.compile(r"\d+")
+
+
+def norm_sort_key(number: str) -> int:
+    """Numeric part of a norm number ("12a" -> 12), the primary display order."""
+    m = _LEADING_DIGITS.match(number or "")
+    return int(m.group()) if m else 0
+
+
+def _sort_key_default(context) -> int:
+    return norm_sort_key(context.get_current_parameters()["number"])
 
 
 class Law(Base):
     __tablename__ = "laws"
+    __table_args__ = (Index("uq_laws_name", "name", unique=True),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text)
     last_modified: Mapped[Optional[datetime.date]] = mapped_column(Date, nullable=True)
     views: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Last scrape run that checked the law's overview page; drives law_scraper.schedule
+    last_checked: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
 
     norms: Mapped[List["Norm"]] = relationship("Norm", back_populates="law")
 
 
 class Norm(Base):
     __tablename__ = "norms"
-    __table_args__ = (UniqueConstraint("law_id", "number", name="unique_norm"),)
+    __table_args__ = (
+        UniqueConstraint("law_id", "number", name="unique_norm"),
+        Index("ix_norms_law_stale_sort", "law_id", "is_stale", "sort_key"),
+        Index("ix_norms_stale_views", "is_stale", "views"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     law_id: Mapped[int] = mapped_column(Integer, ForeignKey("laws.id"), nullable=False)
     number: Mapped[str] = mapped_column(String(50), nullable=False)
     number_raw: Mapped[Optional[str]] = mapped_column(String(50))
     title: Mapped[Optional[str]] = mapped_column(String(255))
-    content: Mapped[Optional[str]] = mapped_column(Text)
+    # Deferred: only the norm and full-view pages render it, so list queries never pull the TEXT column.
+    # ``content`` is whichever column is authoritative. law_scraper.db.save_norm writes the other one too
+    # (the plain one until `flask compress-content --drop-plain`), so the flag can be switched back and forth.
+    if COMPRESS_CONTENT:
+        content: Mapped[Optional[str]] = mapped_column("content_z", CompressedText, deferred=True)
+        content_plain: Mapped[Optional[str]] = mapped_column("content", Text, deferred=True)
+    else:
+        content: Mapped[Optional[str]] = mapped_column(Text, deferred=True)
+        content_z: Mapped[Optional[str]] = mapped_column(CompressedText, deferred=True)
     url: Mapped[Optional[str]] = mapped_column(String(500))
     last_seen: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
-    content_hash: Mapped[Optional[str]] = mapped_column(CHAR(64))
+    content_hash: Mapped[Optional[str]] = mapped_column(FINGERPRINT_TYPE)
     is_stale: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)
     views: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sort_key: Mapped[int] = mapped_column(Integer, nullable=False, default=_sort_key_default)
 
     law: Mapped["Law"] = relationship("Law", back_populates="norms")
+
+
+class NormReference(Base):
+    """Citation found in a norm's text, e.g. "Art. 12 BayBO". Targets are law names plus number."""
+    __tablename__ = "norm_references"
+    __table_args__ = (
+        Index("ix_norm_references_source", "source_norm_id"),
+        Index("ix_norm_references_target", "target_law", "target_number"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    source_norm_id: Mapped[int] = mapped_column(Integer, ForeignKey("norms.id", ondelete="CASCADE"), nullable=False)
+    target_law: Mapped[str] = mapped_column(String(255), nullable=False)
+    target_number: Mapped[str] = mapped_column(String(50), nullable=False)
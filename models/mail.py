@@ -0,0 +1,25 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, Text, DateTime, Index
+from typing import Optional
+import datetime
+from .base import Base
+
+
+class OutgoingMail(Base):
+    """Durable spool of mails waiting for the background sender."""
+    __tablename__ = "mail_outbox"
+    __table_args__ = (Index("ix_mail_outbox_status_due", "status", "next_attempt_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    recipient: Mapped[str] = mapped_column(String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    body_text: Mapped[str] = mapped_column(Text, nullable=False)
+    body_html: Mapped[Optional[str]] = mapped_column(Text)
+    # pending -> sending -> sent, or back to pending with a later next_attempt_at; failed after the last attempt
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    locked_until: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    last_error: Mapped[Optional[str]] = mapped_column(String(500))
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    sent_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
@@ -0,0 +1,14 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String
+from .base import Base
+
+# Bumped by the scraper whenever laws or norms change; web workers reload their catalog on a new value
+CATALOG_VERSION_KEY = "catalog_version"
+
+
+class Setting(Base):
+    """Small key/value store shared by the scraper and the web app."""
+    __tablename__ = "app_settings"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -0,0 +1,99 @@
+"""Versioned schema migrations for the laws/norms database.
+
+Each migration is a module in this package named ``v<NNNN>_<slug>.py`` that
+defines ``upgrade(conn)``. Applied versions are recorded in the
+``schema_version`` table; ``upgrade(engine)`` applies every pending one in
+order, each inside its own transaction.
+
+A database without a ``laws`` table is created from the models directly and
+stamped with the newest version, since the models always describe the
+schema after the last migration.
+"""
+import datetime
+import importlib
+import logging
+import pkgutil
+import re
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+
+from ..base import Base
+
+logger = logging.getLogger("models.migrations")
+
+_MODULE_RE = re.compile(r"^v(\d{4})_\w+$")
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def available_migrations():
+    """Return [(version, name, module)] for every migration module, in order."""
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        m = _MODULE_RE.match(info.name)
+        if m:
+            found.append((int(m.group(1)), info.name, importlib.import_module(f"{__name__}.{info.name}")))
+    return sorted(found, key=lambda item: item[0])
+
+
+def current_version(conn) -> int:
+    """Highest applied migration version, 0 for an unversioned database."""
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    versions = [row.version for row in conn.execute(select(schema_version.c.version))]
+    return max(versions, default=0)
+
+
+def _record(conn, version, name):
+    conn.execute(schema_version.insert().values(
+        version=version, name=name, applied_at=datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+    ))
+
+
+def upgrade(engine, target=None):
+    """Bring the database at ``engine`` up to ``target`` (default: newest).
+
+    Returns the names of the migrations that were applied.
+    """
+    migrations = available_migrations()
+    if target is None:
+        target = migrations[-1][0] if migrations else 0
+
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+        if not inspect(conn).has_table("laws"):
+            Base.metadata.create_all(conn)
+            for version, name, _ in migrations:
+                if version <= target:
+                    _record(conn, version, name)
+            logger.info(f"Created schema at version {target}")
+            return []
+        version = current_version(conn)
+
+    applied = []
+    for migration_version, name, module in migrations:
+        if migration_version <= version or migration_version > target:
+            continue
+        logger.info(f"Applying migration {name}")
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            _record(conn, migration_version, name)
+        applied.append(name)
+    return applied
+
+
+def has_column(conn, table, column) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def has_index(conn, table, index) -> bool:
+    insp = inspect(conn)
+    names = {i["name"] for i in insp.get_indexes(table)}
+    names |= {u["name"] for u in insp.get_unique_constraints(table)}
+    return index in names
@@ -0,0 +1,39 @@
+"""Indexes for the hot read queries, Norm.sort_key and a 32-char content_hash.
+
+- laws.name becomes unique (every law route looks a law up by name)
+- norms.sort_key holds the numeric part of the norm number so TOC order and
+  previous/next lookups no longer need CAST(number AS INTEGER)
+- (law_id, is_stale, sort_key) serves TOC, full view and neighbour queries
+- (is_stale, views) serves popularity-ordered norm listings
+- content_hash was CHAR(64) for 32-char MD5 digests
+"""
+from sqlalchemy import text
+
+from models.law import norm_sort_key
+from . import has_column, has_index
+
+INDEXES = [
+    ("laws", "uq_laws_name", "UNIQUE INDEX", "name"),
+    ("norms", "ix_norms_law_stale_sort", "INDEX", "law_id, is_stale, sort_key"),
+    ("norms", "ix_norms_stale_views", "INDEX", "is_stale, views"),
+]
+
+
+def upgrade(conn):
+    if not has_column(conn, "norms", "sort_key"):
+        conn.execute(text("ALTER TABLE norms ADD COLUMN sort_key INTEGER NOT NULL DEFAULT 0"))
+
+    rows = conn.execute(text("SELECT id, number FROM norms")).all()
+    if rows:
+        conn.execute(
+            text("UPDATE norms SET sort_key = :sort_key WHERE id = :norm_id"),
+            [{"norm_id": row.id, "sort_key": norm_sort_key(row.number)} for row in rows],
+        )
+    conn.execute(text("UPDATE norms SET is_stale = 0 WHERE is_stale IS NULL"))
+
+    for table, name, kind, columns in INDEXES:
+        if not has_index(conn, table, name):
+            conn.execute(text(f"CREATE {kind} {name} ON {table} ({columns})"))
+
+    if conn.dialect.name == "mysql":
+        conn.execute(text("ALTER TABLE norms MODIFY content_hash CHAR(32) NULL"))
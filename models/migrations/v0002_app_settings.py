@@ -0,0 +1,13 @@
+"""Key/value table for state shared between scraper and web app (catalog version)."""
+from sqlalchemy import Column, MetaData, String, Table
+
+app_settings = Table(
+    "app_settings",
+    MetaData(),
+    Column("key", String(64), primary_key=True),
+    Column("value", String(255), nullable=False),
+)
+
+
+def upgrade(conn):
+    app_settings.create(conn, checkfirst=True)
@@ -0,0 +1,24 @@
+"""Spool table for the background mail sender."""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text
+
+mail_outbox = Table(
+    "mail_outbox",
+    MetaData(),
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("recipient", String(255), nullable=False),
+    Column("subject", String(255), nullable=False),
+    Column("body_text", Text, nullable=False),
+    Column("body_html", Text),
+    Column("status", String(16), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("next_attempt_at", DateTime, nullable=False),
+    Column("locked_until", DateTime),
+    Column("last_error", String(500)),
+    Column("created_at", DateTime, nullable=False),
+    Column("sent_at", DateTime),
+    Index("ix_mail_outbox_status_due", "status", "next_attempt_at"),
+)
+
+
+def upgrade(conn):
+    mail_outbox.create(conn, checkfirst=True)
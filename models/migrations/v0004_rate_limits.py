@@ -0,0 +1,15 @@
+"""Shared counters for login throttling."""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+
+rate_limits = Table(
+    "rate_limits",
+    MetaData(),
+    Column("key", String(191), primary_key=True),
+    Column("count", Integer, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Index("ix_rate_limits_expires_at", "expires_at"),
+)
+
+
+def upgrade(conn):
+    rate_limits.create(conn, checkfirst=True)
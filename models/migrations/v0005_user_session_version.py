@@ -0,0 +1,9 @@
+"""users.session_version, bumped to end all sessions of a user (password change, deactivation)."""
+from sqlalchemy import text
+
+from . import has_column
+
+
+def upgrade(conn):
+    if not has_column(conn, "users", "session_version"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN session_version INTEGER NOT NULL DEFAULT 0"))
@@ -0,0 +1,22 @@
+"""Edge table for citations between norms, filled by the scraper's reference extraction."""
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+# Only referenced for the foreign key, never created here
+Table("norms", metadata, Column("id", Integer, primary_key=True))
+
+norm_references = Table(
+    "norm_references",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("source_norm_id", Integer, ForeignKey("norms.id", ondelete="CASCADE"), nullable=False),
+    Column("target_law", String(255), nullable=False),
+    Column("target_number", String(50), nullable=False),
+    Index("ix_norm_references_source", "source_norm_id"),
+    Index("ix_norm_references_target", "target_law", "target_number"),
+)
+
+
+def upgrade(conn):
+    norm_references.create(conn, checkfirst=True)
@@ -0,0 +1,29 @@
+"""History of norm contents, stored as compressed deltas with periodic snapshots.
+
+History starts empty; the scraper records the replaced content as the first
+version the first time a norm changes.
+"""
+from sqlalchemy import CHAR, Column, Date, DateTime, ForeignKey, Index, Integer, LargeBinary, MetaData, SmallInteger, String, Table
+
+metadata = MetaData()
+
+# Only referenced for the foreign key, never created here
+Table("norms", metadata, Column("id", Integer, primary_key=True))
+
+norm_versions = Table(
+    "norm_versions",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("norm_id", Integer, ForeignKey("norms.id", ondelete="CASCADE"), nullable=False),
+    Column("valid_from", Date, nullable=False),
+    Column("title", String(255)),
+    Column("content_hash", CHAR(32)),
+    Column("depth", SmallInteger, nullable=False),
+    Column("data", LargeBinary(16777215), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Index("uq_norm_versions_norm_valid", "norm_id", "valid_from", unique=True),
+)
+
+
+def upgrade(conn):
+    norm_versions.create(conn, checkfirst=True)
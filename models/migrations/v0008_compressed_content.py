@@ -0,0 +1,22 @@
+"""norms.content_z for dictionary-compressed content and the table holding the dictionaries.
+
+Both stay empty until `flask compress-content` fills them; see models.compression.
+"""
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, MetaData, Table, text
+
+from . import has_column
+
+content_dictionaries = Table(
+    "content_dictionaries",
+    MetaData(),
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("data", LargeBinary, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn):
+    content_dictionaries.create(conn, checkfirst=True)
+    if not has_column(conn, "norms", "content_z"):
+        column_type = "MEDIUMBLOB" if conn.dialect.name == "mysql" else "BLOB"
+        conn.execute(text(f"ALTER TABLE norms ADD COLUMN content_z {column_type} NULL"))
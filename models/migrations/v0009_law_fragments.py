@@ -0,0 +1,27 @@
+"""Pre-rendered TOC and full-view fragments per law.
+
+Starts empty; the scraper fills it after each law, `python -m
+law_scraper.fragments` renders all laws at once.
+"""
+from sqlalchemy import CHAR, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+# Only referenced for the foreign key, never created here
+Table("laws", metadata, Column("id", Integer, primary_key=True))
+
+law_fragments = Table(
+    "law_fragments",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("law_id", Integer, ForeignKey("laws.id", ondelete="CASCADE"), nullable=False),
+    Column("kind", String(20), nullable=False),
+    Column("source_hash", CHAR(32), nullable=False),
+    Column("html", Text(16777215), nullable=False),
+    Column("rendered_at", DateTime, nullable=False),
+    Index("uq_law_fragments_law_kind", "law_id", "kind", unique=True),
+)
+
+
+def upgrade(conn):
+    law_fragments.create(conn, checkfirst=True)
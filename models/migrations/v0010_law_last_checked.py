@@ -0,0 +1,9 @@
+"""laws.last_checked: when the scraper last checked a law, for its refresh schedule."""
+from sqlalchemy import text
+
+from . import has_column
+
+
+def upgrade(conn):
+    if not has_column(conn, "laws", "last_checked"):
+        conn.execute(text("ALTER TABLE laws ADD COLUMN last_checked DATETIME NULL"))
@@ -0,0 +1,17 @@
+"""content_hash columns as ASCII, for the 32 hex digit fingerprints of models.fingerprint.
+
+MySQL sizes utf8mb4 CHAR(32) for 128 bytes, in the row and in every index
+that includes it. Existing MD5 values stay until ``flask rehash-content``
+replaces them; until then law_scraper.db.save_norm recognizes an unchanged
+norm by its content and only rewrites the hash.
+"""
+from sqlalchemy import text
+
+TABLES = ("norms", "norm_versions")
+
+
+def upgrade(conn):
+    if conn.dialect.name != "mysql":
+        return
+    for table in TABLES:
+        conn.execute(text(f"ALTER TABLE {table} MODIFY content_hash CHAR(32) CHARACTER SET ascii COLLATE ascii_bin NULL"))
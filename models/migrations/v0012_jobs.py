@@ -0,0 +1,37 @@
+"""Queue table for the job worker and the spool of page hits it rolls up."""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+jobs = Table(
+    "jobs",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("kind", String(32), nullable=False),
+    Column("args", Text),
+    Column("status", String(16), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("run_at", DateTime, nullable=False),
+    Column("locked_until", DateTime),
+    Column("last_error", String(500)),
+    Column("result", String(500)),
+    Column("created_at", DateTime, nullable=False),
+    Column("started_at", DateTime),
+    Column("finished_at", DateTime),
+    Index("ix_jobs_status_run_at", "status", "run_at"),
+)
+
+pending_hits = Table(
+    "pending_hits",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("hit_type", String(8), nullable=False),
+    Column("identifier", String(255), nullable=False),
+    Column("count", Integer, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn):
+    jobs.create(conn, checkfirst=True)
+    pending_hits.create(conn, checkfirst=True)
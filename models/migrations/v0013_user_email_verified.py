@@ -0,0 +1,13 @@
+"""users.email_verified_at, so a login can resend the verification mail of an unverified account only."""
+from sqlalchemy import text
+
+from . import has_column
+
+
+def upgrade(conn):
+    if not has_column(conn, "users", "email_verified_at"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN email_verified_at DATETIME NULL"))
+        # Active accounts were verified (or created with create-user); deactivation bumped session_version
+        conn.execute(text(
+            "UPDATE users SET email_verified_at = created_at WHERE is_active = 1 OR session_version > 0"
+        ))
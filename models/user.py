@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import Enum, String, Integer, DateTime, SmallInteger, CHAR
+from typing import Optional
 import datetime
 import enum
 import uuid
@@ -24,3 +25,6 @@ class User(UserMixin, Base):
     role: Mapped[UserRole] = mapped_column(Enum(UserRole), nullable=False, default=UserRole.user)
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, default=datetime.datetime.now(datetime.UTC))
     is_active: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=1)
+    session_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Unset until the verification link is followed; is_active alone also covers deactivated accounts
+    email_verified_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
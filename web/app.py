@@ -1,6 +1,7 @@
 import dotenv
 dotenv.load_dotenv()
 
+import datetime
 import logging
 import os
 import time as _time
@@ -8,16 +9,19 @@ import time as _time
 import click
 from flask import Flask, render_template
 from itsdangerous import URLSafeTimedSerializer
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.exceptions import HTTPException
-from werkzeug.security import generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from .extensions import db, login_manager
-from . import hits
+from . import cache, catalog, commands, hits, jobs, mail, passwords, query_stats, snapshot
+from .routes.api import api_bp
 from .routes.auth import auth_bp
 from .routes.laws import laws_bp
 from .routes.misc import misc_bp
 from .routes.user import user_bp
-from models import User, UserRole
+from models import User, UserRole, compression
+from models.config import database_url
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,22 +36,18 @@ _ERROR_MESSAGES = {
 
 
 def create_app() -> Flask:
+    started = _time.perf_counter()
     app = Flask(__name__)
+    # Compiled templates are reused across worker restarts; JINJA_CACHE_DIR defaults to a per-user temp directory
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(os.environ.get("JINJA_CACHE_DIR"))}
 
-    required_vars = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME", "SECRET_KEY"]
+    # DATABASE_URL overrides the DB_* variables, e.g. a local SQLite file for benchmarks
+    required_vars = ["SECRET_KEY"] if os.environ.get("DATABASE_URL") else ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME", "SECRET_KEY"]
     missing = [v for v in required_vars if not os.environ.get(v)]
     if missing:
         raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
 
-    db_host = os.environ["DB_HOST"]
-    db_port = int(os.environ.get("DB_PORT", 3306))
-    db_user = os.environ["DB_USER"]
-    db_password = os.environ["DB_PASSWORD"]
-    db_name = os.environ["DB_NAME"]
-
-    app.config["SQLALCHEMY_DATABASE_URI"] = (
-        f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}?charset=utf8mb4"
-    )
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url()
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SECRET_KEY"] = os.environ["SECRET_KEY"]
     app.config["API_VERSION"] = os.environ.get("API_VERSION", "1.0")
@@ -55,15 +55,29 @@ def create_app() -> Flask:
     app.config["TOKEN_SERIALIZER"] = URLSafeTimedSerializer(app.config["SECRET_KEY"])
     app.config["START_TIME"] = _time.time()
 
+    # Number of reverse proxies in front of the app whose X-Forwarded-For/-Proto
+    # headers are trusted; without it every client has the proxy's address
+    trusted_proxies = int(os.environ.get("TRUSTED_PROXIES", 0))
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
     db.init_app(app)
     login_manager.init_app(app)
+    with app.app_context():
+        compression.bind(db.engine)
+        query_stats.bind(db.engine)
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(laws_bp)
     app.register_blueprint(misc_bp)
+    app.register_blueprint(api_bp)
 
+    snapshot.init_app(app)
     hits.init_app(app)
+    mail.init_app(app)
+    jobs.init_app(app)
+    commands.init_app(app)
 
     @app.context_processor
     def inject_globals():
@@ -98,14 +112,58 @@ def create_app() -> Flask:
             email=email,
             first_name=first_name,
             last_name=last_name,
-            password_hash=generate_password_hash(password),
+            password_hash=passwords.hash_password(password),
             role=UserRole(role),
+            email_verified_at=datetime.datetime.now(),
         )
         db.session.add(user)
         db.session.commit()
         click.echo(f"Created user: {email} (role: {role})")
 
+    # Compile every template now instead of in the first request that needs it
+    templates_started = _time.perf_counter()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    logger.info(
+        f"App ready in {(_time.perf_counter() - started) * 1000:.0f} ms "
+        f"(templates {(_time.perf_counter() - templates_started) * 1000:.0f} ms)"
+    )
     return app
 
 
+def warm_up(app: Flask) -> None:
+    """Load what the first requests would otherwise wait for.
+
+    That is the catalog, the compression dictionaries and, with CACHE_SEED_PATH,
+    the pages an earlier worker saved. Under gunicorn with preload_app (see
+    gunicorn.conf.py) this runs once in the master and the workers inherit it.
+    """
+    started = _time.perf_counter()
+    with app.app_context():
+        catalog.all_laws()
+        if compression.COMPRESS_CONTENT:
+            compression.load_dictionaries()
+        seeded = cache.load_seed(catalog.version())
+    logger.info(f"Warmed up in {(_time.perf_counter() - started) * 1000:.0f} ms ({seeded} cached pages loaded)")
+
+
+def init_worker(app: Flask) -> None:
+    """Per-process setup in a worker forked from a process that already used the database."""
+    with app.app_context():
+        # Pooled connections belong to the parent; the worker opens its own
+        db.engine.dispose(close=False)
+
+
+def save_cache(app: Flask) -> None:
+    """Save the page cache to CACHE_SEED_PATH for the next worker, e.g. when this one exits."""
+    try:
+        with app.app_context():
+            saved = cache.save_seed(catalog.version())
+    except Exception as e:
+        logger.warning(f"Could not save the page cache: {e}")
+        return
+    if saved:
+        logger.info(f"Saved {saved} cached pages")
+
+
 app = create_app()
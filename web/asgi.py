@@ -0,0 +1,252 @@
+"""ASGI entry point: the read-only law pages on an event loop, everything else on Flask.
+
+    uvicorn web.asgi:app --workers 4
+
+Anonymous GET requests for ``/``, ``/gesetz/<law>``, ``/gesetz/<law>/gesamt``,
+``/gesetz/<law>/<norm>`` and ``/suche`` are served by coroutines. They run the
+statements from web/queries.py on an async engine (aiomysql, or aiosqlite for
+a ``sqlite://`` DATABASE_URL), render the Flask app's templates on the
+thread pool and share its page cache, so a worker waiting on the database or
+on a slow client keeps serving other connections. Builds are coalesced within
+the worker only: CACHE_LOCK_DIR, which coalesces them across the Flask
+workers of a host (web/cache.py), is not used here, so with N uvicorn
+workers a page that expired may be built up to N times at once.
+
+Everything else goes to the unchanged Flask app on a thread pool
+(ASGI_WSGI_THREADS): other routes, other methods, unknown laws and norms (for
+the usual error page), requests carrying a session cookie (their pages depend
+on the logged-in user) and, in snapshot mode, all requests, since those never
+wait on the database.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+
+from a2wsgi import WSGIMiddleware
+from flask_login import AnonymousUserMixin
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import HTMLResponse, Response
+from starlette.routing import Mount, Route
+
+from . import catalog, hits, queries, query_stats, snapshot
+from .app import app as flask_app, save_cache, warm_up
+from .cache import cache_fetch_async
+from .routes.laws import parse_direct_query, render_search_results
+from models import fragment_source_hash
+
+logger = logging.getLogger("asgi")
+
+_POOL_SIZE: int = int(os.environ.get("ASGI_DB_POOL_SIZE", 10))
+_MAX_OVERFLOW: int = int(os.environ.get("ASGI_DB_MAX_OVERFLOW", 10))
+_WSGI_THREADS: int = int(os.environ.get("ASGI_WSGI_THREADS", 10))
+# Catalog checks and hit flushes run on a thread in the background instead of inside a request
+_MAINTENANCE_INTERVAL: int = int(os.environ.get("ASGI_MAINTENANCE_INTERVAL", 10))
+
+_ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+_wsgi = WSGIMiddleware(flask_app, workers=_WSGI_THREADS)
+_anonymous = AnonymousUserMixin()
+_user_cookies = (
+    flask_app.config["SESSION_COOKIE_NAME"],
+    flask_app.config.get("REMEMBER_COOKIE_NAME", "remember_token"),
+)
+
+
+def _async_url(url):
+    url = make_url(url)
+    return url.set(drivername=_ASYNC_DRIVERS[url.get_backend_name()])
+
+
+_engine = create_async_engine(
+    _async_url(flask_app.config["SQLALCHEMY_DATABASE_URI"]),
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=_POOL_SIZE,
+    max_overflow=_MAX_OVERFLOW,
+    pool_recycle=3600,
+)
+query_stats.bind(_engine.sync_engine)
+
+
+class _Flask(Response):
+    """Hands the request to the Flask app instead of answering it here."""
+
+    async def __call__(self, scope, receive, send):
+        await _wsgi(scope, receive, send)
+
+
+def _read_only(handler):
+    async def endpoint(request):
+        if (snapshot.active() or request.method not in ("GET", "HEAD")
+                or any(name in request.cookies for name in _user_cookies)):
+            return _Flask()
+        with flask_app.app_context(), query_stats.tagged(f"asgi.{handler.__name__}"):
+            return await handler(request)
+    return endpoint
+
+
+async def _render(template, **context):
+    """Render on the thread pool: a large page (e.g. /gesamt) would hold up every connection on the loop."""
+    return await run_in_threadpool(_render_sync, template, context)
+
+
+def _render_sync(template, context):
+    with flask_app.app_context():
+        context["current_user"] = _anonymous
+        flask_app.update_template_context(context)
+        return flask_app.jinja_env.get_template(template).render(context)
+
+
+async def _cached_page(cache_key, build, hit=None):
+    """The cached page or ``await build()``; a None build result goes to Flask (404)."""
+    rendered = await cache_fetch_async(cache_key, build)
+    if rendered is None:
+        return _Flask()
+    if hit:
+        hits.count(*hit)
+    return HTMLResponse(rendered)
+
+
+async def _fragment(conn, law, kind, norms):
+    if not norms:
+        return None
+    source_hash = fragment_source_hash(kind, law.name, norms)
+    return (await conn.execute(queries.fragment(law.id, kind, source_hash))).scalar()
+
+
+@_read_only
+async def law_index(request):
+    async def build():
+        return await _render("index.html", laws=catalog.all_laws())
+    return await _cached_page("law_index", build)
+
+
+@_read_only
+async def law_toc(request):
+    law = catalog.get(request.path_params["law_name"])
+    if not law:
+        return _Flask()
+
+    async def build():
+        async with _engine.connect() as conn:
+            norms = (await conn.execute(queries.toc_norms(law.id))).all()
+            fragment = await _fragment(conn, law, "toc", norms)
+        return await _render("toc.html", law=law, norms=norms, fragment=fragment)
+    return await _cached_page(f"toc_{law.name}", build, hit=("law", law.name))
+
+
+@_read_only
+async def law_full_view(request):
+    law = catalog.get(request.path_params["law_name"])
+    if not law:
+        return _Flask()
+
+    async def build():
+        async with _engine.connect() as conn:
+            norms = (await conn.execute(queries.toc_norms(law.id))).all()
+            fragment = await _fragment(conn, law, "articles", norms)
+            if fragment is None:
+                norms = (await conn.execute(queries.full_view_norms(law.id))).all()
+        return await _render("full_view.html", law=law, norms=norms, fragment=fragment)
+    return await _cached_page(f"full_view_{law.name}", build, hit=("law", law.name))
+
+
+@_read_only
+async def norm_detail(request):
+    law = catalog.get(request.path_params["law_name"])
+    if not law:
+        return _Flask()
+    norm_number = request.path_params["norm_number"]
+
+    async def build():
+        async with _engine.connect() as conn:
+            norm = (await conn.execute(queries.norm(law.id, norm_number))).first()
+            if not norm:
+                return None
+            neighbours = catalog.neighbours(law, norm.number, 5)
+            if neighbours is not None:
+                prev_norms, next_norms = neighbours
+            else:
+                prev_norms = list(reversed((await conn.execute(queries.prev_norms(law.id, norm, 5))).all()))
+                next_norms = (await conn.execute(queries.next_norms(law.id, norm, 5))).all()
+            references = (await conn.execute(queries.references(norm.id))).all()
+            cited_by = (await conn.execute(queries.cited_by(law.name, norm.number))).all()
+            versions = (await conn.execute(queries.version_ids(norm.id))).all()
+        return await _render(
+            "norm.html",
+            law=law,
+            norm=norm,
+            prev_norm=prev_norms[-1] if prev_norms else None,
+            next_norm=next_norms[0] if next_norms else None,
+            prev_norms=prev_norms,
+            next_norms=next_norms,
+            references=references,
+            cited_by=cited_by,
+            has_history=len(versions) > 1,
+        )
+    return await _cached_page(f"norm_{law.name}_{norm_number}", build, hit=("norm", f"{law.name}/{norm_number}"))
+
+
+@_read_only
+async def search(request):
+    q = request.query_params.get("q", "").strip()
+    if len(q) < 2:
+        return HTMLResponse("")
+
+    direct_match = None
+    direct_law = None
+    async with _engine.connect() as conn:
+        direct = parse_direct_query(q)
+        if direct:
+            law_name, norm_number = direct
+            direct_law = catalog.find(law_name)
+            if direct_law:
+                direct_match = (await conn.execute(queries.direct_match(direct_law.id, norm_number))).first()
+        laws = (await conn.execute(queries.search_laws(q))).all()
+        norms = (await conn.execute(queries.search_norms(q))).all()
+    return HTMLResponse(render_search_results(direct_law, direct_match, laws, norms))
+
+
+def _maintain():
+    with flask_app.app_context():
+        catalog.check()
+    hits.maybe_flush()
+
+
+async def _maintenance_loop():
+    while True:
+        await asyncio.sleep(_MAINTENANCE_INTERVAL)
+        try:
+            await run_in_threadpool(_maintain)
+        except Exception as e:
+            logger.warning(f"Background maintenance failed: {e}")
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(app):
+    await run_in_threadpool(warm_up, flask_app)
+    task = asyncio.create_task(_maintenance_loop())
+    try:
+        yield
+    finally:
+        task.cancel()
+        hits.flush()
+        save_cache(flask_app)
+        await _engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route("/", law_index, methods=None),
+        Route("/suche", search, methods=None),
+        Route("/gesetz/{law_name}", law_toc, methods=None),
+        Route("/gesetz/{law_name}/gesamt", law_full_view, methods=None),
+        Route("/gesetz/{law_name}/{norm_number}", norm_detail, methods=None),
+        Mount("", app=_wsgi),
+    ],
+    lifespan=_lifespan,
+)
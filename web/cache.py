@@ -1,9 +1,36 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
 import os
+import pickle
+import threading
 import time
 from flask_login import current_user
 
+logger = logging.getLogger("cache")
+
 _cache: dict = {}
 _TTL = int(os.environ.get("CACHE_TTL", 3600))
+# Expired entries are still served for this long while a single request rebuilds them
+_GRACE = int(os.environ.get("CACHE_GRACE", 300))
+# Longest a request waits for another request building the same key before building itself
+_BUILD_WAIT = float(os.environ.get("CACHE_BUILD_WAIT", 10))
+# Optional directory shared by the workers of one host; coalesces builds across processes
+_LOCK_DIR = os.environ.get("CACHE_LOCK_DIR")
+# Optional file the cache is saved to when a worker exits and loaded from when the next one starts
+_SEED_PATH = os.environ.get("CACHE_SEED_PATH")
+
+_locks: dict = {}
+_locks_guard = threading.Lock()
+_builds: dict = {}
+# Shared values built before this worker started may predate a catalog change
+_cleared_at: float = time.time()
+
+
+def shared_dir():
+    """CACHE_LOCK_DIR, where the workers of a host share built values; None if unset."""
+    return _LOCK_DIR
 
 
 def cache_get(key: str):
@@ -17,14 +44,182 @@ def cache_set(key: str, value) -> None:
     _cache[key] = {"value": value, "time": time.time()}
 
 
-def page_cache_get(key: str):
-    """Returns None for authenticated users so they always get a fresh render."""
-    if current_user.is_authenticated:
-        return None
-    return cache_get(key)
+def cache_clear() -> None:
+    global _cleared_at
+    _cache.clear()
+    _cleared_at = time.time()
+    _prune_shared()
+
+
+def _prune_shared() -> None:
+    """Remove the files in CACHE_LOCK_DIR no worker can use any more.
+
+    A removed lock file can let two workers build the same key once more; values
+    are replaced atomically, so that costs a render and nothing else.
+    """
+    if not _LOCK_DIR:
+        return
+    oldest = time.time() - _TTL - _GRACE
+    try:
+        entries = list(os.scandir(_LOCK_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < oldest:
+                os.unlink(entry.path)
+        except OSError:
+            # Removed by another worker
+            pass
+
 
+def cache_fetch(key: str, build):
+    """The cached value of ``key``, or ``build()`` run by one thread at a time.
 
-def page_cache_set(key: str, value) -> None:
-    """Skips caching for authenticated users."""
-    if not current_user.is_authenticated:
+    Once the entry expires, it is served for another CACHE_GRACE seconds while
+    the first request to notice rebuilds it. Without a usable entry, concurrent
+    requests wait for the one that builds instead of all running ``build()``.
+    """
+    started = time.time()
+    entry = _cache.get(key)
+    age = started - entry["time"] if entry else None
+    if entry and age < _TTL:
+        return entry["value"]
+
+    lock = _key_lock(key)
+    if entry and age < _TTL + _GRACE:
+        if not lock.acquire(blocking=False):
+            return entry["value"]
+    elif not lock.acquire(timeout=_BUILD_WAIT):
+        return build()
+    try:
+        entry = _cache.get(key)
+        if entry and (entry["time"] >= started or time.time() - entry["time"] < _TTL):
+            # Built by the request this one waited for
+            return entry["value"]
+        value = _build_shared(key, build)
         cache_set(key, value)
+        return value
+    finally:
+        lock.release()
+
+
+async def cache_fetch_async(key: str, build):
+    """cache_fetch() for coroutines: ``await build()`` runs once per key, a None result is not cached.
+
+    Expired entries in their grace period are refreshed by a background task.
+    """
+    entry = _cache.get(key)
+    age = time.time() - entry["time"] if entry else None
+    if entry and age < _TTL:
+        return entry["value"]
+
+    task = _builds.get(key)
+    if task is None:
+        task = _builds[key] = asyncio.ensure_future(_build_async(key, build))
+    if entry and age < _TTL + _GRACE:
+        return entry["value"]
+    return await asyncio.shield(task)
+
+
+async def _build_async(key, build):
+    try:
+        value = await build()
+        if value is not None:
+            cache_set(key, value)
+        return value
+    finally:
+        _builds.pop(key, None)
+
+
+def _key_lock(key):
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = threading.Lock()
+        return lock
+
+
+def _build_shared(key, build):
+    """Run ``build()`` under a per-key file lock, reusing what another worker just built."""
+    if not _LOCK_DIR:
+        return build()
+    path = os.path.join(_LOCK_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest())
+    try:
+        lock_file = _open_lock(f"{path}.lock")
+    except OSError as e:
+        logger.warning(f"Building {key} without the shared cache: {e}")
+        return build()
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            try:
+                # Only values built since this worker last dropped its cache are current
+                built_at = os.path.getmtime(path)
+                if built_at > _cleared_at and time.time() - built_at < _TTL:
+                    with open(path, "rb") as f:
+                        return pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            value = build()
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not share {key}: {e}")
+            return value
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _open_lock(path):
+    try:
+        return open(path, "a")
+    except FileNotFoundError:
+        os.makedirs(_LOCK_DIR, exist_ok=True)
+        return open(path, "a")
+
+
+def save_seed(version: str) -> int:
+    """Write the unexpired entries to CACHE_SEED_PATH, tagged with the catalog version they were built from."""
+    if not _SEED_PATH:
+        return 0
+    now = time.time()
+    entries = {key: entry for key, entry in list(_cache.items()) if now - entry["time"] < _TTL + _GRACE}
+    tmp_path = f"{_SEED_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"version": version, "entries": entries}, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, _SEED_PATH)
+    return len(entries)
+
+
+def load_seed(version: str) -> int:
+    """Fill the cache from CACHE_SEED_PATH if it was saved for the same catalog version.
+
+    Entries keep their original build time, so they expire as if this worker had built them.
+    """
+    if not _SEED_PATH:
+        return 0
+    try:
+        with open(_SEED_PATH, "rb") as f:
+            seed = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return 0
+    if seed.get("version") != version:
+        return 0
+    now = time.time()
+    loaded = 0
+    for key, entry in seed["entries"].items():
+        if now - entry["time"] < _TTL + _GRACE and key not in _cache:
+            _cache[key] = entry
+            loaded += 1
+    return loaded
+
+
+def page_cache_fetch(key: str, build):
+    """cache_fetch() for pages; authenticated users always get a fresh render."""
+    if current_user.is_authenticated:
+        return build()
+    return cache_fetch(key, build)
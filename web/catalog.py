@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, func
+
+from . import snapshot
+from .cache import cache_clear
+from .extensions import db
+from .norm_index import NormIndex
+from models import CATALOG_VERSION_KEY, Law, Norm, Setting
+
+logger = logging.getLogger("catalog")
+
+_CHECK_INTERVAL: int = int(os.environ.get("CATALOG_CHECK_INTERVAL", 30))
+# Keep every norm's number and title in memory for the prev/next links (see web/norm_index.py)
+_NORM_INDEX = os.environ.get("NORM_INDEX", "1") != "0"
+
+
+class LawEntry(NamedTuple):
+    id: int
+    name: str
+    description: Optional[str]
+    last_modified: Optional[date]
+    norm_count: int
+
+
+_laws: dict = {}
+_laws_lower: dict = {}
+_sorted: list = []
+_norms: Optional[NormIndex] = None
+_version: Optional[str] = None
+_loaded: bool = False
+_checked_at: float = 0.0
+_lock = threading.Lock()
+
+
+def get(law_name: str) -> Optional[LawEntry]:
+    """Resolve a law by its exact name without touching the database."""
+    _maybe_refresh()
+    return _laws.get(law_name)
+
+
+def find(law_name: str) -> Optional[LawEntry]:
+    """Case-insensitive variant of get(), used by the search."""
+    _maybe_refresh()
+    return _laws_lower.get(law_name.lower())
+
+
+def all_laws() -> list:
+    """All laws ordered by name."""
+    _maybe_refresh()
+    return _sorted
+
+
+def neighbours(law: LawEntry, number: str, count: int):
+    """(before, after): up to ``count`` current norms around a norm in TOC order.
+
+    None when the norm index is off or does not have the norm yet; the
+    caller then asks the database.
+    """
+    _maybe_refresh()
+    norms = _norms
+    return norms.neighbours(law.id, number, count) if norms is not None else None
+
+
+def version() -> str:
+    """Version of the loaded data, for ETags. Changes whenever the scraper publishes."""
+    _maybe_refresh()
+    return _version or "0"
+
+
+def invalidate() -> None:
+    """Force a reload on the next access."""
+    global _loaded
+    _loaded = False
+
+
+def load() -> None:
+    """(Re)load the catalog. Requires an app context."""
+    global _laws, _laws_lower, _sorted, _norms, _version, _loaded, _checked_at
+    if snapshot.active():
+        version = snapshot.get().meta.get("catalog_version")
+        rows = snapshot.get().laws()
+    else:
+        version = _read_version()
+        rows = db.session.query(
+            Law.id, Law.name, Law.description, Law.last_modified, func.count(Norm.id),
+        ).outerjoin(
+            Norm, and_(Norm.law_id == Law.id, Norm.is_stale == 0),
+        ).group_by(Law.id).order_by(Law.name).all()
+
+    norms = None
+    # A snapshot is already shared between processes and has its own neighbours()
+    if _NORM_INDEX and not snapshot.active():
+        norms = NormIndex(db.session.query(Norm.law_id, Norm.number, Norm.title, Norm.is_stale).order_by(
+            Norm.law_id, Norm.sort_key, Norm.number,
+        ).yield_per(10000))
+
+    entries = [LawEntry(*row) for row in rows]
+    _laws = {entry.name: entry for entry in entries}
+    _laws_lower = {entry.name.lower(): entry for entry in entries}
+    _sorted = entries
+    _norms = norms
+    if _loaded and version != _version:
+        # Pages rendered from the previous data are outdated as well
+        cache_clear()
+    _version = version
+    _loaded = True
+    _checked_at = time.time()
+    indexed = f", {norms.norm_count} norms in {norms.nbytes() / 1024:.0f} KiB" if norms is not None else ""
+    logger.info(f"Loaded catalog with {len(entries)} laws{indexed} (version {version})")
+
+
+def _read_version() -> Optional[str]:
+    setting = db.session.get(Setting, CATALOG_VERSION_KEY)
+    return setting.value if setting else None
+
+
+def check() -> None:
+    """Check the version now instead of on the next access after CATALOG_CHECK_INTERVAL.
+
+    Lets the ASGI read path keep the catalog fresh from a background thread.
+    """
+    _refresh(force=True)
+
+
+def check_interval() -> int:
+    """Seconds a worker may serve an old catalog version (CATALOG_CHECK_INTERVAL)."""
+    return _CHECK_INTERVAL
+
+
+def _maybe_refresh() -> None:
+    if _loaded and (snapshot.active() or (time.time() - _checked_at) < _CHECK_INTERVAL):
+        return
+    _refresh(force=False)
+
+
+def _refresh(force: bool) -> None:
+    global _checked_at
+    with _lock:
+        if not _loaded:
+            load()
+            return
+        if snapshot.active() or (not force and (time.time() - _checked_at) < _CHECK_INTERVAL):
+            return
+        _checked_at = time.time()
+        try:
+            version = _read_version()
+        except Exception as e:
+            logger.warning(f"Could not check catalog version: {e}")
+            return
+        if version != _version:
+            load()
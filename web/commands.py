@@ -0,0 +1,256 @@
+import click
+from flask.cli import with_appcontext
+
+from .extensions import db
+
+
+def init_app(app) -> None:
+    app.cli.add_command(migrate)
+    app.cli.add_command(mail_worker)
+    app.cli.add_command(jobs_worker)
+    app.cli.add_command(enqueue_job)
+    app.cli.add_command(list_jobs)
+    app.cli.add_command(deactivate_user)
+    app.cli.add_command(compress_content)
+    app.cli.add_command(rehash_content)
+
+
+@click.command("migrate")
+@click.option("--target", type=int, default=None, help="Migrate up to this version instead of the newest.")
+@with_appcontext
+def migrate(target):
+    """Apply pending schema migrations."""
+    from models.migrations import current_version, upgrade
+
+    applied = upgrade(db.engine, target)
+    with db.engine.connect() as conn:
+        version = current_version(conn)
+    for name in applied:
+        click.echo(f"Applied {name}")
+    click.echo(f"Schema at version {version}")
+
+
+@click.command("mail-worker")
+@with_appcontext
+def mail_worker():
+    """Run the mail sender in the foreground (set MAIL_WORKER=0 on the web workers)."""
+    from . import mail
+
+    click.echo("Sending spooled mails, Ctrl+C to stop")
+    try:
+        mail.run_worker()
+    except KeyboardInterrupt:
+        pass
+
+
+@click.command("jobs-worker")
+@with_appcontext
+def jobs_worker():
+    """Run queued jobs in the foreground: scrapes, cache warm-ups, sitemap, hit rollups."""
+    from . import jobs
+
+    click.echo("Running queued jobs, Ctrl+C to stop")
+    try:
+        jobs.run_worker()
+    except KeyboardInterrupt:
+        pass
+
+
+@click.command("enqueue-job")
+@click.argument("kind")
+@click.option("--law", "laws", multiple=True, help="laws.yml id to scrape (repeatable, scrape only).")
+@click.option("--delay", type=int, default=0, help="Seconds until the job may run.")
+@with_appcontext
+def enqueue_job(kind, laws, delay):
+    """Queue a job of KIND for the jobs worker."""
+    import datetime
+
+    from . import jobs
+
+    if laws and kind != "scrape":
+        click.echo("Error: --law only applies to scrape jobs.")
+        return
+    run_at = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+    try:
+        job = jobs.enqueue(kind, run_at=run_at, **({"laws": sorted(laws)} if laws else {}))
+    except ValueError as e:
+        click.echo(f"Error: {e}. Kinds: {', '.join(jobs.KINDS)}")
+        return
+    db.session.commit()
+    click.echo(f"Queued job {job.id} ({kind}) for {job.run_at:%Y-%m-%d %H:%M:%S}")
+
+
+@click.command("jobs")
+@click.option("--limit", type=int, default=20, help="Number of jobs to show.")
+@with_appcontext
+def list_jobs(limit):
+    """Show the most recent jobs."""
+    from models import Job
+
+    for job in db.session.query(Job).order_by(Job.id.desc()).limit(limit):
+        outcome = job.last_error if job.status in ("failed", "pending") and job.last_error else job.result
+        click.echo(f"{job.id:>6} {job.kind:<12} {job.status:<8} {job.attempts} "
+                   f"{job.run_at:%Y-%m-%d %H:%M:%S}  {outcome or ''}")
+
+
+@click.command("deactivate-user")
+@click.argument("email")
+@with_appcontext
+def deactivate_user(email):
+    """Deactivate a user account and end all of its sessions."""
+    from models import User
+    from .user_cache import end_sessions
+
+    user = db.session.query(User).filter(User.email == email.strip().lower()).first()
+    if user is None:
+        click.echo(f"Error: no user with email '{email}'.")
+        return
+    user.is_active = 0
+    end_sessions(user)
+    db.session.commit()
+    click.echo(f"Deactivated user: {user.email}")
+
+
+@click.command("compress-content")
+@click.option("--retrain", is_flag=True, help="Train a new dictionary even if one exists.")
+@click.option("--sample", type=int, default=2000, show_default=True, help="Norms to train the dictionary on.")
+@click.option("--drop-plain", is_flag=True, help="Clear the plain content column afterwards (needs NORM_CONTENT_COMPRESSION=1).")
+@click.option("--restore", is_flag=True, help="Copy compressed content back into the plain column instead.")
+@with_appcontext
+def compress_content(retrain, sample, drop_plain, restore):
+    """Fill norms.content_z from the authoritative content column (or back)."""
+    import datetime
+
+    from sqlalchemy import LargeBinary, bindparam, func, select, update
+    from models import ContentDictionary, Norm, Setting, compression
+
+    if drop_plain and not compression.COMPRESS_CONTENT:
+        click.echo("Error: --drop-plain needs NORM_CONTENT_COMPRESSION=1, the plain column is still in use.")
+        return
+
+    table = Norm.__table__
+    plain, packed = table.c.content, table.c.content_z
+    source, target = (packed, plain) if restore else (plain, packed)
+    if compression.COMPRESS_CONTENT and not restore:
+        # content_z is authoritative; only recompress it (e.g. with a new dictionary)
+        source = packed
+
+    compression.load_dictionaries()
+    if not restore and (retrain or compression.current_dictionary_id() == 0):
+        # Every n-th norm, so the sample spans all laws
+        total = db.session.execute(select(func.count()).select_from(table)).scalar()
+        step = max(1, total // max(sample, 1))
+        rows = db.session.execute(
+            select(source).where(source.isnot(None), table.c.id % step == 0).limit(sample)
+        ).scalars().all()
+        data = compression.train_dictionary(rows)
+        db.session.add(ContentDictionary(data=data, created_at=datetime.datetime.now()))
+        db.session.commit()
+        compression.load_dictionaries()
+        click.echo(f"Trained a {len(data)} byte dictionary on {len(rows)} norms")
+
+    last_id, done, raw_bytes, packed_bytes = 0, 0, 0, 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, source).where(table.c.id > last_id).order_by(table.c.id).limit(500)
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for norm_id, text in rows:
+            # content_z is read through CompressedText, so both directions yield str
+            if text is None:
+                continue
+            blob = compression.compress(text)
+            raw_bytes += len(text.encode("utf-8"))
+            packed_bytes += len(blob)
+            updates.append({"norm_id": norm_id, "value": text if restore else blob})
+        if updates:
+            db.session.execute(
+                update(table).where(table.c.id == bindparam("norm_id")).values(
+                    {target: bindparam("value", type_=target.type if restore else LargeBinary())}
+                ),
+                updates,
+            )
+        if drop_plain:
+            db.session.execute(update(table).where(table.c.id.in_([r[0] for r in rows])).values({plain: None}))
+        db.session.commit()
+        done += len(updates)
+        last_id = rows[-1][0]
+
+    # law_scraper.db.save_norm keeps the plain column up to date until it is dropped
+    dropped = db.session.get(Setting, compression.PLAIN_DROPPED_KEY)
+    if drop_plain and dropped is None:
+        db.session.add(Setting(key=compression.PLAIN_DROPPED_KEY, value="1"))
+    elif restore and dropped is not None:
+        db.session.delete(dropped)
+    db.session.commit()
+
+    if restore:
+        click.echo(f"Restored {done} norms ({raw_bytes} bytes)")
+    else:
+        click.echo(f"Compressed {done} norms: {raw_bytes} -> {packed_bytes} bytes")
+
+
+@click.command("rehash-content")
+@click.option("--batch", type=int, default=500, show_default=True, help="Norms per transaction.")
+@with_appcontext
+def rehash_content(batch):
+    """Recompute the content_hash of every norm and norm version (see models/fingerprint.py)."""
+    import zlib
+
+    from sqlalchemy import bindparam, select, update
+    from law_scraper.db import bump_catalog_version
+    from law_scraper.fragments import render_law_fragments
+    from models import Law, Norm, NormVersion, fingerprint
+    from models.history import apply_delta
+
+    last_id, norms_done, norms_changed, versions_changed = 0, 0, 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Norm.id, Norm.number_raw, Norm.title, Norm.content, Norm.content_hash)
+            .where(Norm.id > last_id).order_by(Norm.id).limit(batch)
+        ).all()
+        if not rows:
+            break
+        number_raw = {row.id: row.number_raw for row in rows}
+        norm_updates = [
+            {"row_id": row.id, "value": value}
+            for row in rows
+            if (value := fingerprint(row.number_raw, row.title, row.content)) != row.content_hash
+        ]
+
+        # Oldest first, so every delta follows the version it applies to
+        version_updates = []
+        content = None
+        for version in db.session.execute(
+            select(NormVersion.id, NormVersion.norm_id, NormVersion.title, NormVersion.depth,
+                   NormVersion.data, NormVersion.content_hash)
+            .where(NormVersion.norm_id.in_(number_raw)).order_by(NormVersion.norm_id, NormVersion.valid_from)
+        ):
+            if version.depth == 0:
+                content = zlib.decompress(version.data).decode("utf-8")
+            else:
+                content = apply_delta(content, version.data)
+            value = fingerprint(number_raw[version.norm_id], version.title, content)
+            if value != version.content_hash:
+                version_updates.append({"row_id": version.id, "value": value})
+
+        for table, updates in ((Norm.__table__, norm_updates), (NormVersion.__table__, version_updates)):
+            if updates:
+                db.session.execute(
+                    update(table).where(table.c.id == bindparam("row_id")).values(content_hash=bindparam("value")),
+                    updates,
+                )
+        db.session.commit()
+        norms_done += len(rows)
+        norms_changed += len(norm_updates)
+        versions_changed += len(version_updates)
+        last_id = rows[-1].id
+
+    # Fragment source hashes cover the norms' content_hash
+    fragments = sum(render_law_fragments(db.session, law_id) for (law_id,) in db.session.query(Law.id).all())
+    if norms_changed or versions_changed:
+        bump_catalog_version(db.session)
+    click.echo(f"Rehashed {norms_done} norms: {norms_changed} norm and {versions_changed} version hashes changed, "
+               f"{fragments} fragments re-rendered")
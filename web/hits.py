@@ -1,16 +1,26 @@
 import atexit
+import contextlib
+import datetime
 import logging
 import os
+import threading
 import time
 
+from sqlalchemy import insert
+
+from . import catalog, snapshot
 from .extensions import db
-from models import Law, Norm
+from models import Law, Norm, PendingHit
 
 logger = logging.getLogger("hits")
 
 _hits: dict = {}
 _last_flush: float = time.time()
 _INTERVAL: int = int(os.environ.get("HITS_FLUSH_INTERVAL", 60))
+# Spool hits for the hits_rollup job (web/jobs.py) instead of updating the view counts on the request path
+_ROLLUP = os.environ.get("HITS_ROLLUP", "0") == "1"
+_suspended = threading.local()
+_flushing = threading.Lock()
 _app = None
 
 
@@ -21,13 +31,31 @@ def init_app(app) -> None:
 
 
 def record(hit_type: str, identifier: str) -> None:
+    count(hit_type, identifier)
+    maybe_flush()
+
+
+def count(hit_type: str, identifier: str) -> None:
+    """Buffer a hit without flushing; for callers that must not block on the database."""
+    if getattr(_suspended, "active", False):
+        return
     key = f"{hit_type}:{identifier}"
     _hits[key] = _hits.get(key, 0) + 1
     logger.debug(f"Hit recorded: {key}")
-    _maybe_flush()
+
+
+@contextlib.contextmanager
+def suspended():
+    """Do not count the requests this thread makes in this block, e.g. the job worker rendering pages to warm caches."""
+    _suspended.active = True
+    try:
+        yield
+    finally:
+        _suspended.active = False
 
 
 def flush() -> None:
+    """Write the buffered hits: to the view counts, or with HITS_ROLLUP=1 to the pending_hits spool."""
     global _hits, _last_flush
     if not _hits or not _app:
         return
@@ -36,20 +64,16 @@ def flush() -> None:
     _last_flush = time.time()
     try:
         with _app.app_context():
-            for key, count in snapshot.items():
-                hit_type, identifier = key.split(":", 1)
-                if hit_type == "law":
-                    law = db.session.query(Law).filter(Law.name == identifier).first()
-                    if law:
-                        law.views += count
-                elif hit_type == "norm":
-                    law_name, number = identifier.split("/", 1)
-                    norm = db.session.query(Norm).join(Law).filter(
-                        Law.name == law_name,
-                        Norm.number == number,
-                    ).first()
-                    if norm:
-                        norm.views += count
+            if _ROLLUP:
+                # One INSERT instead of an UPDATE per page; the hits_rollup job adds them up
+                now = datetime.datetime.now()
+                rows = []
+                for key, count in snapshot.items():
+                    hit_type, identifier = key.split(":", 1)
+                    rows.append({"hit_type": hit_type, "identifier": identifier, "count": count, "created_at": now})
+                db.session.execute(insert(PendingHit), rows)
+            else:
+                apply(snapshot)
             db.session.commit()
         logger.debug(f"Flushed {len(snapshot)} hit counters")
     except Exception as e:
@@ -58,6 +82,59 @@ def flush() -> None:
             _hits[key] = _hits.get(key, 0) + count
 
 
-def _maybe_flush() -> None:
-    if (time.time() - _last_flush) >= _INTERVAL:
+def apply(counts: dict) -> None:
+    """Add ``{"law:<name>" | "norm:<law>/<number>": count}`` to the view counts. Does not commit."""
+    for key, count in counts.items():
+        hit_type, identifier = key.split(":", 1)
+        if hit_type == "law":
+            law = catalog.get(identifier)
+            if law:
+                db.session.query(Law).filter(Law.id == law.id).update(
+                    {Law.views: Law.views + count}, synchronize_session=False
+                )
+        elif hit_type == "norm":
+            law_name, number = identifier.split("/", 1)
+            law = catalog.get(law_name)
+            if law:
+                db.session.query(Norm).filter(
+                    Norm.law_id == law.id,
+                    Norm.number == number,
+                ).update({Norm.views: Norm.views + count}, synchronize_session=False)
+
+
+def rollup(limit: int = 10000) -> int:
+    """Move up to ``limit`` spooled hits into the view counts. Returns the number of spool rows done.
+
+    Requires an app context.
+    """
+    rows = db.session.query(PendingHit.id, PendingHit.hit_type, PendingHit.identifier, PendingHit.count).order_by(
+        PendingHit.id
+    ).limit(limit).all()
+    if not rows:
+        return 0
+    counts: dict = {}
+    for row in rows:
+        key = f"{row.hit_type}:{row.identifier}"
+        counts[key] = counts.get(key, 0) + row.count
+    apply(counts)
+    db.session.query(PendingHit).filter(PendingHit.id <= rows[-1].id).delete(synchronize_session=False)
+    db.session.commit()
+    return len(rows)
+
+
+def maybe_flush() -> None:
+    if (time.time() - _last_flush) < _INTERVAL:
+        return
+    if snapshot.active():
+        # Pages are served from the snapshot so the database can be down; no request waits for it here
+        if _flushing.acquire(blocking=False):
+            threading.Thread(target=_flush_in_background, name="hits-flush", daemon=True).start()
+    else:
+        flush()
+
+
+def _flush_in_background() -> None:
+    try:
         flush()
+    finally:
+        _flushing.release()
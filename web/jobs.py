@@ -0,0 +1,324 @@
+"""Background jobs: scrapes and maintenance, run by a worker process off the request path.
+
+Jobs are rows of the ``jobs`` table (models.Job). ``flask jobs-worker`` runs
+them with JOBS_CONCURRENCY threads, never two jobs of the same kind at once.
+Kinds:
+
+- scrape: law_scraper.scraper.main() on the app's database (args: ``laws``,
+  laws.yml ids to limit the run to). Queues warm_cache and sitemap for when
+  the web workers have noticed the new catalog version.
+- warm_cache: renders the index and the most viewed law and norm pages.
+- sitemap: renders /sitemap.xml.
+- hits_rollup: adds the hits the web workers spooled (HITS_ROLLUP=1) to the
+  view counts.
+
+warm_cache and sitemap need CACHE_LOCK_DIR shared with the web workers: the
+pages land there and the web workers take them instead of rendering them in
+a request. JOB_<KIND>_INTERVAL (seconds, e.g. JOB_SCRAPE_INTERVAL=86400)
+queues a kind again after every run; 0, the default, runs it only when
+queued with ``flask enqueue-job`` or by another job. hits_rollup defaults
+to every 60 seconds with HITS_ROLLUP=1.
+
+With JOBS_WORKER=1 a web process runs the worker in a thread instead, for
+single-process setups; gunicorn.conf.py turns that off. warm_cache and
+sitemap do nothing there, that process renders its pages on demand.
+"""
+import datetime
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import and_, event, or_
+
+from . import cache, catalog, hits, queries
+from .extensions import db
+from models import Job
+
+logger = logging.getLogger("jobs")
+
+_CONCURRENCY: int = int(os.environ.get("JOBS_CONCURRENCY", 2))
+_POLL_INTERVAL: int = int(os.environ.get("JOBS_POLL_INTERVAL", 10))
+_MAX_ATTEMPTS: int = int(os.environ.get("JOBS_MAX_ATTEMPTS", 3))
+_RETRY_BASE: int = int(os.environ.get("JOBS_RETRY_BASE", 60))
+_WARM_PAGES: int = int(os.environ.get("JOBS_WARM_PAGES", 50))
+
+_app = None
+_wake = threading.Event()
+_worker = None
+_in_web_process = False
+_running: set = set()  # kinds running in this process
+_running_lock = threading.Lock()
+
+
+class _Kind(NamedTuple):
+    run: Callable  # run(**args) -> short description of the outcome; in an app context
+    timeout: int  # seconds a claimed job may run before another worker takes it over
+    interval: int  # seconds from the end of one run to the next; 0 runs it only when queued
+
+
+def init_app(app) -> None:
+    """Remember the app and, with JOBS_WORKER=1, run the worker in a background thread."""
+    global _app
+    _app = app
+    if os.environ.get("JOBS_WORKER", "0") == "1":
+        start_worker()
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now()
+
+
+def enqueue(kind: str, run_at: Optional[datetime.datetime] = None, **args) -> Job:
+    """Queue a job of ``kind``, or return the same job if it is already pending.
+
+    An already pending job is moved up to ``run_at`` if that is earlier. The
+    job is added to the current session; it becomes durable, and the worker
+    is woken, when the caller commits.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    run_at = run_at or _now()
+    encoded = json.dumps(args, sort_keys=True) if args else None
+    pending = db.session.query(Job).filter(
+        Job.kind == kind,
+        Job.status == "pending",
+        Job.args.is_(None) if encoded is None else Job.args == encoded,
+    ).first()
+    if pending:
+        if run_at < pending.run_at:
+            pending.run_at = run_at
+        job = pending
+    else:
+        job = Job(kind=kind, args=encoded, status="pending", attempts=0, run_at=run_at, created_at=_now())
+        db.session.add(job)
+    event.listen(db.session(), "after_commit", lambda session: _wake.set(), once=True)
+    return job
+
+
+def schedule_recurring() -> None:
+    """Queue every kind with an interval that has no pending or running job. Requires an app context."""
+    queued = {kind for (kind,) in db.session.query(Job.kind).filter(Job.status.in_(("pending", "running"))).distinct()}
+    for kind, spec in KINDS.items():
+        if spec.interval and kind not in queued:
+            enqueue(kind)
+    db.session.commit()
+
+
+def _due_filter(now):
+    return or_(
+        and_(Job.status == "pending", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+
+
+def _claim(now):
+    """(id, kind) of a due job this thread now owns, or None.
+
+    Jobs are claimed with a conditional UPDATE like the mail spool, so
+    several workers can share the queue; a kind with a job still running in
+    any of them is skipped.
+    """
+    busy = {
+        kind for (kind,) in db.session.query(Job.kind).filter(
+            Job.status == "running", Job.locked_until >= now,
+        ).distinct()
+    }
+    due = db.session.query(Job.id, Job.kind).filter(
+        _due_filter(now), Job.kind.in_(KINDS),
+    ).order_by(Job.run_at).limit(20).all()
+    db.session.commit()
+
+    for job_id, kind in due:
+        with _running_lock:
+            if kind in busy or kind in _running:
+                continue
+            _running.add(kind)
+        claimed = db.session.query(Job).filter(Job.id == job_id, _due_filter(now)).update(
+            {
+                Job.status: "running",
+                Job.attempts: Job.attempts + 1,
+                Job.started_at: now,
+                Job.locked_until: now + datetime.timedelta(seconds=KINDS[kind].timeout),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if claimed:
+            return job_id, kind
+        with _running_lock:
+            _running.discard(kind)
+    return None
+
+
+def _retry_delay(attempts: int) -> float:
+    return _RETRY_BASE * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+
+
+def run_next() -> bool:
+    """Claim and run one due job. Returns whether there was one. Requires an app context."""
+    claimed = _claim(_now())
+    if claimed is None:
+        return False
+    job_id, kind = claimed
+    try:
+        job = db.session.get(Job, job_id)
+        args = json.loads(job.args) if job.args else {}
+        logger.info(f"Running job {job_id} ({kind})")
+        started = time.monotonic()
+        try:
+            result = KINDS[kind].run(**args)
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.last_error = str(e)[:500]
+            job.locked_until = None
+            if job.attempts >= _MAX_ATTEMPTS:
+                job.status = "failed"
+                job.finished_at = _now()
+                logger.error(f"Giving up on job {job_id} ({kind}) after {job.attempts} attempts: {e}", exc_info=True)
+            else:
+                job.status = "pending"
+                job.run_at = _now() + datetime.timedelta(seconds=_retry_delay(job.attempts))
+                logger.warning(f"Job {job_id} ({kind}) failed (attempt {job.attempts}): {e}")
+        else:
+            job = db.session.get(Job, job_id)
+            job.status = "done"
+            job.result = str(result)[:500] if result is not None else None
+            job.finished_at = _now()
+            job.locked_until = None
+            logger.info(f"Job {job_id} ({kind}) done in {time.monotonic() - started:.1f}s: {result}")
+        if job.status != "pending" and KINDS[kind].interval:
+            enqueue(kind, run_at=_now() + datetime.timedelta(seconds=KINDS[kind].interval))
+        db.session.commit()
+    finally:
+        with _running_lock:
+            _running.discard(kind)
+    return True
+
+
+def _loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        _wake.clear()
+        ran = False
+        try:
+            with _app.app_context():
+                ran = run_next()
+        except Exception as e:
+            logger.error(f"Job worker iteration failed: {e}", exc_info=True)
+        if not ran:
+            _wake.wait(_POLL_INTERVAL)
+
+
+def run_worker(stop: threading.Event | None = None) -> None:
+    """Run jobs with JOBS_CONCURRENCY threads until ``stop`` is set.
+
+    On Ctrl+C, waits for the running jobs; a second Ctrl+C abandons them and
+    another worker takes them over once their lock has expired.
+    """
+    stop = stop or threading.Event()
+    with _app.app_context():
+        schedule_recurring()
+    threads = [
+        threading.Thread(target=_loop, args=(stop,), name=f"job-worker-{i}", daemon=True)
+        for i in range(max(1, _CONCURRENCY))
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(1)
+    except KeyboardInterrupt:
+        stop.set()
+        _wake.set()
+        logger.warning("Stopping once the running jobs are done")
+        for thread in threads:
+            thread.join()
+        raise
+
+
+def start_worker() -> None:
+    global _worker, _in_web_process
+    if _worker is not None and _worker.is_alive():
+        return
+    _in_web_process = True
+    _worker = threading.Thread(target=run_worker, name="job-worker", daemon=True)
+    _worker.start()
+
+
+def _render(paths) -> str:
+    """Build ``paths`` into the page cache, for the web workers to take from CACHE_LOCK_DIR."""
+    if not cache.shared_dir():
+        return "skipped, CACHE_LOCK_DIR is not set"
+    if _in_web_process:
+        # The cache_clear() below would drop the pages this process serves
+        return "skipped, the worker runs inside a web process (JOBS_WORKER=1)"
+    catalog.check()
+    # Build every page again, so the shared files are newer than the web workers' last cache clear
+    cache.cache_clear()
+    client = _app.test_client()
+    failed = 0
+    with hits.suspended():
+        for path in paths:
+            if client.get(path).status_code != 200:
+                failed += 1
+    return f"{len(paths) - failed} pages rendered" + (f", {failed} failed" if failed else "")
+
+
+def _scrape(laws=None) -> str:
+    from law_scraper import scraper
+
+    config = scraper.load_config()
+    if laws:
+        config["laws"] = [law for law in config["laws"] if law["id"] in laws]
+    totals = scraper.main(config, db.engine.url.render_as_string(hide_password=False))
+    if totals["fatal"]:
+        # Retried like any failed job; the laws it did finish are not due again
+        raise RuntimeError(f"Scrape failed after {totals['laws']} laws: {totals['fatal']}")
+
+    # Web workers drop their pages within CATALOG_CHECK_INTERVAL of the scraper's last catalog bump
+    later = _now() + datetime.timedelta(seconds=catalog.check_interval() + 5)
+    enqueue("warm_cache", run_at=later)
+    enqueue("sitemap", run_at=later)
+    db.session.commit()
+    return (f"{totals['laws']} laws checked, {totals['found']} norms saved, "
+            f"{totals['failed']} failed, {totals['stale']} stale")
+
+
+def _warm_cache(pages: int = _WARM_PAGES) -> str:
+    from urllib.parse import quote
+
+    laws = db.session.execute(queries.most_viewed_laws(pages)).all()
+    norms = db.session.execute(queries.most_viewed_norms(pages)).all()
+    db.session.commit()
+    paths = ["/"]
+    paths += [f"/gesetz/{quote(name, safe='')}" for (name,) in laws]
+    paths += [f"/gesetz/{quote(name, safe='')}/{quote(str(number), safe='')}" for name, number in norms]
+    return _render(paths)
+
+
+def _sitemap() -> str:
+    return _render(["/sitemap.xml"])
+
+
+def _hits_rollup() -> str:
+    total = 0
+    while done := hits.rollup():
+        total += done
+    return f"{total} spooled hits rolled up"
+
+
+def _interval(kind: str, default: int = 0) -> int:
+    return int(os.environ.get(f"JOB_{kind.upper()}_INTERVAL", default))
+
+
+KINDS: dict = {
+    "scrape": _Kind(_scrape, timeout=6 * 3600, interval=_interval("scrape")),
+    "warm_cache": _Kind(_warm_cache, timeout=900, interval=_interval("warm_cache")),
+    "sitemap": _Kind(_sitemap, timeout=900, interval=_interval("sitemap")),
+    "hits_rollup": _Kind(_hits_rollup, timeout=300, interval=_interval("hits_rollup", 60 if hits._ROLLUP else 0)),
+}
@@ -1,30 +1,70 @@
-import smtplib
-import os
+import datetime
 import logging
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import and_, event, or_
+
+from .extensions import db
+from models import OutgoingMail
 
 logger = logging.getLogger("mail")
 
-_host = os.environ.get("SMTP_HOST")
-_port = int(os.environ.get("SMTP_PORT", 587))
-_user = os.environ.get("SMTP_USER")
-_password = os.environ.get("SMTP_PASSWORD")
-_from = os.environ.get("SMTP_FROM") or _user
+# SMTP settings are read by init_app(); smtplib and email are only imported once a mail is sent
+_host = None
+_port = 587
+_user = None
+_password = None
+_from = None
+_starttls = True
+_configured = False
 
-_configured = bool(_host and _user and _password)
-if not _configured:
-    logger.warning("SMTP not configured — mails will not be sent (set SMTP_HOST, SMTP_USER, SMTP_PASSWORD)")
+_MAX_ATTEMPTS: int = int(os.environ.get("MAIL_MAX_ATTEMPTS", 10))
+_RETRY_BASE: int = int(os.environ.get("MAIL_RETRY_BASE", 30))
+_RETRY_MAX: int = int(os.environ.get("MAIL_RETRY_MAX", 3600))
+_POLL_INTERVAL: int = int(os.environ.get("MAIL_POLL_INTERVAL", 30))
+_LOCK_SECONDS = 300  # a claimed mail is retried by another worker if its sender dies
+_IDLE_CHECK_SECONDS = 60  # connections idle longer than this are probed with NOOP before reuse
 
+_app = None
+_wake = threading.Event()
+_worker = None
+_smtp = None
+_smtp_used_at: float = 0.0
+_smtp_lock = threading.Lock()
 
-def send_mail(to: str, subject: str, body_text: str, body_html: str | None = None) -> None:
-    """Send an email via SMTP with STARTTLS.
 
-    Silently skips if SMTP is not configured. Raises on connection/auth errors.
-    """
+def init_app(app) -> None:
+    """Read the SMTP settings, remember the app and, unless MAIL_WORKER=0, start the background sender thread."""
+    global _app
+    _app = app
+    _load_config()
+    if os.environ.get("MAIL_WORKER", "1") != "0":
+        start_worker()
+
+
+def _load_config() -> None:
+    global _host, _port, _user, _password, _from, _starttls, _configured
+    _host = os.environ.get("SMTP_HOST")
+    _port = int(os.environ.get("SMTP_PORT", 587))
+    _user = os.environ.get("SMTP_USER")
+    _password = os.environ.get("SMTP_PASSWORD")
+    _from = os.environ.get("SMTP_FROM") or _user
+    _starttls = os.environ.get("SMTP_STARTTLS", "1") != "0"
+    _configured = bool(_host and _user and _password)
     if not _configured:
-        logger.warning(f"Mail not sent (SMTP unconfigured): to={to} subject={subject!r}")
-        return
+        logger.warning("SMTP not configured — mails will not be sent (set SMTP_HOST, SMTP_USER, SMTP_PASSWORD)")
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+def _build_message(to: str, subject: str, body_text: str, body_html: str | None):
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
 
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
@@ -34,16 +74,179 @@ def send_mail(to: str, subject: str, body_text: str, body_html: str | None = Non
     msg.attach(MIMEText(body_text, "plain", "utf-8"))
     if body_html:
         msg.attach(MIMEText(body_html, "html", "utf-8"))
+    return msg
+
+
+def _open_connection():
+    import smtplib
 
     if _port == 465:
-        with smtplib.SMTP_SSL(_host, _port) as smtp:
-            smtp.login(_user, _password)
-            smtp.sendmail(_from, to, msg.as_string())
+        smtp = smtplib.SMTP_SSL(_host, _port)
     else:
-        with smtplib.SMTP(_host, _port) as smtp:
-            smtp.ehlo()
+        smtp = smtplib.SMTP(_host, _port)
+        smtp.ehlo()
+        if _starttls:
             smtp.starttls()
-            smtp.login(_user, _password)
-            smtp.sendmail(_from, to, msg.as_string())
+            smtp.ehlo()
+    smtp.login(_user, _password)
+    logger.debug(f"Opened SMTP connection to {_host}:{_port}")
+    return smtp
+
+
+def _close_connection() -> None:
+    global _smtp
+    import smtplib
+
+    if _smtp is None:
+        return
+    try:
+        _smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        pass
+    _smtp = None
+
+
+def _connection():
+    """Return the persistent SMTP connection, reconnecting if it went stale."""
+    global _smtp
+    import smtplib
+
+    if _smtp is not None and (time.time() - _smtp_used_at) > _IDLE_CHECK_SECONDS:
+        try:
+            if _smtp.noop()[0] != 250:
+                _close_connection()
+        except (smtplib.SMTPException, OSError):
+            _smtp = None
+    if _smtp is None:
+        _smtp = _open_connection()
+    return _smtp
+
+
+def send_mail(to: str, subject: str, body_text: str, body_html: str | None = None) -> None:
+    """Send an email right away over the persistent SMTP connection.
+
+    Silently skips if SMTP is not configured. Raises on connection/auth errors.
+    Request handlers should use queue_mail() instead.
+    """
+    global _smtp_used_at
+    if not _configured:
+        logger.warning(f"Mail not sent (SMTP unconfigured): to={to} subject={subject!r}")
+        return
+    import smtplib
+
+    message = _build_message(to, subject, body_text, body_html).as_string()
+    with _smtp_lock:
+        try:
+            _connection().sendmail(_from, to, message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The server dropped an idle connection between our NOOP probes; retry once on a fresh one
+            _close_connection()
+            _connection().sendmail(_from, to, message)
+        _smtp_used_at = time.time()
 
     logger.info(f"Mail sent to {to!r}: {subject!r}")
+
+
+def queue_mail(to: str, subject: str, body_text: str, body_html: str | None = None) -> OutgoingMail:
+    """Spool an email for the background sender.
+
+    The mail is added to the current session; it becomes durable, and the
+    sender is woken, when the caller commits.
+    """
+    now = _now()
+    mail = OutgoingMail(
+        recipient=to,
+        subject=subject,
+        body_text=body_text,
+        body_html=body_html,
+        status="pending",
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    db.session.add(mail)
+    event.listen(db.session(), "after_commit", lambda session: _wake.set(), once=True)
+    return mail
+
+
+def _due_filter(now):
+    return or_(
+        and_(OutgoingMail.status == "pending", OutgoingMail.next_attempt_at <= now),
+        and_(OutgoingMail.status == "sending", OutgoingMail.locked_until < now),
+    )
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(_RETRY_BASE * 2 ** (attempts - 1), _RETRY_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def process_outbox(limit: int = 20) -> int:
+    """Send due mails from the spool. Returns the number of mails attempted.
+
+    Requires an app context. Each mail is claimed with a conditional UPDATE,
+    so several workers can drain the same spool without sending twice.
+    """
+    if not _configured:
+        return 0
+
+    now = _now()
+    due = db.session.query(OutgoingMail.id).filter(_due_filter(now)).order_by(
+        OutgoingMail.next_attempt_at
+    ).limit(limit).all()
+
+    attempted = 0
+    for (mail_id,) in due:
+        claimed = db.session.query(OutgoingMail).filter(
+            OutgoingMail.id == mail_id, _due_filter(now),
+        ).update(
+            {OutgoingMail.status: "sending", OutgoingMail.locked_until: now + datetime.timedelta(seconds=_LOCK_SECONDS)},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if not claimed:
+            continue
+
+        attempted += 1
+        mail = db.session.get(OutgoingMail, mail_id)
+        try:
+            send_mail(mail.recipient, mail.subject, mail.body_text, mail.body_html)
+        except Exception as e:
+            mail.attempts += 1
+            mail.last_error = str(e)[:500]
+            mail.locked_until = None
+            if mail.attempts >= _MAX_ATTEMPTS:
+                mail.status = "failed"
+                logger.error(f"Giving up on mail {mail_id} to {mail.recipient!r} after {mail.attempts} attempts: {e}")
+            else:
+                mail.status = "pending"
+                mail.next_attempt_at = _now() + datetime.timedelta(seconds=_retry_delay(mail.attempts))
+                logger.warning(f"Mail {mail_id} to {mail.recipient!r} failed (attempt {mail.attempts}): {e}")
+        else:
+            mail.status = "sent"
+            mail.sent_at = _now()
+            mail.locked_until = None
+        db.session.commit()
+    return attempted
+
+
+def run_worker(stop: threading.Event | None = None) -> None:
+    """Drain the spool until ``stop`` is set, sleeping between empty polls."""
+    while not (stop and stop.is_set()):
+        _wake.clear()
+        processed = 0
+        try:
+            with _app.app_context():
+                processed = process_outbox()
+        except Exception as e:
+            logger.error(f"Mail worker iteration failed: {e}", exc_info=True)
+        if not processed:
+            _wake.wait(_POLL_INTERVAL)
+
+
+def start_worker() -> None:
+    global _worker
+    if not _configured or (_worker is not None and _worker.is_alive()):
+        return
+    _worker = threading.Thread(target=run_worker, name="mail-worker", daemon=True)
+    _worker.start()
@@ -0,0 +1,102 @@
+"""Compact in-process index of every norm's number and title, for the prev/next links of norm pages.
+
+The catalog (web/catalog.py) builds one with the laws and rebuilds it when the
+catalog version changes. Numbers and titles live in a single UTF-8 blob with
+``array`` offsets instead of one Python object per norm, so the index takes
+a few bytes per norm beyond its text, is invisible to the garbage collector
+and is never written to after it is built: under gunicorn with preload_app
+the workers share the master's copy instead of each holding its own.
+Strings are only decoded for the norms a page shows.
+"""
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple, Optional
+
+_STALE = 1
+_NO_TITLE = 2
+
+
+class NormRef(NamedTuple):
+    number: str
+    title: Optional[str]
+
+
+class NormIndex:
+    """Norms of every law in TOC order. Read-only once built, so safe to share between threads."""
+
+    __slots__ = ("_blob", "_offsets", "_flags", "_laws", "_by_number", "norm_count")
+
+    def __init__(self, rows):
+        """``rows``: (law_id, number, title, is_stale) ordered by law and then TOC order."""
+        blob = bytearray()
+        offsets = array("I")  # norm i: number at [2i, 2i+1), title at [2i+1, 2i+2)
+        flags = bytearray()
+        laws = {}  # law id -> (first, end) position
+        law_id, first = None, 0
+        for i, (row_law_id, number, title, is_stale) in enumerate(rows):
+            if row_law_id != law_id:
+                if law_id is not None:
+                    laws[law_id] = (first, i)
+                law_id, first = row_law_id, i
+            offsets.append(len(blob))
+            blob += number.encode("utf-8")
+            offsets.append(len(blob))
+            if title is not None:
+                blob += title.encode("utf-8")
+            flags.append((_STALE if is_stale else 0) | (_NO_TITLE if title is None else 0))
+        offsets.append(len(blob))
+        if law_id is not None:
+            laws[law_id] = (first, len(flags))
+
+        self._blob = bytes(blob)
+        self._offsets = offsets
+        self._flags = bytes(flags)
+        self._laws = laws
+        self.norm_count = len(flags)
+        # Per law, its norm positions ordered by number, for binary search
+        by_number = array("I")
+        for first, end in laws.values():
+            by_number.extend(sorted(range(first, end), key=self._number_bytes))
+        self._by_number = by_number
+
+    def _number_bytes(self, i) -> bytes:
+        return self._blob[self._offsets[2 * i]:self._offsets[2 * i + 1]]
+
+    def _ref(self, i) -> NormRef:
+        number = self._number_bytes(i).decode("utf-8")
+        if self._flags[i] & _NO_TITLE:
+            return NormRef(number, None)
+        return NormRef(number, self._blob[self._offsets[2 * i + 1]:self._offsets[2 * i + 2]].decode("utf-8"))
+
+    def _find(self, law_id, number) -> Optional[int]:
+        first, end = self._laws.get(law_id, (0, 0))
+        key = number.encode("utf-8")
+        pos = bisect_left(self._by_number, key, first, end, key=self._number_bytes)
+        if pos < end and self._number_bytes(self._by_number[pos]) == key:
+            return self._by_number[pos]
+        return None
+
+    def neighbours(self, law_id, number, count):
+        """Up to ``count`` current norms before and after a norm in TOC order, or None if it is not indexed."""
+        i = self._find(law_id, number)
+        if i is None:
+            return None
+        first, end = self._laws[law_id]
+        before, after = [], []
+        j = i - 1
+        while j >= first and len(before) < count:
+            if not self._flags[j] & _STALE:
+                before.append(self._ref(j))
+            j -= 1
+        j = i + 1
+        while j < end and len(after) < count:
+            if not self._flags[j] & _STALE:
+                after.append(self._ref(j))
+            j += 1
+        before.reverse()
+        return before, after
+
+    def nbytes(self) -> int:
+        """Size of the index's buffers."""
+        return (len(self._blob) + len(self._flags) + self._offsets.itemsize * len(self._offsets)
+                + self._by_number.itemsize * len(self._by_number))
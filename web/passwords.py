@@ -0,0 +1,54 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger("passwords")
+
+# Hashes created with other parameters are re-hashed with these on the next successful login
+_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+_WORKERS: int = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+_QUEUE: int = int(os.environ.get("PASSWORD_HASH_QUEUE", 8))
+_TIMEOUT: float = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 10))
+
+_executor = ThreadPoolExecutor(max_workers=_WORKERS, thread_name_prefix="password-hash")
+_slots = threading.BoundedSemaphore(_WORKERS + _QUEUE)
+
+
+class HashCapacityExceeded(Exception):
+    """Raised when too many password hashes are already running or queued, or one took too long."""
+    pass
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        logger.warning("Password hashing at capacity, rejecting request")
+        raise HashCapacityExceeded()
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # The slot stays taken until the hash is done, also when the caller stops waiting for it
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=_TIMEOUT)
+    except FutureTimeout:
+        logger.warning(f"Password hash took longer than {_TIMEOUT}s, rejecting request")
+        raise HashCapacityExceeded() from None
+
+
+def verify(password_hash: str, password: str) -> bool:
+    """Check a password on the bounded hashing pool. Raises HashCapacityExceeded."""
+    return _run(check_password_hash, password_hash, password)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with the configured method on the bounded hashing pool."""
+    return _run(generate_password_hash, password, _METHOD)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    return password_hash.split("$", 1)[0] != _METHOD
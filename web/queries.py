@@ -0,0 +1,141 @@
+"""SELECT statements behind the law pages, the search and the cache warm-up job.
+
+Shared by the Flask blueprints (executed on ``db.session``) and the ASGI
+read path in web/asgi.py (executed on an async connection), so both render
+exactly the same rows.
+"""
+from sqlalchemy import and_, case, or_, select
+
+from models import Law, LawFragment, Norm, NormReference, NormVersion
+
+CITED_BY_LIMIT = 50
+
+
+def _not_stale():
+    return Norm.is_stale == 0
+
+
+def toc_norms(law_id):
+    """Also the input of the law's fragments, see models.fragment."""
+    return select(Norm.number, Norm.number_raw, Norm.title, Norm.content_hash).where(
+        Norm.law_id == law_id,
+        _not_stale(),
+    ).order_by(Norm.sort_key, Norm.number)
+
+
+def full_view_norms(law_id):
+    return select(Norm.number, Norm.number_raw, Norm.title, Norm.content).where(
+        Norm.law_id == law_id,
+        _not_stale(),
+    ).order_by(Norm.sort_key, Norm.number)
+
+
+def fragment(law_id, kind, source_hash):
+    return select(LawFragment.html).where(
+        LawFragment.law_id == law_id,
+        LawFragment.kind == kind,
+        LawFragment.source_hash == source_hash,
+    )
+
+
+def norm(law_id, number):
+    return select(
+        Norm.id, Norm.number, Norm.number_raw, Norm.title, Norm.content, Norm.url, Norm.sort_key,
+    ).where(
+        Norm.law_id == law_id,
+        Norm.number == number,
+    )
+
+
+def prev_norms(law_id, norm, limit):
+    """The ``limit`` current norms before ``norm``, nearest first."""
+    return select(Norm.number, Norm.title).where(
+        Norm.law_id == law_id,
+        _not_stale(),
+        or_(
+            Norm.sort_key < norm.sort_key,
+            and_(Norm.sort_key == norm.sort_key, Norm.number < norm.number),
+        ),
+    ).order_by(Norm.sort_key.desc(), Norm.number.desc()).limit(limit)
+
+
+def next_norms(law_id, norm, limit):
+    return select(Norm.number, Norm.title).where(
+        Norm.law_id == law_id,
+        _not_stale(),
+        or_(
+            Norm.sort_key > norm.sort_key,
+            and_(Norm.sort_key == norm.sort_key, Norm.number > norm.number),
+        ),
+    ).order_by(Norm.sort_key, Norm.number).limit(limit)
+
+
+def references(norm_id):
+    """``linked`` is whether the cited norm exists and is current; the others are shown without a link."""
+    return select(
+        NormReference.target_law, NormReference.target_number, Norm.id.isnot(None).label("linked"),
+    ).select_from(NormReference).outerjoin(
+        Law, Law.name == NormReference.target_law,
+    ).outerjoin(
+        Norm, and_(Norm.law_id == Law.id, Norm.number == NormReference.target_number, _not_stale()),
+    ).where(
+        NormReference.source_norm_id == norm_id,
+    ).order_by(NormReference.id)
+
+
+def cited_by(law_name, number, limit=CITED_BY_LIMIT):
+    return select(Law.name.label("law_name"), Norm.number, Norm.title).select_from(
+        NormReference,
+    ).join(Norm, Norm.id == NormReference.source_norm_id).join(Law, Law.id == Norm.law_id).where(
+        NormReference.target_law == law_name,
+        NormReference.target_number == number,
+        _not_stale(),
+    ).distinct().order_by(Law.name, Norm.sort_key, Norm.number).limit(limit)
+
+
+def version_ids(norm_id, limit=2):
+    """Enough version ids to tell whether a norm has a history (more than one)."""
+    return select(NormVersion.id).where(NormVersion.norm_id == norm_id).limit(limit)
+
+
+def direct_match(law_id, number):
+    return select(Norm.number, Norm.title).where(
+        Norm.law_id == law_id,
+        Norm.number == number,
+        _not_stale(),
+    )
+
+
+def search_laws(q, limit=5):
+    rank_expr = case((Law.name == q, 0), (Law.name.like(f"{q}%"), 1), else_=2)
+    return select(
+        Law.name, Law.description, rank_expr.label("rank"),
+    ).where(
+        or_(Law.name.like(f"%{q}%"), Law.description.like(f"%{q}%"))
+    ).order_by("rank", Law.views.desc(), Law.name).limit(limit)
+
+
+def search_norms(q, limit=10):
+    rank_expr = case((Norm.number == q, 0), (Norm.number.like(f"{q}%"), 1), else_=2)
+    return select(
+        Law.name.label("law_name"), Law.description.label("law_description"),
+        Norm.number, Norm.title, rank_expr.label("rank"),
+    ).join(Norm).where(
+        or_(
+            Norm.number.like(f"{q}%"),
+            Norm.number_raw.like(f"%{q}%"),
+            Norm.title.like(f"%{q}%"),
+        ),
+        _not_stale(),
+    ).order_by("rank", Norm.views.desc(), Law.name, Norm.sort_key, Norm.number).limit(limit)
+
+
+def most_viewed_laws(limit):
+    return select(Law.name).order_by(Law.views.desc()).limit(limit)
+
+
+def most_viewed_norms(limit):
+    """Walks ix_norms_stale_views and stops after ``limit`` rows."""
+    return select(Law.name, Norm.number).join(Norm).where(
+        _not_stale(),
+    ).order_by(Norm.views.desc()).limit(limit)
@@ -0,0 +1,205 @@
+"""Per-statement timing of the database queries: counts and latency per route, slow-query log, budgets.
+
+bind(engine) hooks an engine's cursor events; the Flask app binds its engine
+and the ASGI app its async one. Every statement is tagged with the route it
+ran for (the Flask endpoint, or the name tagged() set) and its normalized
+text, with literals and IN lists replaced.
+
+- QUERY_STATS=1 counts statements and their time per (route, statement) and
+  logs the QUERY_STATS_TOP ones with the most total time every
+  QUERY_STATS_INTERVAL seconds, then starts over. stats() returns them.
+- SLOW_QUERY_MS logs every statement that took at least that long, with
+  its parameters, and with SLOW_QUERY_EXPLAIN=1 (development) its query
+  plan. EXPLAIN runs on the same connection, one more round trip.
+- query_budget(n) fails with QueryBudgetExceeded when its block runs more
+  than n statements; bench/queries.py uses it so N+1 regressions fail CI.
+"""
+import contextlib
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger("query_stats")
+
+_STATS = os.environ.get("QUERY_STATS", "0") == "1"
+_INTERVAL: int = int(os.environ.get("QUERY_STATS_INTERVAL", 300))
+_TOP: int = int(os.environ.get("QUERY_STATS_TOP", 10))
+# 0 turns the slow-query log off
+_SLOW_MS: float = float(os.environ.get("SLOW_QUERY_MS", 0))
+_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "0") == "1"
+
+_SPACE = re.compile(r"\s+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*"
+_PLACEHOLDER_LIST = re.compile(rf"\((?:{_PLACEHOLDER},)+{_PLACEHOLDER}\)")
+
+_route: ContextVar = ContextVar("query_route", default=None)
+_budget: ContextVar = ContextVar("query_budget", default=None)
+_stats: dict = {}  # (route, statement) -> [count, total seconds, max seconds]
+_lock = threading.Lock()
+_reported_at: float = time.time()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def bind(engine) -> None:
+    """Time every statement ``engine`` runs."""
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+    event.listen(engine, "handle_error", _failed)
+
+
+@contextlib.contextmanager
+def tagged(route: str):
+    """Attribute the statements run in this block to ``route``, outside of a Flask request."""
+    token = _route.set(route)
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+@contextlib.contextmanager
+def query_budget(limit: int, label: str = "Block"):
+    """Raise QueryBudgetExceeded if the block runs more than ``limit`` statements.
+
+    Yields the list the statements are collected in. Budgets can be nested;
+    an outer budget counts the statements of the inner ones too.
+    """
+    outer = _budget.get()
+    statements = []
+    token = _budget.set(statements)
+    try:
+        yield statements
+    finally:
+        _budget.reset(token)
+        if outer is not None:
+            outer.extend(statements)
+    if len(statements) > limit:
+        listing = "\n".join(f"  {normalize(statement)}" for statement in statements)
+        raise QueryBudgetExceeded(f"{label} ran {len(statements)} statements, budget {limit}:\n{listing}")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize(statement: str) -> str:
+    """``statement`` on one line, with literals replaced by ? and placeholder lists by (?, ...)."""
+    statement = _LITERAL.sub("?", _SPACE.sub(" ", statement).strip())
+    return _PLACEHOLDER_LIST.sub("(?, ...)", statement)
+
+
+def stats() -> list:
+    """Counted statements since the last report, most total time first."""
+    with _lock:
+        return _rows(dict(_stats))
+
+
+def _rows(counted) -> list:
+    rows = [
+        {"route": route, "statement": statement, "count": count,
+         "total_ms": total * 1000, "mean_ms": total / count * 1000, "max_ms": longest * 1000}
+        for (route, statement), (count, total, longest) in counted.items()
+    ]
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def reset() -> None:
+    global _reported_at
+    with _lock:
+        _stats.clear()
+        _reported_at = time.time()
+
+
+def _current_route() -> str:
+    route = _route.get()
+    if route is None and has_request_context():
+        route = request.endpoint or request.path
+    return route or "-"
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _failed(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    if conn.info.get("explaining"):
+        return
+    budget = _budget.get()
+    if budget is not None:
+        budget.append(statement)
+    if not _STATS and not _SLOW_MS:
+        return
+    route = _current_route()
+    if _STATS:
+        _count(route, normalize(statement), elapsed)
+    if _SLOW_MS and elapsed * 1000 >= _SLOW_MS:
+        _log_slow(conn, route, statement, parameters, elapsed, executemany)
+
+
+def _count(route, statement, elapsed) -> None:
+    key = (route, statement)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            _stats[key] = [1, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+    if time.time() - _reported_at >= _INTERVAL:
+        _report()
+
+
+def _report() -> None:
+    global _stats, _reported_at
+    with _lock:
+        now = time.time()
+        if now - _reported_at < _INTERVAL:
+            return
+        window = now - _reported_at
+        _reported_at = now
+        counted, _stats = _stats, {}
+    rows = _rows(counted)
+    if not rows:
+        return
+    logger.info(f"{sum(row['count'] for row in rows)} statements in the last {window:.0f} s, most total time:")
+    for row in rows[:_TOP]:
+        logger.info(
+            f"{row['route']}: {row['count']}x, {row['total_ms']:.0f} ms total, {row['mean_ms']:.1f} ms mean, "
+            f"{row['max_ms']:.1f} ms max: {row['statement']}"
+        )
+
+
+def _log_slow(conn, route, statement, parameters, elapsed, executemany) -> None:
+    message = f"Slow query ({elapsed * 1000:.0f} ms, {route}): {_SPACE.sub(' ', statement).strip()} {repr(parameters)[:200]}"
+    if _EXPLAIN and not executemany and statement.lstrip()[:6].upper() == "SELECT":
+        message += "\n" + _explain(conn, statement, parameters)
+    logger.warning(message)
+
+
+def _explain(conn, statement, parameters) -> str:
+    prefix = "EXPLAIN QUERY PLAN" if conn.dialect.name == "sqlite" else "EXPLAIN"
+    conn.info["explaining"] = True
+    try:
+        rows = conn.exec_driver_sql(f"{prefix} {statement}", parameters).all()
+    except Exception as e:
+        return f"  (no plan: {e})"
+    finally:
+        conn.info["explaining"] = False
+    return "\n".join("  " + " | ".join(str(value) for value in row) for row in rows)
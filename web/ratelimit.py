@@ -0,0 +1,73 @@
+import datetime
+import hashlib
+import logging
+import random
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from models import RateLimitCounter
+
+logger = logging.getLogger("ratelimit")
+
+_PURGE_PROBABILITY = 0.01
+
+
+def _window_key(key: str, window: int) -> str:
+    # Hashed so that no raw IPs or e-mail addresses end up in the table
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:40]
+    return f"{digest}:{int(time.time() // window)}"
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+def count(key: str, window: int) -> int:
+    """Hits recorded for ``key`` in the current window of ``window`` seconds."""
+    value = db.session.query(RateLimitCounter.count).filter(
+        RateLimitCounter.key == _window_key(key, window)
+    ).scalar()
+    return value or 0
+
+
+def increment(key: str, window: int) -> None:
+    """Record one hit for ``key`` in the current window. Commits immediately."""
+    window_key = _window_key(key, window)
+    updated = db.session.query(RateLimitCounter).filter(RateLimitCounter.key == window_key).update(
+        {RateLimitCounter.count: RateLimitCounter.count + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(RateLimitCounter(
+            key=window_key, count=1, expires_at=_now() + datetime.timedelta(seconds=window),
+        ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created the window row first; count on top of it
+        db.session.rollback()
+        increment(key, window)
+        return
+
+    if random.random() < _PURGE_PROBABILITY:
+        _purge()
+
+
+def reset(key: str, window: int) -> None:
+    db.session.query(RateLimitCounter).filter(
+        RateLimitCounter.key == _window_key(key, window)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _purge() -> None:
+    try:
+        deleted = db.session.query(RateLimitCounter).filter(
+            RateLimitCounter.expires_at < _now()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        logger.debug(f"Purged {deleted} expired rate limit counter(s)")
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Failed to purge rate limit counters: {e}")
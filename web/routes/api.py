@@ -0,0 +1,196 @@
+import gzip
+import json
+import os
+import zlib
+
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+
+from .. import catalog, snapshot
+from ..cache import cache_fetch
+from ..extensions import db
+from models import Norm
+
+api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+_PER_PAGE = 100
+_MAX_PER_PAGE = 1000
+_GZIP_MIN_BYTES = 1024
+_MAX_AGE: int = int(os.environ.get("API_MAX_AGE", 300))
+
+
+def _dumps(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _accepts_gzip() -> bool:
+    return "gzip" in request.headers.get("Accept-Encoding", "")
+
+
+def _json(cache_key, build):
+    """Serve a cached JSON document, building it with ``build() -> (payload, etag)`` on a miss.
+
+    Documents are cached with their gzipped form and answered with 304 when
+    the client's ETag still matches.
+    """
+    def build_entry():
+        payload, etag = build()
+        body = _dumps(payload)
+        return {
+            "etag": etag,
+            "body": body,
+            "gzip": gzip.compress(body, 6) if len(body) >= _GZIP_MIN_BYTES else None,
+        }
+
+    entry = cache_fetch(cache_key, build_entry)
+
+    response = Response(mimetype="application/json")
+    response.set_etag(entry["etag"], weak=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = _MAX_AGE
+    response.vary.add("Accept-Encoding")
+    if entry["gzip"] is not None and _accepts_gzip():
+        response.set_data(entry["gzip"])
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response.set_data(entry["body"])
+    return response.make_conditional(request)
+
+
+def _law_or_404(law_name):
+    law = catalog.get(law_name)
+    if not law:
+        abort(404)
+    return law
+
+
+def _law_json(law):
+    return {
+        "name": law.name,
+        "description": law.description,
+        "last_modified": law.last_modified.isoformat() if law.last_modified else None,
+        "norm_count": law.norm_count,
+        "url": f"{current_app.config['BASE_URL']}/gesetz/{law.name}",
+    }
+
+
+def _norm_json(law, norm):
+    return {
+        "law": law.name,
+        "number": norm.number,
+        "title": norm.title,
+        "content": norm.content,
+        "content_hash": norm.content_hash,
+        "source_url": norm.url,
+    }
+
+
+def _page_args():
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", _PER_PAGE, type=int)
+    if page < 1 or per_page < 1:
+        abort(400)
+    return page, min(per_page, _MAX_PER_PAGE)
+
+
+@api_bp.route("/laws")
+def laws():
+    version = catalog.version()
+    return _json(
+        f"api_laws_{version}",
+        lambda: ({"laws": [_law_json(law) for law in catalog.all_laws()]}, version),
+    )
+
+
+@api_bp.route("/laws/<law_name>")
+def law_toc(law_name):
+    law = _law_or_404(law_name)
+    page, per_page = _page_args()
+    if page > 1 and (page - 1) * per_page >= law.norm_count:
+        abort(404)
+    version = catalog.version()
+
+    def build():
+        if snapshot.active():
+            norms = snapshot.get().norms(law.name)[(page - 1) * per_page:page * per_page]
+        else:
+            norms = db.session.query(Norm.number, Norm.title).filter(
+                Norm.law_id == law.id,
+                Norm.is_stale == 0,
+            ).order_by(Norm.sort_key, Norm.number).offset((page - 1) * per_page).limit(per_page).all()
+        has_next = page * per_page < law.norm_count
+        return {
+            "law": _law_json(law),
+            "norms": [{"number": n.number, "title": n.title} for n in norms],
+            "page": page,
+            "per_page": per_page,
+            "total": law.norm_count,
+            "next": f"/api/v1/laws/{law.name}?page={page + 1}&per_page={per_page}" if has_next else None,
+        }, f"{version}-{page}-{per_page}"
+
+    return _json(f"api_toc_{law_name}_{page}_{per_page}_{version}", build)
+
+
+@api_bp.route("/laws/<law_name>/norms/<norm_number>")
+def norm(law_name, norm_number):
+    law = _law_or_404(law_name)
+
+    def build():
+        if snapshot.active():
+            row = snapshot.get().norm(law.name, norm_number)
+        else:
+            row = db.session.query(
+                Norm.number, Norm.title, Norm.content, Norm.content_hash, Norm.url,
+            ).filter(
+                Norm.law_id == law.id,
+                Norm.number == norm_number,
+            ).first()
+        if not row:
+            abort(404)
+        return _norm_json(law, row), row.content_hash
+
+    return _json(f"api_norm_{law_name}_{norm_number}", build)
+
+
+def _current_norms(law):
+    """Current norms of ``law`` with their content, in TOC order."""
+    if snapshot.active():
+        return snapshot.get().norms(law.name, content=True)
+    return db.session.query(
+        Norm.number, Norm.title, Norm.content, Norm.content_hash, Norm.url,
+    ).filter(
+        Norm.law_id == law.id,
+        Norm.is_stale == 0,
+    ).order_by(Norm.sort_key, Norm.number).all()
+
+
+def _export(laws):
+    """Stream one JSON line per current norm of ``laws``, gzipped when the client accepts it."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if _accepts_gzip() else None
+
+    def generate():
+        for law in laws:
+            norms = _current_norms(law)
+            chunk = b"".join(_dumps(_norm_json(law, n)) + b"\n" for n in norms)
+            if compressor is None:
+                yield chunk
+            elif chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressor is not None:
+            yield compressor.flush()
+
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    response.set_etag(catalog.version(), weak=True)
+    response.vary.add("Accept-Encoding")
+    if compressor is not None:
+        response.headers["Content-Encoding"] = "gzip"
+    return response.make_conditional(request)
+
+
+@api_bp.route("/export.ndjson")
+def export_all():
+    return _export(catalog.all_laws())
+
+
+@api_bp.route("/laws/<law_name>/export.ndjson")
+def export_law(law_name):
+    return _export([_law_or_404(law_name)])
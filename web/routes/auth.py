@@ -1,24 +1,65 @@
+import datetime
 import logging
+import os
 import re
 
 _EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}$')
 
-from flask import Blueprint, flash, redirect, render_template, request
+from flask import Blueprint, flash, redirect, render_template, request, session
 from flask_login import current_user, login_required, login_user, logout_user
 from itsdangerous import BadSignature, SignatureExpired
-from werkzeug.security import check_password_hash, generate_password_hash
 
+from .. import passwords, ratelimit, user_cache
 from ..extensions import db, login_manager
 from models import User
 
 logger = logging.getLogger("web.auth")
 
+# Every attempt counts against the client address, only failures against the account.
+# Behind a reverse proxy set TRUSTED_PROXIES (web/app.py), or all clients share the proxy's address.
+_LOGIN_IP_LIMIT: int = int(os.environ.get("LOGIN_IP_LIMIT", 30))
+_LOGIN_IP_WINDOW: int = int(os.environ.get("LOGIN_IP_WINDOW", 300))
+_LOGIN_EMAIL_LIMIT: int = int(os.environ.get("LOGIN_EMAIL_LIMIT", 10))
+_LOGIN_EMAIL_WINDOW: int = int(os.environ.get("LOGIN_EMAIL_WINDOW", 900))
+
+_THROTTLED = "Zu viele Anmeldeversuche. Bitte versuchen Sie es später erneut."
+_UNVERIFIED = ("Bitte bestätigen Sie zuerst Ihre E-Mail-Adresse. "
+               "Wir haben Ihnen einen neuen Bestätigungslink gesendet.")
+_BUSY = "Der Dienst ist gerade ausgelastet. Bitte versuchen Sie es in einem Moment erneut."
+
 auth_bp = Blueprint("auth", __name__)
 
 
 @login_manager.user_loader
 def load_user(user_id: str):
-    return db.session.get(User, int(user_id))
+    return user_cache.load(int(user_id))
+
+
+def _queue_verification(user) -> None:
+    """Spool the mail with a fresh verification link for ``user``. Does not commit."""
+    from ..mail import queue_mail
+    from flask import current_app
+
+    serializer = current_app.config["TOKEN_SERIALIZER"]
+    base_url = current_app.config["BASE_URL"]
+    token = serializer.dumps(user.email, salt="email-verify")
+    verify_url = f"{base_url}/verify/{token}"
+    queue_mail(
+        to=user.email,
+        subject="E-Mail-Adresse bestätigen — BayRecht",
+        body_text=(
+            f"Hallo {user.first_name},\n\n"
+            f"bitte bestätigen Sie Ihre E-Mail-Adresse über folgenden Link:\n{verify_url}\n\n"
+            "Der Link ist 24 Stunden gültig.\n\nIhr BayRecht-Team"
+        ),
+        body_html=(
+            f"<p>Hallo {user.first_name},</p>"
+            f"<p>bitte bestätigen Sie Ihre E-Mail-Adresse:</p>"
+            f'<p><a href="{verify_url}">{verify_url}</a></p>'
+            "<p>Der Link ist 24 Stunden gültig.</p>"
+            "<p>Ihr BayRecht-Team</p>"
+        ),
+    )
 
 
 @auth_bp.route("/login", methods=["GET", "POST"])
@@ -29,13 +70,42 @@ def login():
     if request.method == "POST":
         email = request.form.get("email", "").strip().lower()
         password = request.form.get("password", "")
+        ip_key = f"login-ip:{request.remote_addr}"
+        email_key = f"login-email:{email}"
+        if (ratelimit.count(ip_key, _LOGIN_IP_WINDOW) >= _LOGIN_IP_LIMIT
+                or ratelimit.count(email_key, _LOGIN_EMAIL_WINDOW) >= _LOGIN_EMAIL_LIMIT):
+            logger.warning(f"Login throttled for {request.remote_addr}")
+            return render_template("login.html", error=_THROTTLED), 429
+        ratelimit.increment(ip_key, _LOGIN_IP_WINDOW)
+
         user = db.session.query(User).filter(User.email == email).first()
-        if user and user.is_active and check_password_hash(user.password_hash, password):
+        try:
+            valid = bool(user and passwords.verify(user.password_hash, password))
+        except passwords.HashCapacityExceeded:
+            return render_template("login.html", error=_BUSY), 503
+        if valid and not user.is_active:
+            valid = False
+            if user.email_verified_at is None:
+                # The first mail may have failed for good or its link expired; counted so it cannot be used to flood
+                ratelimit.increment(email_key, _LOGIN_EMAIL_WINDOW)
+                _queue_verification(user)
+                db.session.commit()
+                return render_template("login.html", error=_UNVERIFIED)
+        if valid:
+            if passwords.needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = passwords.hash_password(password)
+                    db.session.commit()
+                except passwords.HashCapacityExceeded:
+                    pass  # upgraded on a later login
+            ratelimit.reset(email_key, _LOGIN_EMAIL_WINDOW)
             login_user(user)
+            user_cache.remember(user)
             next_url = request.args.get("next", "")
             if not next_url.startswith("/"):
                 next_url = "/"
             return redirect(next_url)
+        ratelimit.increment(email_key, _LOGIN_EMAIL_WINDOW)
         error = "Ungültige E-Mail-Adresse oder Passwort."
     return render_template("login.html", error=error)
 
@@ -44,14 +114,12 @@ def login():
 @login_required
 def logout():
     logout_user()
+    session.pop(user_cache.SESSION_KEY, None)
     return redirect("/")
 
 
 @auth_bp.route("/register", methods=["GET", "POST"])
 def registrierung():
-    from ..mail import send_mail
-    from flask import current_app
-
     if current_user.is_authenticated:
         return redirect("/")
     error = None
@@ -69,50 +137,30 @@ def registrierung():
         elif not _EMAIL_RE.match(email):
             error = "Bitte geben Sie eine gültige E-Mail-Adresse an."
         elif db.session.query(User).filter(User.email == email).first():
-            error = "Diese E-Mail-Adresse ist bereits registriert."
+            error = ("Diese E-Mail-Adresse ist bereits registriert. Noch nicht bestätigt? "
+                     "Melden Sie sich an, um einen neuen Bestätigungslink zu erhalten.")
         elif len(password) < 8:
             error = "Das Passwort muss mindestens 8 Zeichen lang sein."
         elif password != confirm:
             error = "Die Passwörter stimmen nicht überein."
         else:
+            try:
+                password_hash = passwords.hash_password(password)
+            except passwords.HashCapacityExceeded:
+                return render_template("registrierung.html", error=_BUSY), 503
             user = User(
                 first_name=first_name,
                 last_name=last_name,
                 email=email,
-                password_hash=generate_password_hash(password),
+                password_hash=password_hash,
                 is_active=0,
             )
             db.session.add(user)
-            db.session.commit()
 
-            serializer = current_app.config["TOKEN_SERIALIZER"]
-            base_url = current_app.config["BASE_URL"]
-            token = serializer.dumps(email, salt="email-verify")
-            verify_url = f"{base_url}/verify/{token}"
-            try:
-                send_mail(
-                    to=email,
-                    subject="E-Mail-Adresse bestätigen — BayRecht",
-                    body_text=(
-                        f"Hallo {first_name},\n\n"
-                        f"bitte bestätigen Sie Ihre E-Mail-Adresse über folgenden Link:\n{verify_url}\n\n"
-                        "Der Link ist 24 Stunden gültig.\n\nIhr BayRecht-Team"
-                    ),
-                    body_html=(
-                        f"<p>Hallo {first_name},</p>"
-                        f"<p>bitte bestätigen Sie Ihre E-Mail-Adresse:</p>"
-                        f'<p><a href="{verify_url}">{verify_url}</a></p>'
-                        "<p>Der Link ist 24 Stunden gültig.</p>"
-                        "<p>Ihr BayRecht-Team</p>"
-                    ),
-                )
-            except Exception:
-                logger.exception(f"Failed to send verification email to {email}")
-                db.session.delete(user)
-                db.session.commit()
-                error = "Die Bestätigungs-E-Mail konnte nicht gesendet werden. Bitte versuchen Sie es später erneut."
-            else:
-                return render_template("registrierung.html", success=True, email=email)
+            # Spooled in the same transaction as the user; the background sender delivers and retries it
+            _queue_verification(user)
+            db.session.commit()
+            return render_template("registrierung.html", success=True, email=email)
 
     return render_template("registrierung.html", error=error)
 
@@ -132,10 +180,11 @@ def verify(token):
     user = db.session.query(User).filter(User.email == email).first()
     if not user:
         return render_template("verify.html", state="invalid")
-    if user.is_active:
+    if user.is_active or user.email_verified_at is not None:
         return render_template("verify.html", state="already")
 
     user.is_active = 1
+    user.email_verified_at = datetime.datetime.now()
     db.session.commit()
     flash("E-Mail-Adresse bestätigt. Sie können sich jetzt anmelden.", "success")
     return redirect("/login")
@@ -1,212 +1,308 @@
 import re
+from datetime import date
+from difflib import SequenceMatcher
+from types import SimpleNamespace
 
-from flask import Blueprint, abort, render_template, request
-from sqlalchemy import Integer, cast, case, func, or_, and_
+from flask import Blueprint, abort, redirect, render_template, request, url_for
 
-from ..cache import cache_get, cache_set, page_cache_get, page_cache_set
+from .. import catalog, queries, snapshot
+from ..cache import page_cache_fetch
 from ..extensions import db
 from ..hits import record
-from models import Law, Norm
+from models import Norm, NormVersion, fragment_source_hash
+from models.history import version_as_of, version_chain, version_content
 
 laws_bp = Blueprint("laws", __name__)
 
 
+def _law_or_404(law_name):
+    """Resolve a law from the in-memory catalog; unknown names never reach the database."""
+    law = catalog.get(law_name)
+    if not law:
+        abort(404)
+    return law
+
+
+def _fragment(law, kind, norms):
+    """Stored HTML for this part of the page if it was rendered from exactly these norms, else None."""
+    if not norms:
+        return None
+    return db.session.execute(queries.fragment(law.id, kind, fragment_source_hash(kind, law.name, norms))).scalar()
+
+
 @laws_bp.route("/")
 def law_index():
-    cache_key = "law_index"
-    cached = page_cache_get(cache_key)
-    if cached:
-        return cached
+    def build():
+        return render_template("index.html", laws=catalog.all_laws())
 
-    laws = db.session.query(Law).order_by(Law.name).all()
-    laws_data = [{"id": law.id, "name": law.name, "description": law.description} for law in laws]
-    rendered = render_template("index.html", laws=laws_data)
-    page_cache_set(cache_key, rendered)
-    return rendered
+    return page_cache_fetch("law_index", build)
 
 
 @laws_bp.route("/gesetz/<law_name>")
 def law_toc(law_name):
+    law = _law_or_404(law_name)
     record("law", law_name)
 
-    cache_key = f"toc_{law_name}"
-    cached = page_cache_get(cache_key)
-    if cached:
-        return cached
-
-    law = db.session.query(Law).filter(Law.name == law_name).first()
-    if not law:
-        abort(404)
-
-    norms = db.session.query(Norm).filter(
-        Norm.law_id == law.id,
-        or_(Norm.is_stale == 0, Norm.is_stale == None),
-    ).order_by(cast(Norm.number, Integer), Norm.number).all()
+    def build():
+        if snapshot.active():
+            return render_template("toc.html", law=law, norms=snapshot.get().norms(law.name))
+        norms = db.session.execute(queries.toc_norms(law.id)).all()
+        return render_template("toc.html", law=law, norms=norms, fragment=_fragment(law, "toc", norms))
 
-    law_data = {"id": law.id, "name": law.name, "description": law.description}
-    norms_data = [{"number": n.number, "number_raw": n.number_raw, "title": n.title} for n in norms]
-
-    rendered = render_template("toc.html", law=law_data, norms=norms_data)
-    page_cache_set(cache_key, rendered)
-    return rendered
+    return page_cache_fetch(f"toc_{law_name}", build)
 
 
 @laws_bp.route("/gesetz/<law_name>/gesamt")
 def law_full_view(law_name):
+    law = _law_or_404(law_name)
     record("law", law_name)
 
-    cache_key = f"full_view_{law_name}"
-    cached = page_cache_get(cache_key)
-    if cached:
-        return cached
+    def build():
+        if snapshot.active():
+            return render_template("full_view.html", law=law, norms=snapshot.get().norms(law.name, content=True))
+        norms = db.session.execute(queries.toc_norms(law.id)).all()
+        fragment = _fragment(law, "articles", norms)
+        if fragment is None:
+            norms = db.session.execute(queries.full_view_norms(law.id)).all()
+        return render_template("full_view.html", law=law, norms=norms, fragment=fragment)
 
-    law = db.session.query(Law).filter(Law.name == law_name).first()
-    if not law:
-        abort(404)
+    return page_cache_fetch(f"full_view_{law_name}", build)
 
-    norms = db.session.query(Norm).filter(
-        Norm.law_id == law.id,
-        or_(Norm.is_stale == 0, Norm.is_stale == None),
-    ).order_by(cast(Norm.number, Integer), Norm.number).all()
 
-    law_data = {"id": law.id, "name": law.name, "description": law.description}
-    norms_data = [{"number": n.number, "number_raw": n.number_raw, "title": n.title, "content": n.content} for n in norms]
+def _norm_context(law, norm_number):
+    """Norm page data from the database: (norm, prev, next, references, cited_by, has_history)."""
+    norm = db.session.execute(queries.norm(law.id, norm_number)).first()
+    if not norm:
+        abort(404)
 
-    rendered = render_template("full_view.html", law=law_data, norms=norms_data)
-    page_cache_set(cache_key, rendered)
-    return rendered
+    neighbours = catalog.neighbours(law, norm.number, 5)
+    if neighbours is not None:
+        prev_norms, next_norms = neighbours
+    else:
+        prev_norms = list(reversed(db.session.execute(queries.prev_norms(law.id, norm, 5)).all()))
+        next_norms = db.session.execute(queries.next_norms(law.id, norm, 5)).all()
+    references = db.session.execute(queries.references(norm.id)).all()
+    cited_by = db.session.execute(queries.cited_by(law.name, norm.number)).all()
+    has_history = len(db.session.execute(queries.version_ids(norm.id)).all()) > 1
+    return norm, prev_norms, next_norms, references, cited_by, has_history
 
 
 @laws_bp.route("/gesetz/<law_name>/<norm_number>")
 def norm_detail(law_name, norm_number):
+    law = _law_or_404(law_name)
     record("norm", f"{law_name}/{norm_number}")
 
-    cache_key = f"norm_{law_name}_{norm_number}"
-    cached = page_cache_get(cache_key)
-    if cached:
-        return cached
+    def build():
+        if snapshot.active():
+            norm = snapshot.get().norm(law.name, norm_number)
+            if not norm:
+                abort(404)
+            prev_norms, next_norms = snapshot.get().neighbours(law.name, norm.number, 5)
+            # References and history are not part of the snapshot
+            references, cited_by, has_history = [], [], False
+        else:
+            norm, prev_norms, next_norms, references, cited_by, has_history = _norm_context(law, norm_number)
+
+        return render_template(
+            "norm.html",
+            law=law,
+            norm=norm,
+            prev_norm=prev_norms[-1] if prev_norms else None,
+            next_norm=next_norms[0] if next_norms else None,
+            prev_norms=prev_norms,
+            next_norms=next_norms,
+            references=references,
+            cited_by=cited_by,
+            has_history=has_history,
+        )
 
-    law = db.session.query(Law).filter(Law.name == law_name).first()
-    if not law:
-        abort(404)
+    return page_cache_fetch(f"norm_{law_name}_{norm_number}", build)
 
-    norm = db.session.query(Norm).filter(
+
+def _require_database():
+    # Versions are not part of the snapshot
+    if snapshot.active():
+        abort(503)
+
+
+def _norm_or_404(law, norm_number):
+    norm = db.session.query(Norm.id, Norm.number, Norm.title).filter(
         Norm.law_id == law.id,
         Norm.number == norm_number,
     ).first()
     if not norm:
         abort(404)
+    return norm
 
-    prev_norm = db.session.query(Norm).filter(
-        Norm.law_id == law.id,
-        or_(Norm.is_stale == 0, Norm.is_stale == None),
-        or_(
-            cast(Norm.number, Integer) < cast(norm_number, Integer),
-            and_(
-                cast(Norm.number, Integer) == cast(norm_number, Integer),
-                Norm.number < norm_number,
-            ),
-        ),
-    ).order_by(cast(Norm.number, Integer).desc(), Norm.number.desc()).limit(1).first()
-
-    next_norm = db.session.query(Norm).filter(
-        Norm.law_id == law.id,
-        or_(Norm.is_stale == 0, Norm.is_stale == None),
-        or_(
-            cast(Norm.number, Integer) > cast(norm_number, Integer),
-            and_(
-                cast(Norm.number, Integer) == cast(norm_number, Integer),
-                Norm.number > norm_number,
-            ),
-        ),
-    ).order_by(cast(Norm.number, Integer), Norm.number).limit(1).first()
-
-    prev_norms = db.session.query(Norm).filter(
-        Norm.law_id == law.id,
-        or_(Norm.is_stale == 0, Norm.is_stale == None),
-        or_(
-            cast(Norm.number, Integer) < cast(norm_number, Integer),
-            and_(
-                cast(Norm.number, Integer) == cast(norm_number, Integer),
-                Norm.number < norm_number,
-            ),
-        ),
-    ).order_by(cast(Norm.number, Integer).desc(), Norm.number.desc()).limit(5).all()
-    prev_norms = list(reversed(prev_norms))
-
-    next_norms = db.session.query(Norm).filter(
-        Norm.law_id == law.id,
-        or_(Norm.is_stale == 0, Norm.is_stale == None),
-        or_(
-            cast(Norm.number, Integer) > cast(norm_number, Integer),
-            and_(
-                cast(Norm.number, Integer) == cast(norm_number, Integer),
-                Norm.number > norm_number,
-            ),
-        ),
-    ).order_by(cast(Norm.number, Integer), Norm.number).limit(5).all()
-
-    rendered = render_template(
-        "norm.html",
-        law={"id": law.id, "name": law.name, "description": law.description},
-        norm={"number": norm.number, "number_raw": norm.number_raw, "title": norm.title, "content": norm.content, "url": norm.url},
-        prev_norm={"number": prev_norm.number, "title": prev_norm.title} if prev_norm else None,
-        next_norm={"number": next_norm.number, "title": next_norm.title} if next_norm else None,
-        prev_norms=[{"number": n.number, "title": n.title} for n in prev_norms],
-        next_norms=[{"number": n.number, "title": n.title} for n in next_norms],
-    )
-    page_cache_set(cache_key, rendered)
-    return rendered
 
+def _date_or_404(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(404)
 
-@laws_bp.route("/suche")
-def search():
-    q = request.args.get("q", "").strip()
-    if len(q) < 2:
-        return ""
 
-    direct_match = None
+def _version_or_404(norm, as_of):
+    version = version_as_of(db.session, norm.id, as_of)
+    if not version:
+        abort(404)
+    return version
+
+
+@laws_bp.route("/gesetz/<law_name>/<norm_number>/fassungen")
+def norm_history(law_name, norm_number):
+    _require_database()
+    law = _law_or_404(law_name)
+
+    def build():
+        norm = _norm_or_404(law, norm_number)
+        versions = db.session.query(NormVersion.valid_from, NormVersion.title).filter(
+            NormVersion.norm_id == norm.id,
+        ).order_by(NormVersion.valid_from.desc()).all()
+
+        return render_template("norm_history.html", law=law, norm=norm, versions=versions)
+
+    return page_cache_fetch(f"history_{law_name}_{norm_number}", build)
+
+
+@laws_bp.route("/gesetz/<law_name>/<norm_number>/fassung/<as_of>")
+def norm_as_of(law_name, norm_number, as_of):
+    _require_database()
+    law = _law_or_404(law_name)
+    norm = _norm_or_404(law, norm_number)
+    version = _version_or_404(norm, _date_or_404(as_of))
+    # Every date a version is in force shows the same page; serve (and cache) it once, under its valid_from
+    if (norm.number, as_of) != (norm_number, version.valid_from.isoformat()):
+        return redirect(url_for("laws.norm_as_of", law_name=law.name, norm_number=norm.number,
+                                as_of=version.valid_from.isoformat()))
+
+    def build():
+        return render_template(
+            "norm_version.html", law=law, norm=norm, version=version, as_of=version.valid_from,
+            content=version_content(db.session, version),
+        )
+
+    return page_cache_fetch(f"as_of_{law_name}_{norm_number}_{as_of}", build)
+
+
+@laws_bp.route("/gesetz/<law_name>/<norm_number>/diff/<from_date>/<to_date>")
+def norm_diff(law_name, norm_number, from_date, to_date):
+    _require_database()
+    law = _law_or_404(law_name)
+    norm = _norm_or_404(law, norm_number)
+    earlier, later = sorted((_date_or_404(from_date), _date_or_404(to_date)))
+    old = _version_or_404(norm, earlier)
+    new = _version_or_404(norm, later)
+    # As for norm_as_of: one page per pair of stored versions, not per pair of dates
+    canonical = (norm.number, old.valid_from.isoformat(), new.valid_from.isoformat())
+    if (norm_number, from_date, to_date) != canonical:
+        return redirect(url_for("laws.norm_diff", law_name=law.name, norm_number=canonical[0],
+                                from_date=canonical[1], to_date=canonical[2]))
+
+    def build():
+        # Rebuilding the newer version usually passes through the older one
+        contents = dict(version_chain(db.session, norm.id, new))
+        old_content = contents.get(old.valid_from)
+        if old_content is None:
+            old_content = version_content(db.session, old)
+
+        a, b = old_content.split("\n"), contents[new.valid_from].split("\n")
+        diff = []
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+            if tag == "equal":
+                diff.extend(("equal", line) for line in a[i1:i2])
+                continue
+            diff.extend(("delete", line) for line in a[i1:i2])
+            diff.extend(("insert", line) for line in b[j1:j2])
+
+        return render_template("norm_version.html", law=law, norm=norm, version=new, old=old, diff=diff)
+
+    return page_cache_fetch(f"diff_{law_name}_{norm_number}_{from_date}_{to_date}", build)
+
+
+def _search_database(q):
+    laws = db.session.execute(queries.search_laws(q)).all()
+    norms = db.session.execute(queries.search_norms(q)).all()
+    return laws, norms
+
+
+def _search_snapshot(q):
+    """Same ranking as _search_database without view counts; scans the snapshot."""
+    needle = q.lower()
+
+    def law_rank(law):
+        name = law.name.lower()
+        return 0 if name == needle else 1 if name.startswith(needle) else 2
+
+    laws = sorted(
+        (law for law in catalog.all_laws()
+         if needle in law.name.lower() or needle in (law.description or "").lower()),
+        key=lambda law: (law_rank(law), law.name),
+    )[:5]
+
+    matches = []
+    for index, (law_name, norm) in enumerate(snapshot.get().iter_norms()):
+        number = norm.number.lower()
+        if number.startswith(needle):
+            rank = 0 if number == needle else 1
+        elif needle in (norm.number_raw or "").lower() or needle in (norm.title or "").lower():
+            rank = 2
+        else:
+            continue
+        matches.append((rank, index, law_name, norm))
+    matches.sort(key=lambda match: match[:2])
+    norms = [
+        SimpleNamespace(law_name=law_name, law_description=catalog.get(law_name).description,
+                        number=norm.number, title=norm.title)
+        for _, _, law_name, norm in matches[:10]
+    ]
+    return laws, norms
+
+
+def parse_direct_query(q):
+    """(law name, norm number) for queries like "Art. 3 BayHO" or "BayHO 3", else None."""
     combined = re.match(
         r'^(?:Art\.?\s*)?(\d+\w*)\s+([A-Za-zÄÖÜäöüß][\w\-]*)$', q, re.IGNORECASE
     ) or re.match(
         r'^([A-Za-zÄÖÜäöüß][\w\-]*)\s+(?:Art\.?\s*)?(\d+\w*)$', q, re.IGNORECASE
     )
+    if not combined:
+        return None
+    groups = combined.groups()
+    if re.match(r'^\d', groups[0]):
+        norm_number, law_name = groups
+    else:
+        law_name, norm_number = groups
+    return law_name, norm_number
 
-    if combined:
-        groups = combined.groups()
-        if re.match(r'^\d', groups[0]):
-            norm_number, law_name = groups
-        else:
-            law_name, norm_number = groups
-
-        direct_match = db.session.query(
-            Law.name.label("law_name"), Norm.number, Norm.title,
-        ).join(Norm).filter(
-            Norm.number == norm_number,
-            func.lower(Law.name) == func.lower(law_name),
-            or_(Norm.is_stale == 0, Norm.is_stale == None),
-        ).first()
-
-    rank_expr = case((Law.name == q, 0), (Law.name.like(f"{q}%"), 1), else_=2)
-    laws = db.session.query(
-        Law.name, Law.description, rank_expr.label("rank"),
-    ).filter(
-        or_(Law.name.like(f"%{q}%"), Law.description.like(f"%{q}%"))
-    ).order_by("rank", Law.views.desc(), Law.name).limit(5).all()
-
-    norm_rank_expr = case((Norm.number == q, 0), (Norm.number.like(f"{q}%"), 1), else_=2)
-    norms = db.session.query(
-        Law.name.label("law_name"), Law.description.label("law_description"),
-        Norm.number, Norm.title, norm_rank_expr.label("rank"),
-    ).join(Norm).filter(
-        or_(
-            Norm.number.like(f"{q}%"),
-            Norm.number_raw.like(f"%{q}%"),
-            Norm.title.like(f"%{q}%"),
-        ),
-        or_(Norm.is_stale == 0, Norm.is_stale == None),
-    ).order_by("rank", Norm.views.desc(), Law.name, cast(Norm.number, Integer), Norm.number).limit(10).all()
 
+@laws_bp.route("/suche")
+def search():
+    q = request.args.get("q", "").strip()
+    if len(q) < 2:
+        return ""
+
+    direct_match = None
+    direct_law = None
+    direct = parse_direct_query(q)
+    if direct:
+        law_name, norm_number = direct
+        direct_law = catalog.find(law_name)
+        if direct_law and snapshot.active():
+            direct_match = snapshot.get().norm(direct_law.name, norm_number)
+            if direct_match and direct_match.is_stale:
+                direct_match = None
+        elif direct_law:
+            direct_match = db.session.execute(queries.direct_match(direct_law.id, norm_number)).first()
+
+    if snapshot.active():
+        laws, norms = _search_snapshot(q)
+    else:
+        laws, norms = _search_database(q)
+    return render_search_results(direct_law, direct_match, laws, norms)
+
+
+def render_search_results(direct_law, direct_match, laws, norms):
     if not direct_match and not laws and not norms:
         return '<div class="search-empty">Keine Ergebnisse</div>'
 
@@ -216,9 +312,9 @@ def search():
         title = direct_match.title or "(ohne Titel)"
         html_parts.append(
             '<div class="search-group"><span class="search-group-label">Direktes Ergebnis</span>'
-            f'<a href="/gesetz/{direct_match.law_name}/{direct_match.number}" '
+            f'<a href="/gesetz/{direct_law.name}/{direct_match.number}" '
             f'class="search-result search-result-direct">'
-            f'<span class="search-result-abbr">Art. {direct_match.number} {direct_match.law_name}</span>'
+            f'<span class="search-result-abbr">Art. {direct_match.number} {direct_law.name}</span>'
             f'<span class="search-result-text">{title}</span>'
             f'</a></div>'
         )
@@ -2,11 +2,11 @@ import json as _json
 import time as _time
 from urllib.parse import quote
 
-import psutil
 from flask import Blueprint, current_app, make_response, render_template, send_from_directory
-from sqlalchemy import Integer, cast, or_, text
+from sqlalchemy import text
 
-from ..cache import cache_get, cache_set
+from .. import catalog, snapshot
+from ..cache import cache_fetch
 from ..extensions import db
 from models import Law, Norm
 
@@ -20,6 +20,9 @@ def favicon():
 
 @misc_bp.route("/health")
 def health_check():
+    # Only the health check needs psutil; workers that never serve it skip the import
+    import psutil
+
     uptime = round(_time.time() - current_app.config["START_TIME"])
     cpu_percent = psutil.cpu_percent(interval=0.1)
     memory = psutil.virtual_memory()
@@ -60,34 +63,35 @@ def health_check():
 
 @misc_bp.route("/sitemap.xml")
 def sitemap():
-    cached = cache_get("sitemap")
-    if cached:
-        return make_response(cached, 200, {"Content-Type": "application/xml"})
-
-    base_url = current_app.config["BASE_URL"]
-    laws = db.session.query(Law).order_by(Law.name).all()
-    norms = db.session.query(Law.name, Norm.number).join(Norm).filter(
-        or_(Norm.is_stale == 0, Norm.is_stale == None)
-    ).order_by(Law.name, cast(Norm.number, Integer), Norm.number).all()
-
-    urls = [f"<url><loc>{base_url}/</loc><priority>1.0</priority></url>"]
-    for law in laws:
-        name = quote(law.name, safe="")
-        urls.append(f"<url><loc>{base_url}/gesetz/{name}</loc><priority>0.8</priority></url>")
-        urls.append(f"<url><loc>{base_url}/gesetz/{name}/gesamt</loc><priority>0.5</priority></url>")
-    for law_name, number in norms:
-        name = quote(law_name, safe="")
-        number_encoded = quote(str(number), safe="")
-        urls.append(f"<url><loc>{base_url}/gesetz/{name}/{number_encoded}</loc><priority>0.6</priority></url>")
-
-    xml = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<?xml-stylesheet type="text/xsl" href="/static/sitemap.xsl"?>\n'
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-        + "\n".join(urls)
-        + "\n</urlset>"
-    )
-    cache_set("sitemap", xml)
+    def build():
+        base_url = current_app.config["BASE_URL"]
+        laws = catalog.all_laws()
+        if snapshot.active():
+            norms = [(law_name, norm.number) for law_name, norm in snapshot.get().iter_norms()]
+        else:
+            norms = db.session.query(Law.name, Norm.number).join(Norm).filter(
+                Norm.is_stale == 0
+            ).order_by(Law.name, Norm.sort_key, Norm.number).all()
+
+        urls = [f"<url><loc>{base_url}/</loc><priority>1.0</priority></url>"]
+        for law in laws:
+            name = quote(law.name, safe="")
+            urls.append(f"<url><loc>{base_url}/gesetz/{name}</loc><priority>0.8</priority></url>")
+            urls.append(f"<url><loc>{base_url}/gesetz/{name}/gesamt</loc><priority>0.5</priority></url>")
+        for law_name, number in norms:
+            name = quote(law_name, safe="")
+            number_encoded = quote(str(number), safe="")
+            urls.append(f"<url><loc>{base_url}/gesetz/{name}/{number_encoded}</loc><priority>0.6</priority></url>")
+
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<?xml-stylesheet type="text/xsl" href="/static/sitemap.xsl"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            + "\n".join(urls)
+            + "\n</urlset>"
+        )
+
+    xml = cache_fetch("sitemap", build)
     return make_response(xml, 200, {"Content-Type": "application/xml"})
 
 
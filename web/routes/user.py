@@ -1,7 +1,7 @@
 from flask import Blueprint, flash, redirect, render_template, request
 from flask_login import current_user, login_required
-from werkzeug.security import check_password_hash, generate_password_hash
 
+from .. import passwords, user_cache
 from ..extensions import db
 
 user_bp = Blueprint("user", __name__)
@@ -20,15 +20,31 @@ def profil_passwort():
     new_pw = request.form.get("new_password", "")
     confirm_pw = request.form.get("confirm_password", "")
 
-    if not check_password_hash(current_user.password_hash, current_pw):
+    # The cached user may predate a password change made through another worker
+    db.session.refresh(current_user._get_current_object())
+    try:
+        current_ok = passwords.verify(current_user.password_hash, current_pw)
+    except passwords.HashCapacityExceeded:
+        flash("Der Dienst ist gerade ausgelastet. Bitte versuchen Sie es in einem Moment erneut.", "error")
+        return redirect("/profil")
+
+    if not current_ok:
         flash("Das aktuelle Passwort ist falsch.", "error")
     elif len(new_pw) < 8:
         flash("Das neue Passwort muss mindestens 8 Zeichen lang sein.", "error")
     elif new_pw != confirm_pw:
         flash("Die Passwörter stimmen nicht überein.", "error")
     else:
-        current_user.password_hash = generate_password_hash(new_pw)
+        try:
+            password_hash = passwords.hash_password(new_pw)
+        except passwords.HashCapacityExceeded:
+            flash("Der Dienst ist gerade ausgelastet. Bitte versuchen Sie es in einem Moment erneut.", "error")
+            return redirect("/profil")
+        current_user.password_hash = password_hash
+        # Log out every other session of this user, keep this one
+        user_cache.end_sessions(current_user)
         db.session.commit()
+        user_cache.remember(current_user)
         flash("Passwort erfolgreich geändert.", "success")
 
     return redirect("/profil")
@@ -0,0 +1,31 @@
+import logging
+import os
+from typing import Optional
+
+from law_scraper.snapshot import Snapshot
+
+logger = logging.getLogger("snapshot")
+
+# When set, law pages are served from this file (see law_scraper/snapshot.py) and never query the database
+_PATH = os.environ.get("SNAPSHOT_PATH")
+
+_snapshot: Optional[Snapshot] = None
+
+
+def init_app(app) -> None:
+    global _snapshot
+    if not _PATH:
+        return
+    _snapshot = Snapshot(_PATH)
+    logger.info(
+        f"Serving law pages from snapshot {_PATH} "
+        f"({_snapshot.law_count} laws, {_snapshot.norm_count} norms, created {_snapshot.meta.get('created_at')})"
+    )
+
+
+def active() -> bool:
+    return _snapshot is not None
+
+
+def get() -> Snapshot:
+    return _snapshot
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from flask import session
+
+from .extensions import db
+from models import User
+
+_TTL: int = int(os.environ.get("USER_CACHE_TTL", 30))
+_MAX_SIZE: int = int(os.environ.get("USER_CACHE_SIZE", 1024))
+
+SESSION_KEY = "_user_version"
+
+# (user_id, session_version) -> (detached User, loaded at)
+_users: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def load(user_id: int) -> Optional[User]:
+    """Return the user for this request, attached to the current db session.
+
+    Served from a short-lived per-process cache keyed by id and the session
+    version stored at login. Users whose session_version moved on (password
+    change, deactivation) or who are inactive are rejected, which logs the
+    session out.
+    """
+    version = session.get(SESSION_KEY)
+    key = (user_id, version)
+    with _lock:
+        entry = _users.get(key)
+        if entry and (time.time() - entry[1]) < _TTL:
+            _users.move_to_end(key)
+            return db.session.merge(entry[0], load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None or not user.is_active:
+        return None
+    if version is None:
+        # Session from before session versions existed
+        session[SESSION_KEY] = version = user.session_version
+        key = (user_id, version)
+    elif user.session_version != version:
+        return None
+
+    db.session.expunge(user)
+    with _lock:
+        _users[key] = (user, time.time())
+        _users.move_to_end(key)
+        while len(_users) > _MAX_SIZE:
+            _users.popitem(last=False)
+    return db.session.merge(user, load=False)
+
+
+def remember(user: User) -> None:
+    """Bind the current session to the user's session version (call after login_user)."""
+    session[SESSION_KEY] = user.session_version
+
+
+def invalidate(user_id: int) -> None:
+    with _lock:
+        for key in [key for key in _users if key[0] == user_id]:
+            del _users[key]
+
+
+def end_sessions(user: User) -> None:
+    """Bump the user's session version so every existing session is logged out.
+
+    Takes effect immediately in this process and within USER_CACHE_TTL seconds
+    in other workers. The caller commits.
+    """
+    user.session_version = (user.session_version or 0) + 1
+    invalidate(user.id)